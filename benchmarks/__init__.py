@@ -0,0 +1,6 @@
+"""
+Benchmarks of the decompression pipeline over synthetic corpora.
+
+Run them with `python -m benchmarks`.
+
+"""
@@ -0,0 +1,114 @@
+"""
+Run the scanner, decompressor and stopper pipeline over the synthetic
+corpora and report its throughput.
+
+Every corpus runs in a fresh process so the peak RSS reported belongs
+to that corpus alone.  The results are written as JSON to
+`benchmarks/results/<commit>.json` and can be compared with a previous
+run with `--compare`.
+
+    $ python -m benchmarks --scale 0.1
+    $ python -m benchmarks --compare benchmarks/results/<commit>.json
+
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+
+from benchmarks.corpus import CORPORA
+from benchmarks.pipeline import run_corpus
+
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), 'results')
+
+#: Metrics compared between runs; the higher the better
+THROUGHPUT_METRICS = ('files_per_second', 'mb_per_second')
+
+
+def _run_isolated(name, scale, config, use_runtime):
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        return pool.apply(run_corpus, (name, scale, config, use_runtime))
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              check=True, capture_output=True,
+                              text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def _print_results(results, baseline):
+    for name, metrics in results.items():
+        line = [f"{name:16}",
+                f"{metrics['seconds']:8.2f}s",
+                f"{metrics['files_per_second']:10.1f} files/s",
+                f"{metrics['mb_per_second']:8.2f} MB/s",
+                f"{metrics['peak_rss_mb']:7.1f} MB RSS"]
+        previous = baseline.get(name)
+        if previous:
+            for metric in THROUGHPUT_METRICS:
+                if previous.get(metric):
+                    change = metrics[metric] / previous[metric] - 1
+                    line.append(f"{metric}: {change:+.1%}")
+        print('  '.join(line))
+        print(' ' * 18 + ', '.join(f'{signal}={count}' for signal, count
+                                   in metrics['signals'].items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description=__doc__.split('\n\n')[0])
+    parser.add_argument('corpora', nargs='*', metavar='CORPUS',
+                        help='corpora to run among ' + ', '.join(CORPORA)
+                             + ' (default: all)')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='factor multiplying the size of the corpora')
+    parser.add_argument('--nested', action='store_true',
+                        help='expand nested archives')
+    parser.add_argument('--replace', action='store_true',
+                        help='move the expanded trees in place of the '
+                             'archives')
+    parser.add_argument('--asyncio', action='store_true',
+                        help='run the entities on an asyncio runtime')
+    parser.add_argument('--workers', type=int,
+                        help='number of decompressor workers')
+    parser.add_argument('--compare', metavar='RESULTS',
+                        help='JSON results of a previous run')
+    parser.add_argument('--output', metavar='RESULTS',
+                        help='where to write the results (default: '
+                             'benchmarks/results/<commit>.json)')
+    args = parser.parse_args(argv)
+    for name in args.corpora:
+        if name not in CORPORA:
+            parser.error(f'unknown corpus {name!r}')
+
+    config = {'decompressor_nested': args.nested, 'replace': args.replace}
+    if args.workers:
+        config['decompressor_workers'] = args.workers
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['corpora']
+
+    results = {}
+    for name in args.corpora or CORPORA:
+        results[name] = _run_isolated(name, args.scale, config,
+                                      args.asyncio)
+        _print_results({name: results[name]}, baseline)
+
+    output = args.output or os.path.join(RESULTS_PATH, f'{_commit()}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'commit': _commit(), 'scale': args.scale,
+                   'asyncio': args.asyncio, 'config': config,
+                   'corpora': results}, f, indent=2)
+    print(f'Results written to {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Generate synthetic corpora to benchmark the decompression pipeline.
+
+Every generator takes the directory where the corpus is created and a
+`scale` factor multiplying its size, and is registered in `CORPORA`.
+
+"""
+import os
+import random
+import tempfile
+
+import libarchive
+
+#: Content of the small documents found in every corpus
+DOCUMENT = b'Words are, in my not-so-humble opinion, ' \
+           b'our most inexhaustible source of magic.\n'
+
+
+def _write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _archive(entries, format_name='zip', filter_name=None):
+    """Return the bytes of an archive containing `entries`."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'archive')
+        with libarchive.file_writer(path, format_name,
+                                    filter_name) as archive:
+            for name, data in entries:
+                archive.add_file_from_memory(name, len(data), data)
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+def deep_nesting(path, scale):
+    """Archives nested ten levels deep."""
+    for i in range(int(20 * scale)):
+        data = DOCUMENT
+        name = 'leaf.txt'
+        for depth in range(10):
+            data = _archive([(name, data), ('doc.txt', DOCUMENT)])
+            name = f'level{depth}.zip'
+        _write(os.path.join(path, f'nested{i}.zip'), data)
+
+
+def wide_directory(path, scale):
+    """A single directory with lots of documents and a few archives."""
+    archive = _archive([('doc.txt', DOCUMENT)])
+    for i in range(int(20000 * scale)):
+        if i % 100:
+            _write(os.path.join(path, f'doc{i}.txt'), DOCUMENT)
+        else:
+            _write(os.path.join(path, f'archive{i}.zip'), archive)
+
+
+def many_small_zips(path, scale):
+    """Lots of small archives spread in a shallow tree."""
+    for i in range(int(2000 * scale)):
+        directory = os.path.join(path, str(i % 50))
+        os.makedirs(directory, exist_ok=True)
+        entries = [(f'doc{j}.txt', DOCUMENT * (i + j + 1))
+                   for j in range(5)]
+        _write(os.path.join(directory, f'small{i}.zip'), _archive(entries))
+
+
+def huge_tar_xz(path, scale):
+    """A few big compressed tarballs."""
+    rng = random.Random(0)
+    block = bytes(rng.getrandbits(8) for _ in range(64 * 1024))
+    for i in range(2):
+        tarball = os.path.join(path, f'huge{i}.tar.xz')
+        with libarchive.file_writer(tarball, 'ustar', 'xz') as archive:
+            for j in range(4):
+                size = int(4 * 1024 * 1024 * scale)
+                data = (block * (size // len(block) + 1))[:size]
+                archive.add_file_from_memory(f'part{j}.bin', len(data),
+                                             data)
+
+
+def malformed(path, scale):
+    """Files that look like archives but are not."""
+    valid = _archive([('doc.txt', DOCUMENT * 10)])
+    truncated = valid[:len(valid) // 2]
+    garbage = b'PK\x03\x04' + DOCUMENT
+    for i in range(int(1000 * scale)):
+        _write(os.path.join(path, f'truncated{i}.zip'), truncated)
+        _write(os.path.join(path, f'garbage{i}.zip'), garbage)
+
+
+CORPORA = {
+    'deep_nesting': deep_nesting,
+    'wide_directory': wide_directory,
+    'many_small_zips': many_small_zips,
+    'huge_tar_xz': huge_tar_xz,
+    'malformed': malformed,
+}
+
+
+def generate(name, path, scale=1.0):
+    """Generate the corpus `name` in the directory `path`."""
+    os.makedirs(path, exist_ok=True)
+    CORPORA[name](path, scale)
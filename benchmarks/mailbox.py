@@ -0,0 +1,80 @@
+"""
+Compare the throughput and latency of the mailbox implementations.
+
+A number of producer threads put timestamps in a mailbox while a single
+consumer drains it, like emitters and an entity do.
+
+    $ python -m benchmarks.mailbox
+
+"""
+import argparse
+import threading
+import time
+
+from engorgio.mailbox import Mailbox, QueueMailbox
+from engorgio.stats import Histogram
+
+IMPLEMENTATIONS = {
+    'queue': (QueueMailbox, False),
+    'queue+get_many': (QueueMailbox, True),
+    'deque+get_many': (Mailbox, True),
+}
+
+
+def run(mailbox_class, batched, producers, items, maxsize):
+    """
+    Return the throughput, in items per second, and the latency
+    histogram of moving `items` items from every producer to the
+    consumer.
+
+    """
+    mailbox = mailbox_class(maxsize=maxsize)
+    clock = time.perf_counter
+    latency = Histogram()
+    total = producers * items
+
+    def produce():
+        for _ in range(items):
+            mailbox.put(clock())
+
+    threads = [threading.Thread(target=produce) for _ in range(producers)]
+    start = clock()
+    for thread in threads:
+        thread.start()
+    received = 0
+    while received < total:
+        batch = mailbox.get_many() if batched else [mailbox.get()]
+        now = clock()
+        for sent in batch:
+            latency.add(now - sent)
+        received += len(batch)
+    elapsed = clock() - start
+    for thread in threads:
+        thread.join()
+    return total / elapsed, latency
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.mailbox',
+                                     description=__doc__.split('\n\n')[0])
+    parser.add_argument('--producers', type=int, default=4)
+    parser.add_argument('--items', type=int, default=100000,
+                        help='items put by every producer')
+    parser.add_argument('--rounds', type=int, default=3,
+                        help='best of how many rounds is reported')
+    args = parser.parse_args(argv)
+
+    for maxsize in (0, 1024):
+        print(f'maxsize={maxsize}')
+        for name, (mailbox_class, batched) in IMPLEMENTATIONS.items():
+            throughput, latency = max(
+                (run(mailbox_class, batched, args.producers, args.items,
+                     maxsize) for _ in range(args.rounds)),
+                key=lambda result: result[0])
+            print(f'  {name:16} {throughput:12,.0f} items/s'
+                  f'  p50 {latency.percentile(50) * 1e6:10,.0f}us'
+                  f'  p99 {latency.percentile(99) * 1e6:10,.0f}us')
+
+
+if __name__ == '__main__':
+    main()
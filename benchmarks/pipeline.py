@@ -0,0 +1,105 @@
+"""
+Time the scanner, decompressor and stopper pipeline over a corpus, with
+the replacer too if the configuration sets `replace`.
+
+"""
+from collections import Counter
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import generate
+
+
+def _signal_types():
+    from engorgio import signals
+    return [value for value in vars(signals).values()
+            if isinstance(value, type)
+            and issubclass(value, signals._Signal)
+            and value is not signals._Signal]
+
+
+def _tree_size(path):
+    files = size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                size += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                continue
+            files += 1
+    return files, size
+
+
+def _peak_rss():
+    """Return the peak resident set size of this process, in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports it in kilobytes and macOS in bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_corpus(name, scale, config, use_runtime=False):
+    """
+    Generate the corpus `name` and return the metrics of running the
+    pipeline over it, on an `AsyncRuntime` if `use_runtime` is set.
+
+    """
+    from engorgio.entities.decompressor import Decompressor
+    from engorgio.entities.replacer import Replacer
+    from engorgio.entities.scanner import Scanner
+    from engorgio.entities.stopper import Stopper
+    from engorgio.entity import join_all, prepare_all, start_all
+    from engorgio.runtime import AsyncRuntime
+    from engorgio.signals import ContentAdded
+    from engorgio.signals import UserScanRequested
+
+    with tempfile.TemporaryDirectory() as workdir:
+        corpus = os.path.join(workdir, 'corpus')
+        sandbox = os.path.join(workdir, 'sandbox')
+        os.mkdir(sandbox)
+        generate(name, corpus, scale)
+        input_files, input_size = _tree_size(corpus)
+
+        counts = Counter()
+        added = []
+
+        def count(sender, signal):
+            counts[signal.__class__.__name__] += 1
+            if isinstance(signal, ContentAdded):
+                added.append(signal.path)
+
+        for signal_type in _signal_types():
+            signal_type.connect(count)
+
+        entities = (Scanner(config),
+                    Decompressor(dict(config, sandbox=sandbox)),
+                    Stopper(config))
+        if config.get('replace'):
+            entities += (Replacer(config),)
+        runtime = AsyncRuntime() if use_runtime else None
+        prepare_all(*entities)
+        start = time.perf_counter()
+        start_all(*entities, runtime=runtime)
+        UserScanRequested(path=corpus).emit()
+        join_all(*entities)
+        elapsed = time.perf_counter() - start
+        if runtime is not None:
+            runtime.close()
+
+        for signal_type in _signal_types():
+            signal_type.disconnect(count)
+
+        # Moved trees are not in the sandbox anymore
+        _, extracted_size = _tree_size(sandbox)
+        extracted_size += sum(_tree_size(path)[1] for path in added)
+
+    return {'input_files': input_files,
+            'input_mb': input_size / 2 ** 20,
+            'extracted_mb': extracted_size / 2 ** 20,
+            'seconds': elapsed,
+            'files_per_second': input_files / elapsed,
+            'mb_per_second': extracted_size / 2 ** 20 / elapsed,
+            'peak_rss_mb': _peak_rss() / 2 ** 20,
+            'signals': dict(sorted(counts.items()))}
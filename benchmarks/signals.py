@@ -0,0 +1,100 @@
+"""
+Compare the cost of emitting signals with the blinker signal looked up
+once per signal class against looking it up on every emit, and the
+memory taken by queued signals with `__slots__` against signals with a
+`__dict__`.
+
+    $ python -m benchmarks.signals
+
+"""
+from dataclasses import dataclass
+import argparse
+import queue
+import timeit
+import tracemalloc
+
+import blinker
+
+from engorgio import signals
+
+
+class CachedSignal(signals._Signal):
+    """Emitted as every signal is."""
+
+
+class LookedUpSignal(signals._Signal):
+    """Emitted looking the blinker signal up by name every time."""
+
+    def emit(self, sender=None):
+        for receiver in self._inline_receivers:
+            receiver(sender, signal=self)
+        return blinker.signal(self.__class__.__name__).send(sender,
+                                                            signal=self)
+
+
+@dataclass(frozen=True)
+class DictFileFound(signals._Signal):
+    """`FileFound` with a `__dict__` instead of `__slots__`."""
+    path: str
+    device: int = None
+    inode: int = None
+    size: int = None
+    mtime: int = None
+
+
+def _receiver(sender, signal):
+    pass
+
+
+def emit_cost(cls, emits, rounds):
+    """Return the best time, in seconds, of a single `emit` of `cls`."""
+    obj = cls()
+    cls.connect(_receiver)
+    try:
+        return min(timeit.repeat(obj.emit, number=emits,
+                                 repeat=rounds)) / emits
+    finally:
+        cls.disconnect(_receiver)
+
+
+def queued_size(cls, count):
+    """Return the bytes taken by every one of `count` queued `cls`."""
+    paths = [str(i) for i in range(count)]
+    queue_ = queue.Queue()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        for path in paths:
+            queue_.put(cls(path=path))
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (after - before) / count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.signals',
+                                     description=__doc__.split('\n\n')[0])
+    parser.add_argument('--emits', type=int, default=100000,
+                        help='emits measured in every round')
+    parser.add_argument('--rounds', type=int, default=5,
+                        help='best of how many rounds is reported')
+    parser.add_argument('--queued', type=int, default=1000000,
+                        help='signals queued to measure their memory')
+    args = parser.parse_args(argv)
+
+    print('emit')
+    for name, cls in (('cached', CachedSignal),
+                      ('looked up', LookedUpSignal)):
+        cost = emit_cost(cls, args.emits, args.rounds)
+        print(f'  {name:16} {cost * 1e9:10,.0f}ns')
+
+    print(f'memory of {args.queued:,} queued signals')
+    for name, cls in (('__slots__', signals.FileFound),
+                      ('__dict__', DictFileFound)):
+        size = queued_size(cls, args.queued) * args.queued
+        print(f'  {name:16} {size / 2**20:10,.1f}MiB')
+
+
+if __name__ == '__main__':
+    main()
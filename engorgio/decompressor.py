@@ -1,30 +1,347 @@
+import itertools
 import libarchive
 import os
+import shutil
 import tempfile
 
-from engorgio.signals import Decompressed, DecompressionFailed
+from engorgio.signals import Decompressed
+from engorgio.signals import DecompressionDiscarded
+from engorgio.signals import DecompressionFailed
+from engorgio.metadata import zip_comment
+from engorgio.sniffer import sniff_header
 
+#: Nested archives bigger than this are written to disk instead of being
+#: expanded from memory
+NESTED_MAX_SIZE = 64 * 1024 * 1024
 
-def decompress(filepath, sandbox):
+#: Maximum number of archives inside archives expanded from memory
+NESTED_MAX_DEPTH = 16
+
+#: Maximum bytes of nested archives held in memory at the same time by
+#: an extraction, adding up every nesting level
+NESTED_MAX_BUFFERED = 2 * NESTED_MAX_SIZE
+
+#: Archives writing more files than this are not listed in
+#: `Decompressed.entries`, so signals stay small
+MAX_LISTED_ENTRIES = 65536
+
+
+class UnsafeEntryError(libarchive.exception.ArchiveError):
+    """An archive entry tried to escape its destination directory."""
+
+
+def _entry_name(name):
     """
-    Decompress filepath on a temporary directory in sandbox.
+    Return the archive entry `name` as `str`.
+
+    libarchive returns `bytes` names that can't be decoded, those are
+    decoded the same way `os` does, so they round-trip to the original
+    bytes when written.
+
+    """
+    if isinstance(name, bytes):
+        return os.fsdecode(name)
+    return name
+
+
+def _entry_parts(name):
+    """
+    Split the archive entry `name` in its path components.
+
+    Raise `UnsafeEntryError` if `name` is absolute or contains `..`.
+
+    """
+    parts = [p for p in name.replace('\\', '/').split('/')
+             if p not in ('', '.')]
+    if not parts or os.path.isabs(name) or '..' in parts:
+        raise UnsafeEntryError(f'Unsafe archive entry: {name!r}')
+    return parts
+
+
+def safe_join(root, name):
+    """
+    Join the archive entry `name` to the directory `root`.
+
+    Raise `UnsafeEntryError` if the resulting path would fall outside of
+    `root`, be it by an absolute name, `..` components or a symlink
+    previously extracted in one of the parent directories.
+
+    """
+    path = os.path.join(root, *_entry_parts(name))
+    parent = os.path.dirname(path)
+    if parent != root:
+        realroot = os.path.realpath(root)
+        if os.path.commonpath([realroot,
+                               os.path.realpath(parent)]) != realroot:
+            raise UnsafeEntryError(f'Unsafe archive entry: {name!r}')
+    return path
+
+
+def _create(path):
+    """
+    Open the new file `path` for writing.
+
+    Raise `OSError` if anything already exists at `path`, so a symlink
+    extracted before can't redirect the write outside of the sandbox.
+
+    """
+    flags = (os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW |
+             getattr(os, 'O_BINARY', 0))
+    return os.fdopen(os.open(path, flags, 0o666), 'wb')
+
+
+class Destination:
+    """
+    Directory where the entries of an archive are written.
+
+    The directory is created in `sandbox` right before the first entry
+    is written, so archives yielding nothing don't leave empty
+    directories behind.
+
+    With `metadata` the mode and mtime of every entry written are
+    collected too.
+
+    """
+    def __init__(self, sandbox, metadata=False):
+        self.sandbox = sandbox
+        #: Path of the directory, `None` until the first entry is written
+        self.path = None
+        #: Number of entries written
+        self.written = 0
+        #: Bytes of the files written
+        self.size = 0
+        #: Name relative to `path` of every file written -> its size,
+        #: `None` for symlinks; `None` once there are too many
+        self.entries = {}
+        #: `Decompressed.metadata` of the entries written, or `None`
+        self.metadata = [] if metadata else None
+        #: Bytes of nested archives being expanded from memory
+        self.buffered = 0
+        self._directories = set()
+
+    def join(self, name):
+        """Return the path where the entry `name` must be written."""
+        if self.path is None:
+            _entry_parts(name)
+            self.path = tempfile.mkdtemp(dir=self.sandbox)
+        return safe_join(self.path, name)
 
+    def makedirs(self, path):
+        """Create the directory `path` unless it was already created."""
+        if path not in self._directories:
+            os.makedirs(path, exist_ok=True)
+            self._directories.add(path)
+
+    def add(self, path, size):
+        """
+        List the file written at `path` with `size` bytes, or the symlink
+        if `size` is `None`.
+
+        """
+        if self.entries is not None:
+            self.entries[path[len(self.path) + 1:]] = size
+            if len(self.entries) > MAX_LISTED_ENTRIES:
+                self.entries = None
+
+    def describe(self, path, entry):
+        """
+        Collect the metadata of the libarchive `entry` written at `path`,
+        if collecting.
+
+        """
+        if self.metadata is not None:
+            self.metadata.append(
+                (path[len(self.path) + 1:], entry.mode, entry.mtime))
+
+    def listing(self):
+        """Return the entries listed as `Decompressed.entries`."""
+        if self.entries is None:
+            return None
+        return tuple(self.entries.items())
+
+    def rollback(self, path, written, size):
+        """
+        Remove the directory `path` and everything written under it,
+        restoring the counters of written entries and bytes to `written`
+        and `size`.
+
+        """
+        shutil.rmtree(path, ignore_errors=True)
+        self._directories = {d for d in self._directories
+                             if d != path and
+                             not d.startswith(path + os.sep)}
+        name = path[len(self.path) + 1:]
+        if self.entries is not None:
+            self.entries = {e: size for e, size in self.entries.items()
+                            if e != name and
+                            not e.startswith(name + os.sep)}
+        if self.metadata is not None:
+            self.metadata = [m for m in self.metadata
+                             if m[0] != name and
+                             not m[0].startswith(name + os.sep)]
+        self.written = written
+        self.size = size
+
+
+def extract(archive, destination, nested=False, prefix='', depth=0):
+    """
+    Write every entry of the libarchive `archive` in `destination`, a
+    `Destination` instance, prepending `prefix` to their names.
+
+    Unlike `libarchive.extract_file` this doesn't depend on the current
+    working directory, so any number of extractions can run at the same
+    time in different threads.
+
+    If `nested` is true the entries that are archives themselves are
+    expanded straight from memory into a directory named after the
+    entry, so only the leaf files are ever written.
+
+    """
+    for entry in archive:
+        if not (entry.isdir or entry.isreg or entry.issym or entry.islnk):
+            # Devices, fifos and sockets are never extracted.
+            continue
+        name = prefix + _entry_name(entry.pathname)
+        path = destination.join(name)
+        if entry.isdir:
+            destination.makedirs(path)
+        else:
+            if os.path.lexists(path):
+                # A later copy of a file replaces it, like `tar -r` means,
+                # but symlinks and directories are never written through.
+                if os.path.islink(path) or os.path.isdir(path):
+                    raise UnsafeEntryError(
+                        f'Unsafe archive entry: {name!r}')
+                os.unlink(path)
+            destination.makedirs(os.path.dirname(path))
+            if entry.issym:
+                os.symlink(_entry_name(entry.linkpath), path)
+                destination.add(path, None)
+            elif entry.islnk:
+                target = safe_join(destination.path,
+                                   prefix + _entry_name(entry.linkpath))
+                if os.path.islink(target):
+                    raise UnsafeEntryError(
+                        f'Unsafe archive entry: {name!r}')
+                os.link(target, path, follow_symlinks=False)
+                if destination.entries is not None:
+                    destination.add(path, destination.entries.get(
+                        target[len(destination.path) + 1:]))
+            else:
+                blocks = entry.get_blocks()
+                room = min(NESTED_MAX_SIZE,
+                           NESTED_MAX_BUFFERED - destination.buffered)
+                if (nested and depth < NESTED_MAX_DEPTH
+                        and (entry.size or 0) <= room):
+                    first = next(blocks, b'')
+                    if sniff_header(first) is not None:
+                        read, complete = _read_within(
+                            itertools.chain((first,), blocks), room)
+                        if complete:
+                            data = b''.join(read)
+                            del read
+                            if _extract_nested(data, destination, name,
+                                               depth):
+                                destination.describe(path, entry)
+                                continue
+                            blocks = (data,)
+                        else:
+                            blocks = itertools.chain(read, blocks)
+                    else:
+                        blocks = itertools.chain((first,), blocks)
+                size = 0
+                with _create(path) as f:
+                    for block in blocks:
+                        f.write(block)
+                        size += len(block)
+                destination.add(path, size)
+                destination.size += size
+        destination.describe(path, entry)
+        destination.written += 1
+
+
+def _read_within(blocks, limit):
+    """
+    Read `blocks` while they add up to `limit` bytes at most.
+
+    Return the blocks read and whether that was all of them.
+
+    """
+    read = []
+    size = 0
+    for block in blocks:
+        read.append(block)
+        size += len(block)
+        if size > limit:
+            return read, False
+    return read, True
+
+
+def _extract_nested(data, destination, name, depth):
+    """
+    Expand the archive contained in `data` into the directory `name` of
+    `destination`.
+
+    Return whether something was written.  On failure anything written
+    is removed so the entry can be written as a regular file instead.
+
+    """
+    path = safe_join(destination.path, name)
+    written, size = destination.written, destination.size
+    destination.buffered += len(data)
+    try:
+        with libarchive.memory_reader(data) as archive:
+            extract(archive, destination, nested=True,
+                    prefix=name + '/', depth=depth + 1)
+    except libarchive.exception.ArchiveError:
+        destination.rollback(path, written, size)
+        return False
+    finally:
+        destination.buffered -= len(data)
+    return destination.written > written
+
+
+def _error(e):
+    """Return the `DecompressionFailed.error` describing the exception `e`."""
+    # Skipping the errno and pointer `str` adds to libarchive errors
+    message = e.msg if isinstance(e, libarchive.exception.ArchiveError) else e
+    return f'{e.__class__.__name__}: {message}'
+
+
+def decompress(filepath, sandbox, nested=False, metadata=False):
     """
-    new_filepath = tempfile.mkdtemp(dir=sandbox)
+    Decompress filepath on a temporary directory in sandbox.
 
-    previous_workdir = os.getcwd()
-    os.chdir(new_filepath)
+    The temporary directory is only created if the archive contains
+    something, archives without entries are discarded.
+
+    With `nested` the archives inside the archive are expanded too (see
+    `extract`).  With `metadata` the result carries the metadata lost by
+    the expansion (see `engorgio.metadata`).
+
+    """
+    destination = Destination(sandbox, metadata)
 
     try:
-        libarchive.extract_file(filepath)
-        os.chdir(previous_workdir)
-        return Decompressed(source=filepath, path=new_filepath)
-    except libarchive.exception.ArchiveError as e:
-        os.chdir(previous_workdir)
-        # More than 2 files (. and ..) in new_filepath, implies there
-        # was a partial decompression
-        partial_decompression = len(os.listdir(new_filepath)) > 2
+        with libarchive.file_reader(filepath) as archive:
+            extract(archive, destination, nested=nested)
+    except (libarchive.exception.ArchiveError, OSError) as e:
         return DecompressionFailed(source=filepath,
-                                   path=new_filepath,
-                                   partial=partial_decompression,
-                                   error=e)
+                                   path=destination.path,
+                                   partial=destination.written > 0,
+                                   error=_error(e))
+    if destination.path is None:
+        return DecompressionDiscarded(path=filepath, reason='empty archive')
+    if not metadata:
+        return Decompressed(source=filepath, path=destination.path,
+                            entries=destination.listing(),
+                            size=destination.size)
+    try:
+        comment = zip_comment(filepath)
+    except OSError:
+        comment = None
+    return Decompressed(source=filepath, path=destination.path,
+                        entries=destination.listing(),
+                        size=destination.size,
+                        metadata=tuple(destination.metadata),
+                        comment=comment)
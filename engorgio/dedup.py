@@ -0,0 +1,218 @@
+"""
+Recognize archives identical to others already expanded, so every
+distinct archive is expanded only once.
+
+Archives are identified by their size and a hash of their content.  The
+size works as a prefilter: an archive is only hashed once another one
+of the same size has been seen, so archives with a unique size are
+never read twice.
+
+"""
+from collections import Counter, OrderedDict
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+#: Size of the chunks read while hashing
+HASH_CHUNK_SIZE = 1024 * 1024
+
+#: Number of additions to the on-disk index between commits
+INDEX_COMMIT_EVERY = 256
+
+
+def content_hash(path):
+    """Return a hex digest of the content of the file at `path`."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def clone_tree(source, sandbox):
+    """
+    Replicate the directory `source` in a new temporary directory in
+    `sandbox`, and return its path.
+
+    Files are hard linked when possible, so no data is copied, and
+    copied otherwise.
+
+    """
+    destination = tempfile.mkdtemp(dir=sandbox)
+    for dirpath, dirnames, filenames in os.walk(source):
+        target = os.path.join(destination, os.path.relpath(dirpath, source))
+        for name in dirnames:
+            src = os.path.join(dirpath, name)
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), os.path.join(target, name))
+            else:
+                os.mkdir(os.path.join(target, name))
+        for name in filenames:
+            src = os.path.join(dirpath, name)
+            dst = os.path.join(target, name)
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), dst)
+            else:
+                try:
+                    os.link(src, dst)
+                except OSError:
+                    shutil.copy2(src, dst)
+    return destination
+
+
+class DedupCache:
+    """
+    Map archive contents to the directory where they were expanded.
+
+    Keeps the `capacity` most recently used entries in memory and, if
+    `index_path` is given, every entry in an SQLite database at that
+    path so they survive across runs.  Entries can carry some `extra`
+    value, which is only kept in memory.
+
+    All the methods are thread safe.
+
+    """
+    def __init__(self, capacity=4096, index_path=None):
+        self.capacity = capacity
+        # Digest -> (size, expanded, extra)
+        self._entries = OrderedDict()
+        # Number of entries in `self._entries` of every size
+        self._sizes = Counter()
+        # Size -> (path, expanded, extra) of archives added without hashing
+        self._unhashed = OrderedDict()
+        self._lock = threading.Lock()
+        self._index = None
+        self._uncommitted = 0
+        if index_path is not None:
+            self._index = sqlite3.connect(index_path,
+                                          check_same_thread=False)
+            self._index.execute('CREATE TABLE IF NOT EXISTS archives ('
+                                ' digest TEXT PRIMARY KEY,'
+                                ' size INTEGER NOT NULL,'
+                                ' path TEXT NOT NULL)')
+            self._index.execute('CREATE INDEX IF NOT EXISTS archives_size'
+                                ' ON archives (size)')
+
+    def key(self, path, size):
+        """
+        Return the key identifying the content of the archive at `path`
+        whose size is `size`.
+
+        The content is hashed only if another archive with the same size
+        is known.
+
+        """
+        with self._lock:
+            seen = self._size_seen(size)
+            unhashed = self._unhashed.pop(size, None)
+        if unhashed is not None:
+            # Now there are two archives of this size, so the first one
+            # has to be hashed to be found.
+            first_path, expanded, extra = unhashed
+            try:
+                self.add((size, content_hash(first_path)), first_path,
+                         expanded, extra)
+            except OSError:
+                pass
+        if not seen:
+            return (size, None)
+        return (size, content_hash(path))
+
+    def get(self, key):
+        """
+        Return the directory where the archive identified by `key` was
+        expanded or `None` if unknown or no longer there.
+
+        """
+        found = self.lookup(key)
+        return None if found is None else found[0]
+
+    def lookup(self, key):
+        """
+        Like `get`, but return the directory along with the `extra` value
+        it was added with, `None` if it was loaded from the on-disk
+        index; or `None` if unknown or no longer there.
+
+        """
+        size, digest = key
+        if digest is None:
+            return None
+        with self._lock:
+            _, expanded, extra = self._entries.get(digest, (size, None, None))
+            if expanded is None and self._index is not None:
+                row = self._index.execute(
+                    'SELECT path FROM archives WHERE digest = ?',
+                    (digest,)).fetchone()
+                if row is not None:
+                    expanded = row[0]
+                    self._remember(digest, size, expanded, None)
+            if expanded is None:
+                return None
+            if not os.path.isdir(expanded):
+                self._forget(digest)
+                return None
+            self._entries.move_to_end(digest)
+            return expanded, extra
+
+    def add(self, key, path, expanded, extra=None):
+        """
+        Record that the archive at `path` identified by `key` was
+        expanded in the directory `expanded`, along with `extra`.
+
+        """
+        size, digest = key
+        with self._lock:
+            if digest is None:
+                self._unhashed[size] = (path, expanded, extra)
+                if len(self._unhashed) > self.capacity:
+                    self._unhashed.popitem(last=False)
+                return
+            self._remember(digest, size, expanded, extra)
+            if self._index is not None:
+                self._index.execute(
+                    'INSERT OR REPLACE INTO archives VALUES (?, ?, ?)',
+                    (digest, size, expanded))
+                self._uncommitted += 1
+                if self._uncommitted >= INDEX_COMMIT_EVERY:
+                    self._index.commit()
+                    self._uncommitted = 0
+
+    def close(self):
+        """Write any pending change to the on-disk index."""
+        with self._lock:
+            if self._index is not None:
+                self._index.commit()
+                self._index.close()
+                self._index = None
+
+    def _size_seen(self, size):
+        if size in self._unhashed or self._sizes[size]:
+            return True
+        if self._index is not None:
+            return self._index.execute(
+                'SELECT 1 FROM archives WHERE size = ? LIMIT 1',
+                (size,)).fetchone() is not None
+        return False
+
+    def _remember(self, digest, size, expanded, extra):
+        self._forget_in_memory(digest)
+        self._entries[digest] = (size, expanded, extra)
+        self._sizes[size] += 1
+        if len(self._entries) > self.capacity:
+            self._forget_in_memory(next(iter(self._entries)))
+
+    def _forget_in_memory(self, digest):
+        if digest in self._entries:
+            size = self._entries.pop(digest)[0]
+            self._sizes[size] -= 1
+            if not self._sizes[size]:
+                del self._sizes[size]
+
+    def _forget(self, digest):
+        self._forget_in_memory(digest)
+        if self._index is not None:
+            self._index.execute('DELETE FROM archives WHERE digest = ?',
+                                (digest,))
@@ -0,0 +1,93 @@
+"""
+Shard the decompression of a scan among worker nodes.
+
+The master node runs the scanner and the stopper.  The files it finds
+are published in a `engorgio.signals.transport.Broker` and every one of
+them is taken by a single worker node, which decompresses it and
+publishes the results back.  The broker keeps the files given to a
+worker until it has published their `PathProcessingFinished`, and gives
+them to another worker if it disconnects before, so a worker that dies
+does not leave the stopper of the master waiting.  Once the stopper
+requests the exit it is broadcast to the workers.
+
+Paths travel as they are, so every node must see the scanned tree and
+the sandbox of a worker is local to it.
+
+"""
+from engorgio.entities.decompressor import Decompressor
+from engorgio.signals import Decompressed
+from engorgio.signals import DecompressionDiscarded
+from engorgio.signals import DecompressionFailed
+from engorgio.signals import EntriesFound
+from engorgio.signals import ExitRequested
+from engorgio.signals import FileFound
+from engorgio.signals import PathProcessingFinished
+from engorgio.signals.transport import Transport
+
+#: Signals sent by the master to be processed by a single worker
+WORK_SIGNALS = (FileFound, EntriesFound)
+
+#: Signals sent by the workers back to the master
+RESULT_SIGNALS = (Decompressed, DecompressionDiscarded, DecompressionFailed,
+                  PathProcessingFinished)
+
+
+def _work(signal):
+    """Return the paths a worker processes for a signal of `WORK_SIGNALS`."""
+    if isinstance(signal, EntriesFound):
+        return [found.path for found in signal.signals
+                if isinstance(found, FileFound)]
+    return [signal.path]
+
+
+def connect_master(address):
+    """
+    Connect the master node to the broker at `address` and return its
+    `Transport`.
+
+    """
+    transport = Transport(address)
+    for signal in RESULT_SIGNALS:
+        transport.subscribe(signal)
+    for signal in WORK_SIGNALS:
+        transport.forward(signal, hold=True)
+    transport.forward(ExitRequested)
+    return transport
+
+
+def connect_worker(address):
+    """
+    Connect a worker node to the broker at `address` and return its
+    `Transport`.
+
+    """
+    transport = Transport(address)
+    for signal in RESULT_SIGNALS:
+        transport.forward(signal)
+    # After forwarding it, so the master has it when the broker forgets
+    # the work
+    transport.acknowledge_on(PathProcessingFinished,
+                             lambda signal: signal.path)
+    transport.subscribe(ExitRequested)
+    for signal in WORK_SIGNALS:
+        transport.subscribe(signal, shared=True, work=_work)
+    return transport
+
+
+def run_worker(address, config):
+    """
+    Decompress the files published in the broker at `address` with a
+    `Decompressor` configured with `config`, until the exit is
+    requested.
+
+    """
+    decompressor = Decompressor(config)
+    decompressor.prepare()
+    # Received signals block the transport while the mailbox is full, so
+    # the decompressor must be consuming before they arrive.
+    decompressor.start()
+    transport = connect_worker(address)
+    try:
+        decompressor.join()
+    finally:
+        transport.close()
@@ -0,0 +1,312 @@
+"""
+Decompressor
+============
+
+Expand the archives found by the scanner.
+
+Extractions run on a pool of worker threads.  The number of extractions
+in flight is capped so a scanner faster than the extraction doesn't make
+the queue of pending files grow without limit: once the cap is reached
+the emitters of `FileFound` block until some extraction finishes.
+
+Configuration:
+
+* `sandbox`: Directory where the archives are expanded (default: the
+  system temporary directory, or with `replace` a temporary directory on
+  the same device as the archive, created next to the first archive
+  found in that device, so the trees are renamed into place instead of
+  copied).
+* `decompressor_workers`: Number of concurrent extractions (default: the
+  number of CPUs).
+* `decompressor_max_pending`: Maximum number of files accepted and not
+  yet expanded (default: twice the number of workers).
+* `decompressor_backend`: Where the extractions are run, either
+  `'thread'` (default) or `'process'`.  With `'process'` each worker
+  thread hands its extraction to a pool of as many processes, so CPU
+  bound formats scale with the number of cores; only the resulting
+  signal travels back.
+* `decompressor_nested`: Expand the archives found inside an archive
+  straight from memory, writing only the leaf files (default: `False`).
+* `dedup`: Expand identical archives only once; the copies get a hard
+  linked replica of the first expansion, and its metadata (default:
+  `False`).  See `engorgio.dedup`.  Collecting metadata, copies of
+  archives only known from the `dedup_index` are expanded again.
+* `dedup_capacity`: Number of expanded archives remembered in memory
+  (default: 4096).
+* `dedup_index`: Path of an SQLite file remembering every expanded
+  archive across runs (default: none).
+* `run_index`: Path of an SQLite file remembering the files processed,
+  so the files unchanged since a previous run are discarded without
+  reading them (default: none).  See `engorgio.runindex`.
+* `replace`: Whether a `Replacer` moves the expanded trees to their
+  final destination (default: `False`).  Identical archives are then
+  cloned from that destination, and with `dedup` every archive expanded
+  is hashed right away, as it is gone once a copy shows up.  Partial
+  trees of failed expansions are removed from the sandboxes created
+  next to the archives, the scanner skips them so nobody would find
+  them.
+* `metadata_file`: Where the `Metadater` keeps the metadata lost by
+  the expansion.  When set the extraction collects it (default: none).
+* `decompressor_sniff`: Check the magic bytes of every file before
+  expanding it and discard the ones that are not archives (default:
+  `True`).
+
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+import dataclasses
+import multiprocessing
+import os
+import sqlite3
+import threading
+
+from engorgio.decompressor import decompress
+from engorgio.dedup import DedupCache
+from engorgio.dedup import clone_tree
+from engorgio.dedup import content_hash
+from engorgio.entity import INLINE, Entity
+from engorgio.replacer import remove_hidden
+from engorgio.replacer import sandbox_for
+from engorgio.runindex import RunIndex
+from engorgio.signals import ContentAdded
+from engorgio.signals import Decompressed
+from engorgio.signals import DecompressionDiscarded
+from engorgio.signals import DecompressionFailed
+from engorgio.signals import ExitRequested
+from engorgio.signals import FileFound
+from engorgio.signals import PathProcessingFinished
+from engorgio.sniffer import sniff
+
+
+class Decompressor(Entity):
+    def _configure(self):
+        config = self.config or {}
+        self.sandbox = config.get('sandbox')
+        self.workers = (config.get('decompressor_workers')
+                        or os.cpu_count() or 1)
+        self.max_pending = (config.get('decompressor_max_pending')
+                            or 2 * self.workers)
+        self.sniff = config.get('decompressor_sniff', True)
+        self.nested = config.get('decompressor_nested', False)
+        self.index = None
+        if config.get('run_index') is not None:
+            self.index = RunIndex(config['run_index'])
+        self.dedup = None
+        if config.get('dedup', False):
+            self.dedup = DedupCache(config.get('dedup_capacity', 4096),
+                                    config.get('dedup_index'))
+        # Device -> sandbox created there when no sandbox is configured
+        self._sandboxes = {}
+        self._sandboxes_lock = threading.Lock()
+        # Source archive -> dedup key and expansion, until it is moved
+        self._dedup_keys = {}
+        self._moved = threading.Condition()
+        self.replace = config.get('replace', False)
+        self.metadata = config.get('metadata_file') is not None
+        self.backend = config.get('decompressor_backend', 'thread')
+        if self.backend not in ('thread', 'process'):
+            raise ValueError(f'Unknown decompressor backend: {self.backend}')
+        self._queue_maxsize = self.max_pending
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers,
+            thread_name_prefix=self.__class__.__name__)
+        self._processes = None
+        if self.backend == 'process':
+            # Entities are threads, so forking is not safe here.
+            self._processes = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'))
+
+    def _prepare(self):
+        self._attach(FileFound, self.on_file_found)
+        self._attach(ExitRequested, self.on_exit_requested)
+        if self.dedup is not None and self.replace:
+            # Inline, so identical archives wait as little as possible
+            self._attach(ContentAdded, self.on_content_added, INLINE)
+            self._attach(DecompressionFailed, self.on_move_failed, INLINE)
+
+    def on_file_found(self, signal):
+        self._slots.acquire()
+        self._executor.submit(self._decompress, signal)
+
+    def on_exit_requested(self, signal):
+        self._executor.shutdown(wait=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=True)
+        if self.dedup is not None:
+            self.dedup.close()
+        if self.index is not None:
+            self.index.close()
+        for sandbox in self._sandboxes.values():
+            if sandbox is not None:
+                # Only once every expanded tree was moved out
+                try:
+                    os.rmdir(sandbox)
+                except OSError:
+                    pass
+
+    def on_content_added(self, signal):
+        # Identical archives are cloned from where the content ended up
+        with self._moved:
+            moved = self._dedup_keys.pop(signal.source, None)
+            if moved is not None:
+                key, expansion = moved
+                self.dedup.add(key, signal.source, signal.path, expansion)
+                self._moved.notify_all()
+
+    def on_move_failed(self, signal):
+        with self._moved:
+            if self._dedup_keys.pop(signal.source, None) is not None:
+                self._moved.notify_all()
+
+    def _sandbox(self, path):
+        """
+        Return the directory where the archive at `path` is expanded, see
+        the `sandbox` setting.  `None` stands for the system temporary
+        directory.
+
+        """
+        if self.sandbox is not None or not self.replace:
+            return self.sandbox
+        try:
+            device = os.stat(os.path.dirname(os.path.abspath(path))).st_dev
+        except OSError:
+            return None
+        with self._sandboxes_lock:
+            if device not in self._sandboxes:
+                try:
+                    self._sandboxes[device] = sandbox_for(path)
+                except OSError:
+                    # Read only directory: fall back to copying the tree
+                    self._sandboxes[device] = None
+            return self._sandboxes[device]
+
+    def _extract(self, path):
+        """Run `decompress` on the configured backend."""
+        sandbox = self._sandbox(path)
+        if self._processes is None:
+            return decompress(path, sandbox, self.nested, self.metadata)
+        else:
+            return self._processes.submit(
+                decompress, path, sandbox, self.nested,
+                self.metadata).result()
+
+    def _process(self, signal):
+        """Return the signal resulting of processing a `FileFound`."""
+        path = signal.path
+        if self.index is not None and self._is_unchanged(signal):
+            return DecompressionDiscarded(path=path, reason='unchanged')
+        if signal.size == 0:
+            return DecompressionDiscarded(path=path, reason='empty file')
+        if self.sniff:
+            try:
+                kind = sniff(path)
+            except OSError as e:
+                error = f'{e.__class__.__name__}: {e}'
+                return DecompressionFailed(source=path,
+                                           path=None,
+                                           partial=False,
+                                           error=error)
+            if kind is None:
+                return DecompressionDiscarded(path=path,
+                                              reason='not an archive')
+        if self.dedup is not None:
+            return self._deduplicated(path, signal.size)
+        return self._extract(path)
+
+    def _deduplicated(self, path, size):
+        """
+        Replicate the expansion of an identical archive if any, expand
+        `path` otherwise.
+
+        """
+        try:
+            if size is None:
+                size = os.path.getsize(path)
+            key = self.dedup.key(path, size)
+            if self.replace:
+                # An identical expansion may be on its way to its
+                # destination, it can only be cloned once there.
+                with self._moved:
+                    self._moved.wait_for(
+                        lambda: all(moving != key for moving, _
+                                    in self._dedup_keys.values()))
+            found = self.dedup.lookup(key)
+            # Without its expansion there is no metadata to replicate
+            if found is not None and (found[1] is not None
+                                      or not self.metadata):
+                expanded, expansion = found
+                replica = clone_tree(expanded, self._sandbox(path))
+                if expansion is None:
+                    return Decompressed(source=path, path=replica)
+                return dataclasses.replace(expansion, source=path,
+                                           path=replica)
+        except OSError:
+            return self._extract(path)
+
+        result = self._extract(path)
+        if isinstance(result, Decompressed):
+            if self.replace and key[1] is None:
+                # The Replacer removes the archive, so it can't be hashed
+                # later when another archive of the same size shows up.
+                try:
+                    key = (size, content_hash(path))
+                except OSError:
+                    return result
+            # Replicated with the metadata and comment of the archive,
+            # but not the entries, which can be many
+            expansion = dataclasses.replace(result, entries=None)
+            if self.replace:
+                # Before it can be found, so identical archives wait for
+                # the move instead of cloning a tree being moved.
+                with self._moved:
+                    self._dedup_keys[path] = (key, expansion)
+            self.dedup.add(key, path, result.path, expansion)
+        return result
+
+    def _is_unchanged(self, signal):
+        """Whether `signal` was processed by a previous run."""
+        try:
+            return self.index.is_unchanged(signal)
+        except (OSError, sqlite3.Error):
+            return False
+
+    def _record(self, signal, result):
+        """Record the `result` of processing `signal` in the run index."""
+        try:
+            if (isinstance(result, Decompressed)
+                    or (isinstance(result, DecompressionDiscarded)
+                        and result.reason != 'unchanged')):
+                self.index.record(signal)
+        except (OSError, sqlite3.Error):
+            # Only costs processing the file again on the next run
+            pass
+
+    def _decompress(self, signal):
+        """
+        Expand the file of a `FileFound` and emit the result.
+
+        This function is executed in one of the worker threads.
+
+        """
+        try:
+            try:
+                result = self._process(signal)
+            except Exception as e:
+                # Otherwise lost in the discarded future of the executor
+                error = f'{e.__class__.__name__}: {e}'
+                result = DecompressionFailed(source=signal.path,
+                                             path=None,
+                                             partial=False,
+                                             error=error)
+            if (self.replace and isinstance(result, DecompressionFailed)
+                    and remove_hidden(result.path)):
+                result = dataclasses.replace(result, path=None)
+            # Emitted first, so the expanded tree is never left behind
+            result.emit()
+            if self.index is not None:
+                self._record(signal, result)
+        finally:
+            self._slots.release()
+            PathProcessingFinished(path=signal.path).emit()
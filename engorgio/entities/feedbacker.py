@@ -0,0 +1,220 @@
+"""
+Feedbacker
+==========
+
+Show the user how the decompression is going.
+
+Signals are only counted, inline and on counters owned by the emitter
+thread, see `engorgio.stats.ShardedCounters`.  A separate thread samples
+the counters and the depth of the queues of the watched entities at a
+fixed rate and redraws a single line, so the cost of the feedback
+depends on the refresh rate and not on the number of signals.
+
+The line tells the files seen, the archives expanded and the bytes
+written by them, the failures, the paths pending, the depth of every
+watched queue and an estimate of the time left.  The estimate divides
+the pending paths by an exponentially weighted average of the paths
+finished per second; the expanded archives keep discovering paths, so
+it is a lower bound.
+
+On a terminal the line is redrawn in place, otherwise a new line is
+written on every change.
+
+Configuration:
+
+* `feedbacker_interval`: Seconds between refreshes (default: 0.25).
+* `feedbacker_file`: Path of the file the feedback is written to
+  (default: standard error).
+* `replace`: See `Stopper`, which paths are pending depends on it.
+
+"""
+import math
+import sys
+import threading
+import time
+
+from engorgio.entities.stopper import discoveries
+from engorgio.entity import INLINE, Entity
+from engorgio.signals import Decompressed
+from engorgio.signals import DecompressionFailed
+from engorgio.signals import ExitRequested
+from engorgio.signals import FileFound
+from engorgio.signals import PathProcessingFinished
+from engorgio.stats import ShardedCounters
+
+#: Seconds over which the rate of finished paths is averaged
+RATE_WINDOW = 5.0
+
+# Indexes of the counters
+_FOUND, _FINISHED, _FILES, _EXPANDED, _BYTES, _FAILED = range(6)
+
+_UNITS = ('B', 'KiB', 'MiB', 'GiB', 'TiB')
+
+
+def format_size(size):
+    """Return `size` bytes as a human readable string."""
+    for unit in _UNITS[:-1]:
+        if size < 1024:
+            break
+        size /= 1024
+    else:
+        unit = _UNITS[-1]
+    return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+
+
+def format_duration(seconds):
+    """Return `seconds` as `H:MM:SS`, or `'?'` if unknown."""
+    if seconds is None:
+        return '?'
+    minutes, seconds = divmod(math.ceil(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02}:{seconds:02}'
+
+
+class Feedbacker(Entity):
+    def _configure(self):
+        config = self.config or {}
+        self.interval = config.get('feedbacker_interval', 0.25)
+        self.path = config.get('feedbacker_file')
+        self.discoveries = discoveries(config)
+        self._counters = ShardedCounters(6)
+        self._watched = []
+        self._stream = None
+        self._tty = False
+        self._ticker = None
+        self._stop = threading.Event()
+        self._last_sample = None
+        self._last_line = ''
+        #: Paths finished per second
+        self.rate = None
+
+    def _prepare(self):
+        if self.path is None:
+            self._stream = sys.stderr
+        else:
+            self._stream = open(self.path, 'a')
+        self._tty = self._stream.isatty()
+        for signal in self.discoveries:
+            self._attach(signal, self.on_path_found, INLINE)
+        self._attach(PathProcessingFinished, self.on_path_finished, INLINE)
+        self._attach(FileFound, self.on_file_found, INLINE)
+        self._attach(Decompressed, self.on_decompressed, INLINE)
+        self._attach(DecompressionFailed, self.on_failed, INLINE)
+        self._attach(ExitRequested, self.on_exit_requested)
+
+    def watch(self, *entities):
+        """Show the depth of the queue of every entity given."""
+        self._watched.extend(entities)
+
+    def start(self, runtime=None):
+        super().start(runtime)
+        self._ticker = threading.Thread(target=self._tick_periodically,
+                                        name=self.__class__.__name__,
+                                        daemon=True)
+        self._ticker.start()
+
+    def on_path_found(self, signal):
+        self._counters.shard()[_FOUND] += 1
+
+    def on_path_finished(self, signal):
+        self._counters.shard()[_FINISHED] += 1
+
+    def on_file_found(self, signal):
+        self._counters.shard()[_FILES] += 1
+
+    def on_decompressed(self, signal):
+        shard = self._counters.shard()
+        shard[_EXPANDED] += 1
+        if signal.size is not None:
+            shard[_BYTES] += signal.size
+
+    def on_failed(self, signal):
+        self._counters.shard()[_FAILED] += 1
+
+    def on_exit_requested(self, signal):
+        self._stop.set()
+        if self._ticker is not None:
+            self._ticker.join()
+        self.tick()
+        if self._tty:
+            self._stream.write('\n')
+        if self.path is None:
+            self._stream.flush()
+        else:
+            self._stream.close()
+
+    def snapshot(self):
+        """
+        Return a dictionary with the counters, the depth of the watched
+        queues and the estimated seconds left, `None` if unknown.
+
+        """
+        total = self._counters.total
+        # Finished paths are added up before found ones, see `Stopper`
+        finished = total(_FINISHED)
+        found = total(_FOUND)
+        pending = max(0, found - finished)
+        if not pending:
+            eta = 0.0
+        elif self.rate:
+            eta = pending / self.rate
+        else:
+            eta = None
+        return {'files': total(_FILES),
+                'expanded': total(_EXPANDED),
+                'bytes': total(_BYTES),
+                'failed': total(_FAILED),
+                'found': found,
+                'finished': finished,
+                'pending': pending,
+                'queues': {entity.__class__.__name__: entity.queue_depth()
+                           for entity in self._watched},
+                'eta': eta}
+
+    def tick(self, now=None):
+        """Sample the counters and draw the line."""
+        now = time.monotonic() if now is None else now
+        self._sample_rate(now)
+        self._draw(self.render(self.snapshot()))
+
+    def render(self, snapshot):
+        """Return the line showing `snapshot`."""
+        parts = [f"{snapshot['files']} files",
+                 f"{snapshot['expanded']} expanded"
+                 f" ({format_size(snapshot['bytes'])})",
+                 f"{snapshot['failed']} failed",
+                 f"{snapshot['pending']} pending"]
+        if snapshot['queues']:
+            parts.append('queues ' + ' '.join(
+                f'{name} {depth}'
+                for name, depth in snapshot['queues'].items()))
+        parts.append(f"ETA {format_duration(snapshot['eta'])}")
+        return ' | '.join(parts)
+
+    def _sample_rate(self, now):
+        finished = self._counters.total(_FINISHED)
+        if self._last_sample is not None:
+            last_now, last_finished = self._last_sample
+            elapsed = now - last_now
+            if elapsed <= 0:
+                return
+            rate = (finished - last_finished) / elapsed
+            if self.rate is None:
+                self.rate = rate
+            else:
+                weight = 1 - math.exp(-elapsed / RATE_WINDOW)
+                self.rate += weight * (rate - self.rate)
+        self._last_sample = now, finished
+
+    def _draw(self, line):
+        if self._tty:
+            # Blank whatever the previous line had beyond this one
+            self._stream.write('\r' + line.ljust(len(self._last_line)))
+            self._stream.flush()
+        elif line != self._last_line:
+            self._stream.write(line + '\n')
+        self._last_line = line
+
+    def _tick_periodically(self):
+        while not self._stop.wait(self.interval):
+            self.tick()
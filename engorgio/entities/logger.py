@@ -0,0 +1,190 @@
+"""
+Logger
+======
+
+Generate a log stream for the user out of the results of the
+decompression.
+
+Records are created in the entity thread and handed through a
+`logging.handlers.QueueHandler` to a `QueueListener` thread, which
+formats and writes them, so a slow stream never stalls the pipeline.
+
+Floods, like a directory with thousands of malformed archives, are
+contained per kind of record, the signal type plus its reason or error
+type: up to `logger_burst` records are written at once and
+`logger_rate` per second after that, while the rest are sampled, one
+in `logger_sample`.  Records tell how many similar ones were suppressed
+since the previous one, and the remaining count of every kind is
+written on exit.
+
+Configuration:
+
+* `logger_level`: Minimum level of the records written (default:
+  `'INFO'`).  Discarded files are logged as `DEBUG`, added content as
+  `INFO` and failures as `WARNING`; signals below the level are not
+  even received.
+* `logger_file`: Path of the file the records are appended to (default:
+  standard error).
+* `logger_rate`: Records of every kind written per second (default:
+  10).
+* `logger_burst`: Records of every kind written at once (default: 100).
+* `logger_sample`: Beyond the rate, write one in this many records of
+  every kind (default: 1000, 0 to write none).
+
+"""
+from logging.handlers import QueueHandler, QueueListener
+import logging
+import queue
+import sys
+import time
+
+from engorgio.entity import Entity
+from engorgio.signals import ContentAdded
+from engorgio.signals import DecompressionDiscarded
+from engorgio.signals import DecompressionFailed
+from engorgio.signals import ExitRequested
+
+#: Format of the records written
+FORMAT = '%(asctime)s %(levelname)s %(message)s'
+
+#: Level of the records of every signal
+LEVELS = {DecompressionDiscarded: logging.DEBUG,
+          ContentAdded: logging.INFO,
+          DecompressionFailed: logging.WARNING}
+
+
+class RateLimiter:
+    """
+    Decide which events of every kind pass: `burst` at once and `rate`
+    per second after that, plus one in `sample` of the rest.
+
+    Not thread safe.
+
+    """
+    def __init__(self, rate, burst, sample, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.sample = sample
+        self._clock = clock
+        # Kind -> [tokens, last refill, suppressed since the last pass]
+        self._buckets = {}
+
+    def allow(self, kind):
+        """
+        Return whether an event of `kind` passes, and the number of events
+        of that kind suppressed since the previous one that passed.
+
+        """
+        now = self._clock()
+        bucket = self._buckets.get(kind)
+        if bucket is None:
+            bucket = self._buckets[kind] = [self.burst, now, 0]
+        else:
+            bucket[0] = min(self.burst,
+                            bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+        else:
+            bucket[2] += 1
+            if not self.sample or bucket[2] % self.sample:
+                return False, 0
+            # Sampled, the suppressed count doesn't include itself
+            bucket[2] -= 1
+        suppressed, bucket[2] = bucket[2], 0
+        return True, suppressed
+
+    def suppressed(self):
+        """
+        Return a dict of the kinds with events suppressed since their
+        last pass to how many.
+
+        """
+        return {kind: bucket[2] for kind, bucket in self._buckets.items()
+                if bucket[2]}
+
+
+class _QueueHandler(QueueHandler):
+    """
+    Enqueue the records unformatted: they stay in process and their
+    arguments are immutable signals, so the listener formats them.
+
+    """
+    def prepare(self, record):
+        return record
+
+
+class Logger(Entity):
+    def _configure(self):
+        config = self.config or {}
+        self.level = config.get('logger_level', 'INFO')
+        if isinstance(self.level, str):
+            self.level = logging.getLevelName(self.level.upper())
+        if not isinstance(self.level, int):
+            raise ValueError(f'Unknown logger level: {self.level}')
+        self.path = config.get('logger_file')
+        self.limiter = RateLimiter(config.get('logger_rate', 10),
+                                   config.get('logger_burst', 100),
+                                   config.get('logger_sample', 1000))
+        # Not registered in `logging`, so records never reach the
+        # handlers of the application.
+        self._log = logging.Logger(self.__class__.__name__, self.level)
+        self._handler = None
+        self._listener = None
+
+    def _prepare(self):
+        if self.path is None:
+            self._handler = logging.StreamHandler(sys.stderr)
+        else:
+            self._handler = logging.FileHandler(self.path)
+        self._handler.setFormatter(logging.Formatter(FORMAT))
+        records = queue.SimpleQueue()
+        self._log.addHandler(_QueueHandler(records))
+        self._listener = QueueListener(records, self._handler)
+        self._listener.start()
+
+        handlers = {DecompressionDiscarded: self.on_discarded,
+                    ContentAdded: self.on_content_added,
+                    DecompressionFailed: self.on_failed}
+        for signal, handler in handlers.items():
+            if LEVELS[signal] >= self.level:
+                self._attach(signal, handler)
+        self._attach(ExitRequested, self.on_exit_requested)
+
+    def on_discarded(self, signal):
+        self._write((DecompressionDiscarded, signal.reason),
+                    'Discarded %s: %s', signal.path, signal.reason)
+
+    def on_content_added(self, signal):
+        self._write((ContentAdded, None),
+                    'Expanded %s into %s', signal.source, signal.path)
+
+    def on_failed(self, signal):
+        kind = (DecompressionFailed, signal.error.split(':', 1)[0])
+        if signal.partial:
+            self._write(kind, 'Partially decompressed %s into %s: %s',
+                        signal.source, signal.path, signal.error)
+        else:
+            self._write(kind, 'Cannot decompress %s: %s',
+                        signal.source, signal.error)
+
+    def on_exit_requested(self, signal):
+        for (signal_type, detail), count in self.limiter.suppressed().items():
+            self._log.log(LEVELS[signal_type],
+                          '%d more %s records suppressed%s', count,
+                          signal_type.__name__,
+                          f' ({detail})' if detail else '')
+        self._listener.stop()
+        self._handler.close()
+
+    def _write(self, kind, message, *args):
+        """
+        Log `message` unless the records of `kind`, a (signal type,
+        detail) tuple, are being suppressed.
+
+        """
+        allowed, suppressed = self.limiter.allow(kind)
+        if allowed:
+            if suppressed:
+                message += f' ({suppressed} similar records suppressed)'
+            self._log.log(LEVELS[kind[0]], message, *args)
@@ -0,0 +1,48 @@
+"""
+Metadater
+=========
+
+Record the metadata lost by the decompression: the source archive of
+every expanded tree, the mode and mtime of its entries and the archive
+comment.  See `engorgio.metadata` for the format.
+
+The records are written by a `MetadataWriter`, in its own thread, so a
+run with millions of entries costs the metadater a queue put per
+archive.
+
+Configuration:
+
+* `metadata_file`: Path of the JSON lines file the records are appended
+  to (required).  The decompressor only collects the metadata when it
+  is set.
+* `metadater_buffer_size`: Bytes buffered before writing to the file
+  (default: 4 MiB).
+
+"""
+from engorgio.entity import Entity
+from engorgio.metadata import BUFFER_SIZE
+from engorgio.metadata import MetadataWriter
+from engorgio.signals import Decompressed
+from engorgio.signals import ExitRequested
+
+
+class Metadater(Entity):
+    def _configure(self):
+        config = self.config or {}
+        self.path = config.get('metadata_file')
+        if self.path is None:
+            raise ValueError('The metadater needs a metadata_file')
+        self.buffer_size = config.get('metadater_buffer_size', BUFFER_SIZE)
+        self.writer = None
+
+    def _prepare(self):
+        self.writer = MetadataWriter(self.path, self.buffer_size)
+        self._attach(Decompressed, self.on_decompressed)
+        self._attach(ExitRequested, self.on_exit_requested)
+
+    def on_decompressed(self, signal):
+        if signal.metadata is not None:
+            self.writer.add(signal.source, signal.comment, signal.metadata)
+
+    def on_exit_requested(self, signal):
+        self.writer.close()
@@ -0,0 +1,99 @@
+"""
+Replacer
+========
+
+Move the trees expanded by the decompressor to their final destination,
+the path of the archive itself plus an optional suffix.
+
+The tree is first moved to a temporary directory next to its
+destination, renamed when both are on the same filesystem and cloned or
+copied otherwise (see `engorgio.replacer`), and then renamed into
+place, so the destination never holds a partial tree.  Without a
+suffix the archive is renamed aside right before that last rename, and
+removed after it or put back if it fails.
+
+Every `Decompressed` results in a `ContentAdded` or, if the tree cannot
+be moved, a `DecompressionFailed` pointing to where the tree was left,
+followed by a `PathProcessingFinished` of the expanded tree.  Trees left
+in a sandbox next to the archive are removed instead, as the scanner
+skips those, and the archive is always kept then.  The
+stopper must be configured with `replace` to wait for them.
+
+Configuration:
+
+* `replacer_suffix`: Appended to the path of the archive to get the
+  destination of its content (default: `''`, the archive is replaced).
+
+"""
+import os
+import shutil
+
+from engorgio.entity import Entity
+from engorgio.replacer import move_tree
+from engorgio.replacer import remove_hidden
+from engorgio.replacer import sandbox_for
+from engorgio.signals import ContentAdded
+from engorgio.signals import Decompressed
+from engorgio.signals import DecompressionFailed
+from engorgio.signals import PathProcessingFinished
+
+
+class Replacer(Entity):
+    def _configure(self):
+        config = self.config or {}
+        self.suffix = config.get('replacer_suffix', '')
+
+    def _prepare(self):
+        self._attach(Decompressed, self.on_decompressed)
+
+    def on_decompressed(self, signal):
+        destination = signal.source + self.suffix
+        # Where the tree is at any moment
+        path = signal.path
+        try:
+            staging = sandbox_for(destination)
+            try:
+                move_tree(path, staging)
+            except OSError:
+                # The tree is intact where it was
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+            path = staging
+            if self.suffix:
+                os.rename(staging, destination)
+            else:
+                _replace(signal.source, staging)
+        except OSError as e:
+            if remove_hidden(path):
+                path = None
+            DecompressionFailed(source=signal.source,
+                                path=path,
+                                partial=True,
+                                error=f'{e.__class__.__name__}: {e}').emit()
+        else:
+            ContentAdded(source=signal.source, path=destination,
+                         entries=signal.entries).emit()
+        finally:
+            PathProcessingFinished(path=signal.path).emit()
+
+
+def _replace(archive, staging):
+    """
+    Rename the directory `staging` to `archive`, removing the archive.
+
+    If the directory can't be renamed the archive is left in place.
+
+    """
+    # Named after the staging directory so the scanner skips it too
+    aside = staging + '.archive'
+    os.rename(archive, aside)
+    try:
+        os.rename(staging, archive)
+    except OSError:
+        os.rename(aside, archive)
+        raise
+    try:
+        os.unlink(aside)
+    except OSError:
+        # The content is in place already
+        pass
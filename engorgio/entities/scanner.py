@@ -4,61 +4,206 @@ Scanner
 
 Find files to decompress.
 
+Every path handled by the scanner is finished with a
+`PathProcessingFinished` once everything found in it has been emitted:
+scan requests, directories, content added in place of an archive, and
+symlinks and special files, which are never followed nor expanded.
+
+Added content is scanned on its own, not along with its parent
+directory, and when the decompressor listed the files it wrote they are
+emitted straight from that list, without listing any directory.
+
+The temporary directories where the decompressor expands archives next
+to them, named after `engorgio.replacer.SANDBOX_PREFIX`, are skipped.
+
+Configuration:
+
+* `scanner_batch_size`: Maximum number of entries of a directory emitted
+  together in a single `EntriesFound` signal (default: 1, every entry is
+  emitted on its own).
+* `scanner_workers`: Number of directories scanned at the same time
+  (default: 1).  Walking trees on high latency filesystems, like NFS,
+  is bound by the latency of every `scandir` rather than by bandwidth.
 
 """
+from concurrent.futures import ThreadPoolExecutor
+import itertools
 import os
+import stat
 
 from engorgio.entity import Entity
+from engorgio.signals import ContentAdded
+from engorgio.replacer import SANDBOX_PREFIX
 from engorgio.signals import DirFound
+from engorgio.signals import EntriesFound
+from engorgio.signals import ExitRequested
 from engorgio.signals import FileFound
+from engorgio.signals import PathProcessingFinished
 from engorgio.signals import SpecialFileFound
 from engorgio.signals import SymlinkFound
 from engorgio.signals import UserScanRequested
 
 
+def metadata(st):
+    """
+    Return the metadata carried by `FileFound` and `DirFound` from the
+    `os.stat_result` `st`.
+
+    """
+    return {'device': st.st_dev,
+            'inode': st.st_ino,
+            'size': st.st_size,
+            'mtime': st.st_mtime_ns}
+
+
 def classify_path(path):
     """
     Generate a signal based on the nature of the given path.
 
+    A single `lstat` is done.
+
     """
-    if os.path.islink(path):
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return SpecialFileFound(path=path)
+
+    if stat.S_ISLNK(st.st_mode):
         return SymlinkFound(path=path)
-    elif os.path.isfile(path):
-        return FileFound(path=path)
-    elif os.path.isdir(path):
-        return DirFound(path=path)
+    elif stat.S_ISREG(st.st_mode):
+        return FileFound(path=path, **metadata(st))
+    elif stat.S_ISDIR(st.st_mode):
+        return DirFound(path=path, **metadata(st))
     else:
         return SpecialFileFound(path=path)
 
 
+def _entry_metadata(entry):
+    """
+    Return the metadata of the `os.DirEntry` `entry` or an empty dict if
+    it cannot be read.
+
+    """
+    try:
+        return metadata(entry.stat(follow_symlinks=False))
+    except OSError:
+        return {}
+
+
 def scandir(path):
     """
     Generate a signal for every file and directory found in path.
 
+    The type of the entries comes from the directory itself and files
+    and directories are `lstat` once to fill their metadata.
+
     """
     with os.scandir(path) as dircontent:
         for entry in dircontent:
-            if entry.is_symlink():
+            if entry.name.startswith(SANDBOX_PREFIX):
+                continue
+            elif entry.is_symlink():
                 yield SymlinkFound(path=entry.path)
             elif entry.is_file():
-                yield FileFound(path=entry.path)
+                yield FileFound(path=entry.path, **_entry_metadata(entry))
             elif entry.is_dir():
-                yield DirFound(path=entry.path)
+                yield DirFound(path=entry.path, **_entry_metadata(entry))
             else:
                 yield SpecialFileFound(path=entry.path)
 
 
+def listed(path, entries):
+    """
+    Generate a signal for every file in `entries`, a
+    `ContentAdded.entries` of the directory `path`, without touching the
+    filesystem.
+
+    """
+    for name, size in entries:
+        if size is None:
+            yield SymlinkFound(path=os.path.join(path, name))
+        else:
+            yield FileFound(path=os.path.join(path, name), size=size)
+
+
+def emit_batched(signals, batch_size):
+    """
+    Emit the given signals in `EntriesFound` batches of up to
+    `batch_size` signals.
+
+    """
+    signals = iter(signals)
+    while True:
+        batch = tuple(itertools.islice(signals, batch_size))
+        if len(batch) > 1:
+            EntriesFound(signals=batch).emit()
+        elif batch:
+            batch[0].emit()
+        if len(batch) < batch_size:
+            break
+
+
 class Scanner(Entity):
     def _configure(self):
-        pass
+        config = self.config or {}
+        self.batch_size = config.get('scanner_batch_size', 1)
+        if self.batch_size < 1:
+            raise ValueError(
+                f'Invalid scanner batch size: {self.batch_size}')
+        self.workers = config.get('scanner_workers', 1)
+        self._executor = None
+        if self.workers > 1:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix=self.__class__.__name__)
 
     def _prepare(self):
         self._attach(UserScanRequested, self.on_user_scan_requested)
         self._attach(DirFound, self.on_dir_found)
+        self._attach(ContentAdded, self.on_content_added)
+        self._attach(SymlinkFound, self.on_not_followed)
+        self._attach(SpecialFileFound, self.on_not_followed)
+        self._attach(ExitRequested, self.on_exit_requested)
 
     def on_user_scan_requested(self, signal):
         classify_path(signal.path).emit()
+        PathProcessingFinished(path=signal.path).emit()
+
+    def on_not_followed(self, signal):
+        PathProcessingFinished(path=signal.path).emit()
 
     def on_dir_found(self, signal):
-        for s in scandir(signal.path):
-            s.emit()
+        if self._executor is None:
+            self._scan(signal.path)
+        else:
+            self._executor.submit(self._scan, signal.path)
+
+    def on_content_added(self, signal):
+        if signal.entries is not None:
+            try:
+                emit_batched(listed(signal.path, signal.entries),
+                             self.batch_size)
+            finally:
+                PathProcessingFinished(path=signal.path).emit()
+        else:
+            self.on_dir_found(signal)
+
+    def on_exit_requested(self, signal):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def _scan(self, path):
+        """
+        Emit the contents of the directory `path`.
+
+        With several workers this function is executed in one of the
+        worker threads.
+
+        """
+        try:
+            emit_batched(scandir(path), self.batch_size)
+        except OSError:
+            # Unreadable directories are skipped.
+            pass
+        finally:
+            PathProcessingFinished(path=path).emit()
@@ -1,4 +1,7 @@
-from engorgio.entity import Entity
+from engorgio.entity import INLINE, Entity
+from engorgio.signals import _frozen_dataclass, _Signal
+from engorgio.signals import ContentAdded
+from engorgio.signals import Decompressed
 from engorgio.signals import DirFound
 from engorgio.signals import ExitRequested
 from engorgio.signals import FileFound
@@ -6,25 +9,100 @@ from engorgio.signals import PathProcessingFinished
 from engorgio.signals import SpecialFileFound
 from engorgio.signals import SymlinkFound
 from engorgio.signals import UserScanRequested
+from engorgio.stats import ShardedCounters
+
+#: Signals of a path to be processed
+DISCOVERIES = (DirFound, FileFound, SpecialFileFound, SymlinkFound,
+               UserScanRequested)
+
+
+def discoveries(config):
+    """
+    Return the signals of a path to be processed by a pipeline with the
+    given `config`, see `Stopper`.
+
+    """
+    if config.get('replace', False):
+        return DISCOVERIES + (Decompressed, ContentAdded)
+    return DISCOVERIES
+
+
+@_frozen_dataclass
+class _CompletionCheck(_Signal):
+    """Private to `Stopper`: the counters may match now."""
+    pass
 
 
 class Stopper(Entity):
+    """
+    Emit `ExitRequested` once every path discovered has been processed.
+
+    Discoveries and `PathProcessingFinished` are counted inline, in the
+    emitter thread, on counters owned by that thread, so counting takes
+    no lock and no room in the queue.  A processed path queues a
+    `_CompletionCheck`, unless one is queued already, which adds up the
+    counters of every thread in the entity thread.
+
+    Inline handlers see a signal before any other entity, so a path is
+    always counted as discovered before it can be processed.  Processed
+    paths are added up before discovered ones, so every path counted as
+    processed is also counted as discovered, and both totals only match
+    when there is nothing else to do.
+
+    Configuration:
+
+    * `replace`: Whether a `Replacer` moves the expanded trees, so every
+      `Decompressed` is pending until it does, and every `ContentAdded`
+      until the scanner scans it (default: `False`).
+
+    """
+    _blocking_handlers = False
+
     def _configure(self):
-        self.pending = 0
-        self.processed = 0
+        self.discoveries = discoveries(self.config or {})
+        # Discovered and processed paths
+        self._counters = ShardedCounters(2)
+        self._check_queued = False
+        self._exit_requested = False
 
     def _prepare(self):
-        self._attach(PathProcessingFinished, self.on_file_processed)
-        self._attach(DirFound, self.on_file_discovered)
-        self._attach(FileFound, self.on_file_discovered)
-        self._attach(SpecialFileFound, self.on_file_discovered)
-        self._attach(SymlinkFound, self.on_file_discovered)
-        self._attach(UserScanRequested, self.on_file_discovered)
+        for signal in self.discoveries:
+            self._attach(signal, self.on_file_discovered, INLINE)
+        self._attach(PathProcessingFinished, self.on_file_processed, INLINE)
+        self._attach(_CompletionCheck, self.on_completion_check)
 
-    def on_file_processed(self, signal):
-        self.processed += 1
-        if self.processed == self.pending:
-            ExitRequested().emit()
+    @property
+    def pending(self):
+        """Number of paths discovered."""
+        return self._counters.total(0)
+
+    @property
+    def processed(self):
+        """Number of paths processed."""
+        return self._counters.total(1)
+
+    def progress(self):
+        """Return the number of paths (discovered, processed) so far."""
+        processed = self.processed
+        return self.pending, processed
 
     def on_file_discovered(self, signal):
-        self.pending += 1
+        self._counters.shard()[0] += 1
+
+    def on_file_processed(self, signal):
+        self._counters.shard()[1] += 1
+        # The check clears the flag before adding up, so it either sees
+        # this path or a new check is queued.
+        if not self._check_queued:
+            self._check_queued = True
+            self._enqueue(self, _CompletionCheck())
+
+    def on_completion_check(self, signal):
+        self._check_queued = False
+        if self._exit_requested:
+            return
+        processed = self.processed
+        pending = self.pending
+        if pending and processed == pending:
+            self._exit_requested = True
+            ExitRequested().emit()
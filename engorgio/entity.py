@@ -1,10 +1,28 @@
 from collections import defaultdict
 from enum import Enum, auto
 import abc
-import queue
+import logging
 import threading
+import time
 
+from engorgio.mailbox import BLOCK, Mailbox
+from engorgio.signals import EntriesFound
 from engorgio.signals import ExitRequested
+from engorgio.stats import EntityStats
+
+logger = logging.getLogger(__name__)
+
+#: Handler mode running the handler in the entity thread
+QUEUED = 'queued'
+
+#: Handler mode running the handler in the emitter thread
+INLINE = 'inline'
+
+#: Handler mode running the handler in the entity thread with the number
+#: of signals received since the last call
+COALESCED = 'coalesced'
+
+HANDLER_MODES = (QUEUED, INLINE, COALESCED)
 
 
 class _State(Enum):
@@ -15,6 +33,14 @@ class _State(Enum):
     JOINED = auto()
 
 
+class _CoalescedMarker:
+    """Tells an entity that there are coalesced signals to handle."""
+    __slots__ = ()
+
+
+_COALESCED_MARKER = _CoalescedMarker()
+
+
 class Entity(abc.ABC):
     """
     Encapsulate some functionality in a concurrent execution unit.
@@ -28,14 +54,54 @@ class Entity(abc.ABC):
     called in that exact order.  Any other order will result in a
     `RuntimeException`.
 
+    Signals wait to be processed in a mailbox, see `engorgio.mailbox`.
+    The subclass can bound the number of signals waiting by setting
+    `self._queue_maxsize` in `_configure`.  When the mailbox is full the
+    emitters block until there is room again or, if `self._queue_policy`
+    is `engorgio.mailbox.DROP`, the signals are dropped.
+    `ExitRequested` is never blocked nor dropped.  Another mailbox
+    implementation can be plugged in by setting `self._mailbox`.
+
+    Handlers can also be run without queueing every signal, see
+    `_attach`.
+
+    By default every entity consumes its mailbox in its own thread.
+    Entities can share an event loop instead, see `start`.  Then the
+    handlers run in a thread of the runtime unless the subclass sets
+    `self._blocking_handlers` to `False`, promising that its handlers
+    never block.
+
+    Instrumentation is disabled by default, see `enable_stats`.
+
     """
+    _mailbox = Mailbox
+    _queue_maxsize = 0
+    _queue_policy = BLOCK
+    _blocking_handlers = True
+
     def __init__(self, config):
         self.config = config
         self._state = _State.INIT
         self._attached = defaultdict(set)
-        self._queue = queue.Queue()
+        self._inline = defaultdict(set)
+        # Coalesced handler -> signals it is attached to, in attach order
+        self._coalesced = {}
+        self._coalesced_signals = set()
+        self._coalesced_counts = defaultdict(int)
+        self._coalesced_lock = threading.Lock()
+        self._coalesced_marker_queued = False
         self._thread = None
+        self._runtime = None
+        self._task = None
+        self._stats = None
+        self._stats_interval = None
+        self._stats_stop = threading.Event()
         self._configure()
+        self._queue = self._mailbox(maxsize=self._queue_maxsize,
+                                    policy=self._queue_policy,
+                                    urgent=(ExitRequested,
+                                            _CoalescedMarker))
+        self._attached[_CoalescedMarker].add(self._flush_coalesced)
 
     @abc.abstractmethod
     def _configure(self):  # pragma: no cover
@@ -56,58 +122,312 @@ class Entity(abc.ABC):
         ExitRequested.connect(self._enqueue)
         self._prepare()
 
-    def start(self):
+    def start(self, runtime=None):
         """
         Start `self._dequeue` in a new thread referenced by `self._thread`.
 
+        If an `engorgio.runtime.AsyncRuntime` is given, start
+        `self._dequeue_async` in its event loop instead.
+
         """
         if self._state is not _State.PREPARED:
             raise RuntimeError(
                 f'Cannot start() when state is {self._state.name}')
+        if runtime is not None and not hasattr(self._queue,
+                                               'get_many_async'):
+            raise TypeError(
+                f'{self._mailbox.__name__} cannot be consumed by a runtime')
         self._state = _State.STARTED
-        self._thread = threading.Thread(group=None, target=self._dequeue)
-        self._thread.start()
+        if runtime is None:
+            self._thread = threading.Thread(group=None,
+                                            target=self._dequeue)
+            self._thread.start()
+        else:
+            self._runtime = runtime
+            self._task = runtime.submit(self._dequeue_async())
+        if self._stats_interval:
+            threading.Thread(target=self._dump_stats, daemon=True).start()
 
     def join(self):
         """
-        Wait for `self._thread` to finish.
+        Wait for `self._thread`, or the runtime task, to finish.
+
+        Once finished nobody would consume `self._queue`, so the entity
+        is disconnected from all the signals.
 
         """
         if self._state is not _State.STARTED:
             raise RuntimeError(
                 f'Cannot join() when state is {self._state.name}')
-        self._thread.join()
-        self._state = _State.JOINED
+        try:
+            if self._task is not None:
+                # Raises any exception raised by the handlers
+                self._task.result()
+            else:
+                self._thread.join()
+        finally:
+            self._disconnect()
+            self._state = _State.JOINED
+
+    def _disconnect(self):
+        """Disconnect the entity from all the signals."""
+        self._stats_stop.set()
+        ExitRequested.disconnect(self._enqueue)
+        for signal in self._attached:
+            if signal is not _CoalescedMarker:
+                signal.disconnect(self._enqueue)
+        for signal in self._inline:
+            signal.disconnect_inline(self._run_inline)
+        if set(self._inline) & set(EntriesFound.kinds):
+            EntriesFound.disconnect_inline(self._run_inline)
+        for signal in self._coalesced_signals:
+            signal.disconnect(self._coalesce)
+        if self._coalesced_signals & set(EntriesFound.kinds):
+            EntriesFound.disconnect(self._coalesce)
+
+    def enable_stats(self, interval=None):
+        """
+        Collect statistics about the signals flowing through this
+        entity, see `stats`.  If `interval` is given the statistics are
+        also logged every `interval` seconds.
+
+        Must be called before `start`.
+
+        """
+        if self._state not in (_State.INIT, _State.PREPARED):
+            raise RuntimeError(
+                f'Cannot enable_stats() when state is {self._state.name}')
+        self._stats = EntityStats()
+        self._stats_interval = interval
+
+    def stats(self):
+        """
+        Return a dictionary with the statistics of this entity or `None`
+        if instrumentation is not enabled.
+
+        The statistics contain the current and maximum depth of the
+        queue, the signals enqueued and processed by type, the processing
+        rate, and latency histograms of the time waiting for signals and
+        of the time spent by the handlers of every signal type.
+
+        """
+        if self._stats is None:
+            return None
+        return self._stats.as_dict(self._queue.qsize())
+
+    def queue_depth(self):
+        """
+        Return the number of signals waiting to be processed.
+
+        Always available and cheap, unlike `stats`.
+
+        """
+        return self._queue.qsize()
+
+    def _dump_stats(self):
+        """
+        Log the statistics every `self._stats_interval` seconds until
+        the entity is joined.
+
+        This function is executed in a separate thread.
+
+        """
+        name = self.__class__.__name__
+        while not self._stats_stop.wait(self._stats_interval):
+            logger.info('%s stats: %r', name, self.stats())
 
-    def _attach(self, signal, handler):
+    def _attach(self, signal, handler, mode=QUEUED):
         """
         Arrange that `handler` be called when `signal` arrives.
 
+        Depending on `mode`, `handler` is called:
+
+        * `QUEUED`: with the signal, in the entity thread, after the
+          signals queued before.
+        * `INLINE`: with the signal, in the emitter thread, as soon as it
+          is emitted and before it reaches any queue, so before any other
+          entity can act on it.  The handler must be cheap and thread
+          safe.
+        * `COALESCED`: with the number of signals arrived since the last
+          call, in the entity thread.  Signals arriving while there is a
+          call pending only increment a counter, so they take no room
+          in the queue.  Coalesced handlers are called in the order they
+          were attached.
+
+        Signals that can be batched in an `EntriesFound` are also
+        received when they come in a batch.
+
         """
-        if signal not in self._attached:
-            signal.connect(self._enqueue)
-        self._attached[signal].add(handler)
+        if mode == QUEUED:
+            if signal not in self._attached:
+                signal.connect(self._enqueue)
+                if signal in EntriesFound.kinds:
+                    self._attach(EntriesFound, self._fan_out)
+            self._attached[signal].add(handler)
+        elif mode == INLINE:
+            if signal not in self._inline:
+                signal.connect_inline(self._run_inline)
+                if signal in EntriesFound.kinds:
+                    EntriesFound.connect_inline(self._run_inline)
+            self._inline[signal].add(handler)
+        elif mode == COALESCED:
+            if signal not in self._coalesced_signals:
+                signal.connect(self._coalesce)
+                if signal in EntriesFound.kinds:
+                    EntriesFound.connect(self._coalesce)
+                self._coalesced_signals.add(signal)
+            self._coalesced.setdefault(handler, set()).add(signal)
+        else:
+            raise ValueError(f'Unknown handler mode {mode!r}')
 
     def _dispatch(self, signal):
         """
         Call all handlers attached by `self._attach` to `signal`.
 
         """
-        for handler in self._attached[signal.__class__]:
+        for handler in self._attached.get(signal.__class__, ()):
             handler(signal)
 
+    def _fan_out(self, batch):
+        """
+        Dispatch every signal contained in the `EntriesFound` batch.
+
+        """
+        for signal in batch.signals:
+            self._dispatch(signal)
+
+    def _run_inline(self, sender, signal):
+        """
+        Call the handlers attached in `INLINE` mode to `signal`, or to
+        every signal of an `EntriesFound` batch.
+
+        Is called in the emitter thread.
+
+        """
+        if isinstance(signal, EntriesFound):
+            for entry in signal.signals:
+                for handler in self._inline.get(entry.__class__, ()):
+                    handler(entry)
+        else:
+            for handler in self._inline.get(signal.__class__, ()):
+                handler(signal)
+
+    def _coalesce(self, sender, signal):
+        """
+        Count `signal`, or every signal of an `EntriesFound` batch, for
+        the handlers attached in `COALESCED` mode, and queue a marker to
+        call them unless there is one queued already.
+
+        Is called in the emitter thread.
+
+        """
+        if isinstance(signal, EntriesFound):
+            classes = [entry.__class__ for entry in signal.signals
+                       if entry.__class__ in self._coalesced_signals]
+            if not classes:
+                return
+        else:
+            classes = [signal.__class__]
+        with self._coalesced_lock:
+            for cls in classes:
+                self._coalesced_counts[cls] += 1
+            if self._coalesced_marker_queued:
+                return
+            self._coalesced_marker_queued = True
+        self._enqueue(sender, _COALESCED_MARKER)
+
+    def _flush_coalesced(self, marker):
+        """
+        Call every handler attached in `COALESCED` mode with the number
+        of its signals counted since the previous call.
+
+        """
+        with self._coalesced_lock:
+            counts = self._coalesced_counts
+            self._coalesced_counts = defaultdict(int)
+            self._coalesced_marker_queued = False
+        for handler, signals in self._coalesced.items():
+            count = sum(counts.get(signal, 0) for signal in signals)
+            if count:
+                handler(count)
+
     def _dequeue(self):
         """
         Dequeue from `self._queue` until an `ExitRequested` arrives.
 
+        Signals are taken from the mailbox in batches, to pay the cost of
+        waiting once for all the signals already there.
+
         This function is executed in a separate thread.
 
         """
+        if self._stats is not None:
+            return self._dequeue_instrumented()
         while True:
-            signal = self._queue.get()
-            self._dispatch(signal)
+            for signal in self._queue.get_many():
+                self._dispatch(signal)
+                if isinstance(signal, ExitRequested):
+                    return
+
+    def _dequeue_instrumented(self):
+        """
+        Like `_dequeue` but measuring the time spent waiting and
+        dispatching.
+
+        """
+        clock = time.perf_counter
+        while True:
+            start = clock()
+            signals = self._queue.get_many()
+            self._stats.waited(clock() - start)
+            for signal in signals:
+                dispatched = clock()
+                self._dispatch(signal)
+                self._stats.dispatched(signal, clock() - dispatched)
+                if isinstance(signal, ExitRequested):
+                    return
+
+    async def _dequeue_async(self):
+        """
+        Like `_dequeue` but as a coroutine running in `self._runtime`.
+
+        Every batch of signals is dispatched in a thread of the runtime
+        (see `AsyncRuntime.dispatch`) when `self._blocking_handlers` is
+        set.
+
+        """
+        clock = time.perf_counter
+        while True:
+            start = clock()
+            signals = await self._queue.get_many_async()
+            if self._stats is not None:
+                self._stats.waited(clock() - start)
+            if self._blocking_handlers:
+                done = await self._runtime.dispatch(
+                    self._dispatch_batch, signals)
+            else:
+                done = self._dispatch_batch(signals)
+            if done:
+                return
+
+    def _dispatch_batch(self, signals):
+        """
+        Dispatch `signals` in order up to an `ExitRequested`, and return
+        whether there was one.
+
+        """
+        stats = self._stats
+        clock = time.perf_counter
+        for signal in signals:
+            if stats is None:
+                self._dispatch(signal)
+            else:
+                start = clock()
+                self._dispatch(signal)
+                stats.dispatched(signal, clock() - start)
             if isinstance(signal, ExitRequested):
-                break
+                return True
+        return False
 
     def _enqueue(self, sender, signal):
         """
@@ -119,6 +439,8 @@ class Entity(abc.ABC):
 
         """
         self._queue.put(signal)
+        if self._stats is not None:
+            self._stats.enqueued(signal, self._queue.qsize())
 
 
 def prepare_all(*entities):
@@ -127,10 +449,10 @@ def prepare_all(*entities):
         entity.prepare()
 
 
-def start_all(*entities):
-    """Start all given entities."""
+def start_all(*entities, runtime=None):
+    """Start all given entities, in `runtime` if given."""
     for entity in entities:
-        entity.start()
+        entity.start(runtime)
 
 
 def join_all(*entities):
@@ -0,0 +1,202 @@
+"""
+Mailboxes holding the signals waiting to be processed by an `Entity`.
+
+`Mailbox` is a `collections.deque` plus an event to wake the consumer
+up, so putting a signal while the consumer is busy costs an append and
+no lock.  It can be bounded, in which case a full mailbox either blocks
+the producers or drops the incoming signals, depending on its policy.
+
+`QueueMailbox` offers the same interface on top of `queue.Queue`.
+
+Both are safe to use with many producers and a single consumer.  The
+consumer of a `Mailbox` can also be a coroutine, see `get_many_async`.
+
+"""
+from collections import deque
+import asyncio
+import queue
+import threading
+
+#: Policy blocking the producers while the mailbox is full
+BLOCK = 'block'
+
+#: Policy dropping the signals put while the mailbox is full
+DROP = 'drop'
+
+POLICIES = (BLOCK, DROP)
+
+
+class Mailbox:
+    """
+    Mailbox holding up to `maxsize` items, or unbounded if `maxsize` is
+    0.
+
+    When full, `put` blocks or drops the item depending on `policy`.
+    Items instance of any of the `urgent` types are never blocked nor
+    dropped: they don't count against `maxsize`.
+
+    """
+    def __init__(self, maxsize=0, policy=BLOCK, urgent=()):
+        if policy not in POLICIES:
+            raise ValueError(f'Unknown mailbox policy {policy!r}')
+        self.maxsize = maxsize
+        self.policy = policy
+        self.urgent = urgent
+        #: Number of items dropped because the mailbox was full
+        self.dropped = 0
+        # Compared by value, policies may come from configuration files
+        self._blocking = policy == BLOCK
+        self._dropped_lock = threading.Lock()
+        self._items = deque()
+        self._not_empty = threading.Event()
+        self._slots = threading.Semaphore(maxsize) if maxsize else None
+        # Event loop and future of a coroutine waiting in get_many_async
+        self._loop = None
+        self._waiter = None
+
+    def put(self, item):
+        """
+        Add `item` to the mailbox.
+
+        Return whether the item was added, it is not if it was dropped.
+
+        """
+        if self._slots is not None and not isinstance(item, self.urgent):
+            if not self._slots.acquire(blocking=self._blocking):
+                with self._dropped_lock:
+                    self.dropped += 1
+                return False
+        self._items.append(item)
+        # The consumer sets the waiter or clears the event before checking
+        # the items, so it is either woken up or will find the item.
+        waiter = self._waiter
+        if waiter is not None:
+            # Wake the consumer up once, not on every item
+            self._waiter = None
+            self._loop.call_soon_threadsafe(_wake_up, waiter)
+        elif not self._not_empty.is_set():
+            self._not_empty.set()
+        return True
+
+    def get(self):
+        """Remove and return the oldest item, waiting for one if empty."""
+        return self.get_many(1)[0]
+
+    def get_many(self, max_items=None):
+        """
+        Remove and return a list with the oldest items, up to
+        `max_items` or all of them if `None`, waiting for one if empty.
+
+        """
+        items = self._items
+        while not items:
+            self._not_empty.clear()
+            if items:
+                break
+            self._not_empty.wait()
+        return self._take(max_items)
+
+    async def get_many_async(self, max_items=None):
+        """
+        Like `get_many`, but waiting in the running event loop instead of
+        blocking the thread.
+
+        """
+        items = self._items
+        while not items:
+            self._loop = asyncio.get_running_loop()
+            self._waiter = self._loop.create_future()
+            if not items:
+                await self._waiter
+            self._waiter = None
+        return self._take(max_items)
+
+    def _take(self, max_items):
+        """
+        Remove and return up to `max_items` of the oldest items, or all
+        of them if `None`.
+
+        """
+        items = self._items
+        if max_items is None:
+            max_items = len(items)
+        batch = []
+        popleft = items.popleft
+        while len(batch) < max_items:
+            try:
+                batch.append(popleft())
+            except IndexError:
+                break
+        if self._slots is not None:
+            for item in batch:
+                if not isinstance(item, self.urgent):
+                    self._slots.release()
+        return batch
+
+    def qsize(self):
+        """Return the number of items in the mailbox."""
+        return len(self._items)
+
+    def empty(self):
+        """Return whether the mailbox has no items."""
+        return not self._items
+
+
+def _wake_up(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class QueueMailbox:
+    """
+    Mailbox with the interface of `Mailbox` implemented with a
+    `queue.Queue`.
+
+    """
+    def __init__(self, maxsize=0, policy=BLOCK, urgent=()):
+        if policy not in POLICIES:
+            raise ValueError(f'Unknown mailbox policy {policy!r}')
+        self.maxsize = maxsize
+        self.policy = policy
+        self.urgent = urgent
+        self.dropped = 0
+        self._blocking = policy == BLOCK
+        self._dropped_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._slots = threading.Semaphore(maxsize) if maxsize else None
+
+    def put(self, item):
+        """See `Mailbox.put`."""
+        if self._slots is not None and not isinstance(item, self.urgent):
+            if not self._slots.acquire(blocking=self._blocking):
+                with self._dropped_lock:
+                    self.dropped += 1
+                return False
+        self._queue.put(item)
+        return True
+
+    def get(self):
+        """See `Mailbox.get`."""
+        return self.get_many(1)[0]
+
+    def get_many(self, max_items=None):
+        """See `Mailbox.get_many`."""
+        batch = [self._queue.get()]
+        while max_items is None or len(batch) < max_items:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if self._slots is not None:
+            for item in batch:
+                if not isinstance(item, self.urgent):
+                    self._slots.release()
+        return batch
+
+    def qsize(self):
+        """See `Mailbox.qsize`."""
+        return self._queue.qsize()
+
+    def empty(self):
+        """See `Mailbox.empty`."""
+        return self._queue.empty()
@@ -0,0 +1,159 @@
+"""
+Keep the metadata that expanding an archive loses.
+
+Expanded files get the mode and mtime of a freshly written file, and the
+archive itself, along with its comment, may be gone once its content
+replaces it.  `MetadataWriter` appends that metadata to a JSON lines
+file, one object per line:
+
+* `{"archive": ..., "comment": ...}` for every archive with a comment.
+* `{"archive": ..., "entry": ..., "mode": ..., "mtime": ...}` for every
+  entry written, `entry` being its name relative to the expanded tree,
+  `mode` its `st_mode` and `mtime` its modification time in seconds
+  since the epoch, as stored in the archive.
+
+"""
+from json.encoder import encode_basestring_ascii
+import logging
+import os
+import struct
+import threading
+
+from engorgio.mailbox import Mailbox
+from engorgio.sniffer import sniff_header
+
+logger = logging.getLogger(__name__)
+
+#: Bytes buffered before writing to the file
+BUFFER_SIZE = 4 * 1024 * 1024
+
+#: Lines encoded before handing them to the file buffer
+BATCH_LINES = 8192
+
+#: Archives waiting to be written before `MetadataWriter.add` blocks
+MAX_PENDING = 256
+
+#: Zip end of central directory record, up to the comment length
+ZIP_END = struct.Struct('<4s4H2LH')
+ZIP_END_MAGIC = b'PK\x05\x06'
+ZIP_MAX_COMMENT = 0xffff
+
+
+def zip_comment(path):
+    """
+    Return the comment of the zip archive at `path`, or `None` if it is
+    not a zip archive or has no comment.
+
+    Only the tail of the file is read.
+
+    """
+    with open(path, 'rb') as f:
+        if sniff_header(f.read(len(ZIP_END_MAGIC))) != 'zip':
+            return None
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - ZIP_END.size - ZIP_MAX_COMMENT))
+        tail = f.read()
+    # The comment may contain the magic too, so the right record is the
+    # one whose comment reaches the end of the file.
+    start = tail.rfind(ZIP_END_MAGIC)
+    while start >= 0:
+        if start + ZIP_END.size <= len(tail):
+            length = ZIP_END.unpack_from(tail, start)[-1]
+            if start + ZIP_END.size + length == len(tail):
+                comment = tail[start + ZIP_END.size:]
+                return comment.decode('utf-8', 'replace') or None
+        start = tail.rfind(ZIP_END_MAGIC, 0, start)
+    return None
+
+
+def records(source, comment, entries):
+    """
+    Generate the lines recording the `comment` and the `entries`, a
+    `Decompressed.metadata`, of the archive at `source`.
+
+    """
+    archive = '{"archive": ' + encode_basestring_ascii(source)
+    if comment is not None:
+        yield (archive + ', "comment": '
+               + encode_basestring_ascii(comment) + '}\n')
+    entry = archive + ', "entry": '
+    for name, mode, mtime in entries:
+        yield (entry + encode_basestring_ascii(name)
+               + f', "mode": {mode}, "mtime": {mtime}}}\n')
+
+
+class MetadataWriter:
+    """
+    Append the metadata of expanded archives to the file at `path`.
+
+    `add` only queues the metadata: a dedicated thread encodes it and
+    writes it in batches through a `buffer_size` bytes buffer.  The file
+    is synced once, on `close`, not on every write.
+
+    Write errors are logged and the metadata that follows is discarded,
+    so producers never block on a broken file.
+
+    """
+    def __init__(self, path, buffer_size=BUFFER_SIZE):
+        self.path = path
+        #: Number of lines written
+        self.written = 0
+        self._file = open(path, 'a', encoding='ascii', buffering=buffer_size)
+        self._failed = False
+        self._pending = Mailbox(MAX_PENDING)
+        self._thread = threading.Thread(target=self._write,
+                                        name=self.__class__.__name__,
+                                        daemon=True)
+        self._thread.start()
+
+    def add(self, source, comment, entries):
+        """
+        Queue the `comment` and the `entries`, a `Decompressed.metadata`,
+        of the archive at `source` to be written.
+
+        """
+        self._pending.put((source, comment, entries))
+
+    def close(self):
+        """Write everything queued, sync the file and close it."""
+        self._pending.put(None)
+        self._thread.join()
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError as e:
+            self._fail(e)
+        finally:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+
+    def _write(self):
+        while True:
+            lines = []
+            for item in self._pending.get_many():
+                if item is None:
+                    self._write_lines(lines)
+                    return
+                for line in records(*item):
+                    lines.append(line)
+                    if len(lines) >= BATCH_LINES:
+                        self._write_lines(lines)
+                        lines = []
+            self._write_lines(lines)
+
+    def _write_lines(self, lines):
+        if self._failed or not lines:
+            return
+        try:
+            self._file.write(''.join(lines))
+        except OSError as e:
+            self._fail(e)
+        else:
+            self.written += len(lines)
+
+    def _fail(self, error):
+        if not self._failed:
+            self._failed = True
+            logger.error('Cannot write metadata to %s: %s', self.path, error)
@@ -0,0 +1,190 @@
+"""
+Move expanded trees to their final destination without copying them
+whenever possible.
+
+A tree is renamed when it sits on the same filesystem as its
+destination, which moves no data at all.  Across filesystems every file
+is cloned (reflink) if the filesystem supports it, copied in the kernel
+with `copy_file_range` or `sendfile` otherwise, and only as a last
+resort read and written through a buffer.
+
+"""
+import errno
+import os
+import shutil
+import tempfile
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+#: Prefix of the temporary directories created next to the content, so
+#: the scanner can skip them
+SANDBOX_PREFIX = '.engorgio-'
+
+#: `ioctl` cloning a whole file on Linux (Btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+#: Bytes copied by every call to `copy_file_range` and `sendfile`
+KERNEL_COPY_CHUNK_SIZE = 64 * 1024 * 1024
+
+#: Size of the buffer of the last resort copy
+BUFFER_SIZE = 1024 * 1024
+
+# Errors meaning that a copy method is not supported for the given files
+_UNSUPPORTED = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP,
+                errno.ENOTTY, errno.EBADF, errno.EPERM, errno.ENOTSUP}
+
+
+def sandbox_for(path):
+    """
+    Create and return a temporary directory on the same device as
+    `path`, next to it, so a tree expanded there can be renamed into
+    `path`'s directory.
+
+    """
+    return tempfile.mkdtemp(prefix=SANDBOX_PREFIX,
+                            dir=os.path.dirname(os.path.abspath(path)))
+
+
+def remove_hidden(path):
+    """
+    Remove the tree at `path` if it is a directory created by
+    `sandbox_for` or lies right in one, and return whether it was.
+
+    The scanner skips those directories, so nobody would ever find a
+    tree left there.
+
+    """
+    if path is None:
+        return False
+    names = (os.path.basename(path),
+             os.path.basename(os.path.dirname(path)))
+    if not any(name.startswith(SANDBOX_PREFIX) for name in names):
+        return False
+    shutil.rmtree(path, ignore_errors=True)
+    return True
+
+
+def move_tree(source, destination):
+    """
+    Move the directory `source` to `destination`, which must not exist
+    or be an empty directory.
+
+    Renamed if both are on the same filesystem, copied with `copy_tree`
+    and then removed otherwise.  On error `source` is left intact.
+
+    """
+    try:
+        os.rename(source, destination)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    copy_tree(source, destination)
+    # Whatever cannot be removed is left behind in the sandbox, the
+    # content is already in its destination.
+    shutil.rmtree(source, ignore_errors=True)
+
+
+def copy_tree(source, destination):
+    """
+    Replicate the directory `source` in `destination`, which may already
+    exist, copying the files with `copy_file`.
+
+    Symlinks are replicated as symlinks and files hard linked among
+    themselves are hard linked in the copy too.
+
+    """
+    os.makedirs(destination, exist_ok=True)
+    # (device, inode) -> copy of the first link found
+    copied = {}
+    directories = []
+    for dirpath, dirnames, filenames in os.walk(source):
+        target = os.path.normpath(
+            os.path.join(destination, os.path.relpath(dirpath, source)))
+        directories.append((dirpath, target))
+        for name in dirnames:
+            src = os.path.join(dirpath, name)
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), os.path.join(target, name))
+            else:
+                os.mkdir(os.path.join(target, name))
+        for name in filenames:
+            src = os.path.join(dirpath, name)
+            dst = os.path.join(target, name)
+            st = os.lstat(src)
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), dst)
+            elif st.st_nlink > 1 and (st.st_dev, st.st_ino) in copied:
+                os.link(copied[st.st_dev, st.st_ino], dst)
+            else:
+                copy_file(src, dst)
+                if st.st_nlink > 1:
+                    copied[st.st_dev, st.st_ino] = dst
+    # Children change the mtime of their directories, so they go last
+    for dirpath, target in reversed(directories):
+        shutil.copystat(dirpath, target)
+
+
+def copy_file(source, destination):
+    """
+    Copy the regular file `source` to `destination` with the cheapest
+    method supported by both filesystems, along with its permissions
+    and times.
+
+    """
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        if not (_reflink(src, dst)
+                or _kernel_copy(_copy_file_range, src, dst)
+                or _kernel_copy(_sendfile, src, dst)):
+            shutil.copyfileobj(src, dst, BUFFER_SIZE)
+    shutil.copystat(source, destination)
+
+
+def _reflink(src, dst):
+    """Clone `src` into `dst` and return whether it could."""
+    if fcntl is None:
+        return False
+    try:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    except OSError as e:
+        if e.errno in _UNSUPPORTED:
+            return False
+        raise
+    return True
+
+
+def _copy_file_range(src_fd, dst_fd, count):
+    if not hasattr(os, 'copy_file_range'):  # Python < 3.8 or not Linux
+        raise OSError(errno.ENOSYS, 'copy_file_range is not available')
+    return os.copy_file_range(src_fd, dst_fd, count)
+
+
+def _sendfile(src_fd, dst_fd, count):
+    if not hasattr(os, 'sendfile'):
+        raise OSError(errno.ENOSYS, 'sendfile is not available')
+    return os.sendfile(dst_fd, src_fd, None, count)
+
+
+def _kernel_copy(copy, src, dst):
+    """
+    Copy `src` into `dst` with `copy(src_fd, dst_fd, count)`, from and to
+    the current offsets, and return whether it could.
+
+    `False` is only returned when nothing was copied, so another method
+    can start over.
+
+    """
+    copied = 0
+    while True:
+        try:
+            count = copy(src.fileno(), dst.fileno(), KERNEL_COPY_CHUNK_SIZE)
+        except OSError as e:
+            if not copied and e.errno in _UNSUPPORTED:
+                return False
+            raise
+        if not count:
+            return True
+        copied += count
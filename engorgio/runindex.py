@@ -0,0 +1,83 @@
+"""
+Remember the files processed by previous runs, so reruns over the same
+tree only process what changed.
+
+Files are identified by their path, device, inode, size and modification
+time, as carried by `FileFound`.  The index is an SQLite database and
+additions are committed in batches.
+
+"""
+import os
+import sqlite3
+import threading
+
+#: Number of additions between commits
+COMMIT_EVERY = 1024
+
+
+class RunIndex:
+    """
+    Index of the files processed, stored in an SQLite database at
+    `path`.
+
+    All the methods are thread safe.
+
+    """
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS files ('
+                         ' path TEXT PRIMARY KEY,'
+                         ' device INTEGER NOT NULL,'
+                         ' inode INTEGER NOT NULL,'
+                         ' size INTEGER NOT NULL,'
+                         ' mtime INTEGER NOT NULL)')
+
+    def is_unchanged(self, signal):
+        """
+        Return whether the file of the `FileFound` `signal` was
+        processed before and didn't change since then.
+
+        """
+        key = _key(signal)
+        with self._lock:
+            row = self._db.execute(
+                'SELECT device, inode, size, mtime FROM files'
+                ' WHERE path = ?', (signal.path,)).fetchone()
+        return row is not None and tuple(row) == key
+
+    def record(self, signal):
+        """Record that the file of the `FileFound` `signal` was processed."""
+        key = _key(signal)
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO files'
+                ' (path, device, inode, size, mtime) VALUES (?, ?, ?, ?, ?)',
+                (signal.path,) + key)
+            self._uncommitted += 1
+            if self._uncommitted >= COMMIT_EVERY:
+                self._db.commit()
+                self._uncommitted = 0
+
+    def close(self):
+        """Write any pending change to disk."""
+        with self._lock:
+            if self._db is not None:
+                self._db.commit()
+                self._db.close()
+                self._db = None
+
+
+def _key(signal):
+    """
+    Return the (device, inode, size, mtime) of the `FileFound` `signal`,
+    doing a `stat` only if the signal doesn't carry them.
+
+    """
+    key = (signal.device, signal.inode, signal.size, signal.mtime)
+    if None in key:
+        st = os.stat(signal.path)
+        key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+    return key
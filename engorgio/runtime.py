@@ -0,0 +1,89 @@
+"""
+Event loop shared by entities as an alternative to a thread per entity.
+
+Entities started on an `AsyncRuntime` (see `engorgio.entity.Entity.start`)
+consume their mailboxes as coroutines in a single event loop, so idle
+entities don't hold a thread.  Handlers that may block run in threads
+taken only while there is work.
+
+Those handlers may block on the bounded mailbox of another entity, which
+only makes room once its own handlers get a thread, so every entity
+dispatching gets one right away: there are never more dispatch threads
+than blocking entities, and idle ones are reused.
+
+"""
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import sys
+import threading
+
+
+class AsyncRuntime:
+    """
+    An asyncio event loop running in its own thread, plus an executor of
+    up to `workers` threads to run blocking code.
+
+    The handlers of the entities don't take threads from that executor,
+    see `dispatch`.
+
+    """
+    def __init__(self, workers=None):
+        self.loop = asyncio.new_event_loop()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        # Unbounded: an entity awaits its batch before dispatching more,
+        # so it is bounded by the number of entities.
+        self._dispatchers = ThreadPoolExecutor(
+            max_workers=sys.maxsize,
+            thread_name_prefix=f'{self.__class__.__name__}-dispatch')
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coroutine):
+        """
+        Schedule `coroutine` in the event loop and return a
+        `concurrent.futures.Future` with its result.
+
+        Can be called from any thread.
+
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run_blocking(self, func, *args):
+        """
+        Return an awaitable with the result of calling `func(*args)` in
+        the executor.
+
+        Must be called from the event loop.
+
+        """
+        return self.loop.run_in_executor(self._executor, func, *args)
+
+    def dispatch(self, func, *args):
+        """
+        Like `run_blocking` but in a thread that is never waited for, to
+        run the handlers of an entity.
+
+        Must be called from the event loop.
+
+        """
+        return self.loop.run_in_executor(self._dispatchers, func, *args)
+
+    def close(self):
+        """Stop the event loop and the executor."""
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self._executor.shutdown()
+        self._dispatchers.shutdown()
+        self.loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,295 @@
+"""
+This module contains the signals used by `engorgio` to exchange
+information among its internal components.
+
+Signals are immutable dataclasses containing some information produced
+by one of the aforementioned components and received by any component(s)
+interested on them.
+
+To subscribe to a particular signal use the `connect` method passing a
+handler.  For example to subscribe to the `UserScanRequested` signal do
+the following::
+
+>>> def handler(sender, signal):
+...     print(f"{signal} received!")
+...
+>>> UserScanRequested.connect(handler)
+
+Then at any time a `UserScanRequested` signal is emitted the `handler`
+will be called::
+
+>>> UserScanRequested(path="some path").emit()
+UserScanRequested(path="some path") received!
+
+Signals are delivered in process.  To exchange them with other processes
+or machines see `engorgio.signals.transport`.
+
+"""
+from dataclasses import FrozenInstanceError, dataclass, field, fields
+
+import blinker
+
+
+class _Signal:
+    """
+    Base class for all signals.
+
+    Provides utility functions to interface with `blinker`.
+
+    The blinker signal is looked up once, when the subclass is created,
+    instead of on every `emit`.
+
+    """
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._blinker_signal = blinker.signal(cls.__name__)
+        # Replaced instead of modified, so `emit` needs no lock
+        cls._inline_receivers = ()
+
+    @property
+    def _signal(self):
+        """
+        A singleton of a blinker signal named after the current class.
+
+        """
+        return self._blinker_signal
+
+    @classmethod
+    def connect(cls, handler):
+        """
+        Connect the given handler with this signal type so it will
+        receive any *emitted* signal of this type.
+
+        The handler function should have the following signature:
+
+        >>> def handler(sender, signal):
+        ...     pass
+
+        """
+        cls._blinker_signal.connect(handler)
+
+    @classmethod
+    def disconnect(cls, handler):
+        """
+        Disconnect the given handler previously connected with
+        `connect`.
+
+        """
+        cls._blinker_signal.disconnect(handler)
+
+    @classmethod
+    def connect_inline(cls, handler):
+        """
+        Like `connect`, but `handler` is called before any handler
+        connected with `connect`, so it sees the signal before anybody
+        can act on it.
+
+        The handler is referenced strongly until `disconnect_inline`.
+
+        """
+        if handler not in cls._inline_receivers:
+            cls._inline_receivers = cls._inline_receivers + (handler,)
+
+    @classmethod
+    def disconnect_inline(cls, handler):
+        """
+        Disconnect the given handler previously connected with
+        `connect_inline`.
+
+        """
+        cls._inline_receivers = tuple(
+            receiver for receiver in cls._inline_receivers
+            if receiver != handler)
+
+    def __reduce__(self):
+        # Frozen dataclasses with __slots__ cannot be unpickled by
+        # setting their attributes, so pickle them by their fields.
+        return (self.__class__,
+                tuple(getattr(self, f.name) for f in fields(self)))
+
+    def emit(self, sender=None):
+        """
+        Emit this signal to all the handlers connected to this type of
+        signal, first to those connected with `connect_inline`.
+
+        The handlers receive `sender` as their first argument.
+
+        """
+        for receiver in self._inline_receivers:
+            receiver(sender, signal=self)
+        return self._blinker_signal.send(sender, signal=self)
+
+
+def _frozen_setattr(self, name, value):
+    raise FrozenInstanceError(f'cannot assign to field {name!r}')
+
+
+def _frozen_delattr(self, name):
+    raise FrozenInstanceError(f'cannot delete field {name!r}')
+
+
+def _frozen_dataclass(cls):
+    """
+    Make `cls` an immutable dataclass whose instances store their fields
+    in `__slots__` instead of a `__dict__`, keeping memory low when
+    millions of them are queued.
+
+    Equivalent to `dataclass(frozen=True, slots=True)` of Python 3.10.
+
+    """
+    cls = dataclass(frozen=True)(cls)
+    namespace = dict(cls.__dict__)
+    names = tuple(f.name for f in fields(cls))
+    for name in names + ('__dict__', '__weakref__'):
+        # Field defaults are already in __init__ and would conflict
+        # with the slots.
+        namespace.pop(name, None)
+    namespace['__slots__'] = names
+    namespace['__setattr__'] = _frozen_setattr
+    namespace['__delattr__'] = _frozen_delattr
+    slotted = type(cls)(cls.__name__, cls.__bases__, namespace)
+    slotted.__qualname__ = cls.__qualname__
+    return slotted
+
+
+def _metadata():
+    """
+    A field holding metadata taken from the `stat` of a path.
+
+    It defaults to `None` (unknown) and is ignored when comparing
+    signals.
+
+    """
+    return field(default=None, compare=False)
+
+
+@_frozen_dataclass
+class DirFound(_Signal):
+    """A directory was found under the root path."""
+    path: str
+    #: Device, inode, size and modification time (in nanoseconds) taken
+    #: from the `stat` done while scanning, so nobody needs to stat the
+    #: path again
+    device: int = _metadata()
+    inode: int = _metadata()
+    size: int = _metadata()
+    mtime: int = _metadata()
+
+
+@_frozen_dataclass
+class FileFound(_Signal):
+    """A regular file was found under the root path."""
+    path: str
+    #: Device, inode, size and modification time (in nanoseconds) taken
+    #: from the `stat` done while scanning, so nobody needs to stat the
+    #: path again
+    device: int = _metadata()
+    inode: int = _metadata()
+    size: int = _metadata()
+    mtime: int = _metadata()
+
+
+@_frozen_dataclass
+class SymlinkFound(_Signal):
+    """A symlink to a regular file was found under the root path."""
+    path: str
+
+
+@_frozen_dataclass
+class SpecialFileFound(_Signal):
+    """A non regular file was found under the root path."""
+    path: str
+
+
+@_frozen_dataclass
+class EntriesFound(_Signal):
+    """
+    Several entries were found under the root path.
+
+    Amortizes the cost of emitting a signal for every entry of big
+    directories.  Entities attached to any of the signals in `kinds`
+    receive the contained signals one by one.
+
+    """
+    #: The `DirFound`, `FileFound`, `SymlinkFound` and `SpecialFileFound`
+    #: signals found
+    signals: tuple
+
+    #: Signal types that can be batched
+    kinds = (DirFound, FileFound, SymlinkFound, SpecialFileFound)
+
+
+@_frozen_dataclass
+class UserScanRequested(_Signal):
+    """The user requested some path to be recusively decompressed."""
+    #: The root path
+    path: str
+
+
+@_frozen_dataclass
+class Decompressed(_Signal):
+    """Some archive was succesfully decompressed."""
+    #: Source archive path
+    source: str
+    #: Destination directory path
+    path: str
+    #: `(name, size)` of every file written, `name` relative to `path`
+    #: and `size` `None` for symlinks, or `None` if unknown.  Lets the
+    #: content be scanned without listing its directories
+    entries: tuple = field(default=None, compare=False)
+    #: Bytes of the files written, or `None` if unknown
+    size: int = field(default=None, compare=False)
+    #: `(name, mode, mtime)` stored in the archive for every entry
+    #: written, `name` relative to `path`, or `None` if not collected
+    metadata: tuple = field(default=None, compare=False)
+    #: Comment of the archive, if any and collected
+    comment: str = field(default=None, compare=False)
+
+
+@_frozen_dataclass
+class DecompressionDiscarded(_Signal):
+    """Some archive file was not decompressed by means of some policy."""
+    #: Archive path
+    path: str
+    #: Why the archive wasn't decompressed
+    reason: str
+
+
+@_frozen_dataclass
+class DecompressionFailed(_Signal):
+    """The decompression of an archive failed."""
+    #: Source archive path
+    source: str
+    #: Destination directory path, `None` if nothing was written or it
+    #: was removed
+    path: str
+    #: Some files were able to be decompressed
+    partial: bool
+    #: Description of the error.  A string, not the exception itself, so
+    #: the signal can be pickled and sent across processes
+    error: str
+
+
+@_frozen_dataclass
+class ContentAdded(_Signal):
+    """New (decompressed) content has been added under the root path."""
+    #: Source archive path
+    source: str
+    #: Final destination path of the added content
+    path: str
+    #: The `Decompressed.entries` of the content, relative to `path`
+    entries: tuple = field(default=None, compare=False)
+
+
+@_frozen_dataclass
+class ExitRequested(_Signal):
+    """Some entity requested that processing should be stopped."""
+    pass
+
+
+@_frozen_dataclass
+class PathProcessingFinished(_Signal):
+    """The processing of the given path has ended."""
+    path: str
@@ -0,0 +1,401 @@
+"""
+Deliver signals across processes and machines through a broker.
+
+A `Broker` listens on a TCP socket.  Every process connects to it with a
+`Transport`, which forwards to the broker the signals emitted locally
+and emits locally the signals received from the broker.  Subscriptions
+are either broadcast, every subscriber gets every signal, or shared,
+every signal goes to a single subscriber in turn, which is how work is
+sharded among worker nodes.
+
+The broker keeps every shared signal until its subscriber acknowledges
+it, and gives it to another subscriber if that one disconnects before,
+so a worker that dies does not lose the work it was given.  Signals are
+delivered at least once: a signal whose work was done but not yet
+acknowledged is delivered again.
+
+Signals are pickled, so the broker and the transports must run in a
+trusted network; by default the broker only listens on the loopback
+interface.
+
+Frames on the wire are a 4 bytes big endian length followed by a pickled
+tuple:
+
+* `('subscribe', name, shared)`: from a transport, answered with
+  `('subscribed', name)` once the subscription is active.
+* `('publish', name, data, hold)`: from a transport, `data` being the
+  pickled signal and `hold` whether the broker keeps it while there are
+  no shared subscribers.
+* `('signal', data, tag)`: from the broker to the subscribers, `tag`
+  being `None` for broadcast signals.
+* `('ack', tag)`: from a transport, once done with the shared signal
+  sent with `tag`.
+
+"""
+from collections import defaultdict, deque
+import itertools
+import logging
+import pickle
+import socket
+import struct
+import threading
+
+from engorgio.signals import _Signal
+
+logger = logging.getLogger(__name__)
+
+#: Format of the length prefix of every frame
+FRAME_HEADER = struct.Struct('!I')
+
+
+class TransportError(Exception):
+    """The connection to the broker failed."""
+
+
+def send_frame(sock, message):
+    """Send the picklable `message` through `sock` as a frame."""
+    data = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    sock.sendall(FRAME_HEADER.pack(len(data)) + data)
+
+
+def recv_frame(sock):
+    """
+    Return the next message received through `sock`, or `None` if the
+    connection was closed.
+
+    """
+    header = _recv_exactly(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    data = _recv_exactly(sock, FRAME_HEADER.unpack(header)[0])
+    if data is None:
+        return None
+    return pickle.loads(data)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        try:
+            chunk = sock.recv(min(size, 1024 * 1024))
+        except OSError:
+            return None
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+class _Connection:
+    """A transport connected to the broker."""
+    def __init__(self, sock):
+        self.sock = sock
+        self.lock = threading.Lock()
+        # Tag -> (name, data) of the shared signals sent and not
+        # acknowledged, guarded by the lock of the broker
+        self.unacked = {}
+
+    def send(self, message):
+        with self.lock:
+            send_frame(self.sock, message)
+
+
+class Broker:
+    """
+    Route signals among the transports connected to `host`:`port`.
+
+    Port 0 picks a free port, see `address`.
+
+    """
+    def __init__(self, host='127.0.0.1', port=0):
+        self._server = socket.socket()
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((host, port))
+        self._server.listen()
+        self.address = self._server.getsockname()[:2]
+        self._lock = threading.Lock()
+        self._subscribed = threading.Condition(self._lock)
+        self._connections = set()
+        # Signal name -> connections
+        self._broadcast = defaultdict(list)
+        self._shared = defaultdict(deque)
+        # Signal name -> pickled signals waiting for a shared subscriber
+        self._backlog = defaultdict(deque)
+        self._tags = itertools.count()
+        self._thread = threading.Thread(target=self._accept, daemon=True)
+        self._thread.start()
+
+    def subscribers(self, signal, shared=False):
+        """Return the number of subscribers to the `signal` type."""
+        routes = self._shared if shared else self._broadcast
+        with self._lock:
+            return len(routes.get(signal.__name__, ()))
+
+    def wait_for_subscribers(self, signal, count, shared=False,
+                             timeout=None):
+        """
+        Wait until there are `count` subscribers to the `signal` type,
+        and return whether there are.
+
+        """
+        routes = self._shared if shared else self._broadcast
+        with self._subscribed:
+            return self._subscribed.wait_for(
+                lambda: len(routes.get(signal.__name__, ())) >= count,
+                timeout)
+
+    def close(self):
+        """Stop accepting connections and close the existing ones."""
+        _shutdown(self._server)
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            _shutdown(connection.sock)
+        self._thread.join()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self._server.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = _Connection(sock)
+            with self._lock:
+                self._connections.add(connection)
+            threading.Thread(target=self._serve, args=(connection,),
+                             daemon=True).start()
+
+    def _serve(self, connection):
+        try:
+            while True:
+                message = recv_frame(connection.sock)
+                if message is None:
+                    break
+                if message[0] == 'publish':
+                    self._publish(connection, *message[1:])
+                elif message[0] == 'subscribe':
+                    self._subscribe(connection, *message[1:])
+                elif message[0] == 'ack':
+                    with self._lock:
+                        connection.unacked.pop(message[1], None)
+                else:
+                    logger.warning('Unknown message %r', message[0])
+        finally:
+            self._drop(connection)
+
+    def _subscribe(self, connection, name, shared):
+        with self._lock:
+            if shared:
+                self._shared[name].append(connection)
+                backlog = self._backlog.pop(name, ())
+            else:
+                self._broadcast[name].append(connection)
+                backlog = ()
+            self._subscribed.notify_all()
+        connection.send(('subscribed', name))
+        for data in backlog:
+            self._publish(None, name, data, hold=True)
+
+    def _publish(self, publisher, name, data, hold=False):
+        with self._lock:
+            targets = [(connection, None)
+                       for connection in self._broadcast.get(name, ())
+                       if connection is not publisher]
+            shared = self._shared.get(name)
+            if shared:
+                # Round robin among the shared subscribers
+                shared.rotate(-1)
+                tag = next(self._tags)
+                shared[-1].unacked[tag] = (name, data)
+                targets.append((shared[-1], tag))
+            elif hold:
+                self._backlog[name].append(data)
+        for connection, tag in targets:
+            try:
+                connection.send(('signal', data, tag))
+            except OSError:
+                self._drop(connection)
+
+    def _drop(self, connection):
+        with self._lock:
+            self._connections.discard(connection)
+            for routes in (self._broadcast, self._shared):
+                for connections in routes.values():
+                    if connection in connections:
+                        connections.remove(connection)
+            unacked = list(connection.unacked.values())
+            connection.unacked.clear()
+        _shutdown(connection.sock)
+        # To another shared subscriber, or held until there is one
+        for name, data in unacked:
+            self._publish(None, name, data, hold=True)
+
+
+class Transport:
+    """
+    Exchange signals with the `Broker` at `address`.
+
+    Signals received from the broker are emitted locally with the
+    transport as sender, so they are not forwarded back by this or any
+    other transport.
+
+    """
+    def __init__(self, address):
+        try:
+            self._sock = socket.create_connection(address)
+        except OSError as e:
+            raise TransportError(f'Cannot connect to {address}: {e}')
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._connection = _Connection(self._sock)
+        # Forwarded signal -> whether the broker holds it
+        self._forwarded = {}
+        # Signal name -> set once its subscription is confirmed
+        self._acks = {}
+        # Signal type -> function returning the keys of the work carried
+        # by a received signal, see `subscribe`
+        self._work = {}
+        # Signal type -> function returning the key of the work done
+        # when it is emitted, see `acknowledge_on`
+        self._done = {}
+        self._lock = threading.Lock()
+        # Tag of a received signal -> keys of its work not done yet
+        self._pending = {}
+        # Key of some work -> tags of the received signals waiting for it
+        self._waiting = defaultdict(list)
+        self._thread = threading.Thread(target=self._receive, daemon=True)
+        self._thread.start()
+
+    def forward(self, signal, hold=False):
+        """
+        Publish in the broker every `signal` emitted locally.
+
+        If `hold`, the broker keeps the signals published while nobody
+        is subscribed to them as shared until somebody is, so work is
+        not lost when the workers connect late.
+
+        """
+        if signal not in self._forwarded:
+            signal.connect(self._publish)
+        self._forwarded[signal] = hold
+
+    def subscribe(self, signal, shared=False, timeout=10, work=None):
+        """
+        Emit locally the `signal`s published by other transports.
+
+        If `shared`, each of those signals is only received by one of the
+        transports subscribed to it as shared, and the broker gives it to
+        another one if this transport disconnects before acknowledging
+        it.  It is acknowledged once emitted or, if `work` is given, once
+        the work identified by every key returned by `work(signal)` is
+        done, see `acknowledge_on`.
+
+        Wait until the subscription is active.
+
+        """
+        name = signal.__name__
+        if work is not None:
+            self._work[signal] = work
+        # Before sending, so the confirmation can't arrive before it
+        ack = self._acks[name] = threading.Event()
+        self._send(('subscribe', name, shared))
+        if not ack.wait(timeout):
+            raise TransportError(f'Subscription to {name} not confirmed')
+
+    def acknowledge_on(self, signal, key):
+        """
+        Consider done the work identified by `key(s)` whenever a
+        `signal` `s` is emitted locally, see `subscribe`.
+
+        """
+        if signal not in self._done:
+            signal.connect(self._on_done)
+        self._done[signal] = key
+
+    def close(self):
+        """Stop forwarding and receiving signals."""
+        for signal in self._forwarded:
+            signal.disconnect(self._publish)
+        self._forwarded.clear()
+        for signal in self._done:
+            signal.disconnect(self._on_done)
+        self._done.clear()
+        _shutdown(self._sock)
+        self._thread.join()
+
+    def _send(self, message):
+        try:
+            self._connection.send(message)
+        except OSError as e:
+            raise TransportError(f'Connection to the broker lost: {e}')
+
+    def _publish(self, sender, signal):
+        if isinstance(sender, Transport):
+            return
+        cls = signal.__class__
+        self._send(('publish', cls.__name__,
+                    pickle.dumps(signal, protocol=pickle.HIGHEST_PROTOCOL),
+                    self._forwarded.get(cls, False)))
+
+    def _on_done(self, sender, signal):
+        if isinstance(sender, Transport):
+            return
+        key = self._done[signal.__class__](signal)
+        acknowledged = []
+        with self._lock:
+            for tag in self._waiting.pop(key, ()):
+                keys = self._pending[tag]
+                keys.discard(key)
+                if not keys:
+                    del self._pending[tag]
+                    acknowledged.append(tag)
+        for tag in acknowledged:
+            self._acknowledge(tag)
+
+    def _acknowledge(self, tag):
+        try:
+            self._connection.send(('ack', tag))
+        except OSError:
+            # The broker gives the signal to another subscriber
+            pass
+
+    def _deliver(self, signal, tag):
+        keys = ()
+        work = self._work.get(signal.__class__)
+        if tag is not None and work is not None:
+            keys = set(work(signal))
+            # Before emitting, the work may be done right away
+            with self._lock:
+                if keys:
+                    self._pending[tag] = keys
+                for key in keys:
+                    self._waiting[key].append(tag)
+        signal.emit(sender=self)
+        if tag is not None and not keys:
+            self._acknowledge(tag)
+
+    def _receive(self):
+        while True:
+            message = recv_frame(self._sock)
+            if message is None:
+                return
+            if message[0] == 'signal':
+                _, data, tag = message
+                signal = pickle.loads(data)
+                if isinstance(signal, _Signal):
+                    self._deliver(signal, tag)
+                elif tag is not None:
+                    self._acknowledge(tag)
+            elif message[0] == 'subscribed':
+                ack = self._acks.get(message[1])
+                if ack is not None:
+                    ack.set()
+
+
+def _shutdown(sock):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+    sock.close()
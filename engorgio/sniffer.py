@@ -0,0 +1,62 @@
+"""
+Identify archive and compressed file formats by their magic bytes.
+
+Only the first `HEADER_SIZE` bytes of a file are read, plus a few bytes
+more for ISO 9660 images, whose signature lives past the system area.
+This is much cheaper than letting libarchive probe every file.
+
+"""
+
+#: Bytes read from the start of a file to identify its format
+HEADER_SIZE = 512
+
+#: (format, offset, magic) tuples checked in order
+MAGIC_NUMBERS = (
+    ('zip', 0, b'PK\x03\x04'),
+    ('zip', 0, b'PK\x05\x06'),  # Empty archive
+    ('zip', 0, b'PK\x07\x08'),  # Spanned archive
+    ('gzip', 0, b'\x1f\x8b'),
+    ('bzip2', 0, b'BZh'),
+    ('xz', 0, b'\xfd7zXZ\x00'),
+    ('zstd', 0, b'\x28\xb5\x2f\xfd'),
+    ('7z', 0, b'7z\xbc\xaf\x27\x1c'),
+    ('rar', 0, b'Rar!\x1a\x07'),
+    ('tar', 257, b'ustar'),
+    ('cpio', 0, b'070701'),  # New ASCII
+    ('cpio', 0, b'070702'),  # New ASCII with CRC
+    ('cpio', 0, b'070707'),  # Old ASCII
+    ('cpio', 0, b'\xc7\x71'),  # Old binary, little endian
+    ('cpio', 0, b'\x71\xc7'),  # Old binary, big endian
+)
+
+ISO9660_OFFSET = 32769
+ISO9660_MAGIC = b'CD001'
+
+
+def sniff_header(header):
+    """
+    Return the name of the format of a file starting with the bytes
+    `header` or `None` if it is not a known archive format.
+
+    """
+    for name, offset, magic in MAGIC_NUMBERS:
+        if header.startswith(magic, offset):
+            return name
+    return None
+
+
+def sniff(path):
+    """
+    Return the name of the archive format of the file at `path` or
+    `None` if it is not a known archive format.
+
+    Raise `OSError` if the file cannot be read.
+
+    """
+    with open(path, 'rb') as f:
+        name = sniff_header(f.read(HEADER_SIZE))
+        if name is None:
+            f.seek(ISO9660_OFFSET)
+            if f.read(len(ISO9660_MAGIC)) == ISO9660_MAGIC:
+                name = 'iso'
+    return name
@@ -0,0 +1,161 @@
+"""
+Counters and latency histograms describing how work flows through an
+`Entity`.
+
+Collecting them has a cost, so they are only enabled on demand (see
+`engorgio.entity.Entity`).  `ShardedCounters` are cheap enough to be
+always on.
+
+"""
+from collections import defaultdict
+import math
+import threading
+import time
+
+#: Upper bound, in seconds, of the first bucket of a `Histogram`.  Every
+#: following bucket doubles the previous one.
+HISTOGRAM_FIRST_BUCKET = 1e-6
+
+#: Number of buckets of a `Histogram`; the last one has no upper bound
+HISTOGRAM_BUCKETS = 32
+
+
+class ShardedCounters:
+    """
+    `size` counters incremented from many threads without locks.
+
+    Every thread increments its own shard, the list returned by
+    `shard`, and reading a counter adds it up across the shards.  A
+    total read while other threads increment is a lower bound of the
+    final one.
+
+    """
+    def __init__(self, size):
+        self.size = size
+        self._shards = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def shard(self):
+        """Return the counters of the current thread."""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = [0] * self.size
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def total(self, index):
+        """Return the sum of the counter `index` of every thread."""
+        return sum(shard[index] for shard in list(self._shards))
+
+
+class Histogram:
+    """Distribution of latencies in power of two buckets."""
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+
+    def add(self, seconds):
+        """Add a latency of `seconds` to the distribution."""
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if seconds <= HISTOGRAM_FIRST_BUCKET:
+            bucket = 0
+        else:
+            bucket = min(math.ceil(math.log2(seconds /
+                                             HISTOGRAM_FIRST_BUCKET)),
+                         HISTOGRAM_BUCKETS - 1)
+        self.buckets[bucket] += 1
+
+    def percentile(self, percent):
+        """
+        Return the upper bound of the bucket holding the given
+        `percent`ile, or `None` if there are no latencies.
+
+        """
+        if not self.count:
+            return None
+        threshold = self.count * percent / 100
+        accumulated = 0
+        for bucket, count in enumerate(self.buckets):
+            accumulated += count
+            if accumulated >= threshold:
+                break
+        if bucket == HISTOGRAM_BUCKETS - 1:
+            return self.max
+        return HISTOGRAM_FIRST_BUCKET * 2 ** bucket
+
+    def as_dict(self):
+        """Return a summary of the distribution."""
+        return {'count': self.count,
+                'total': self.total,
+                'mean': self.total / self.count if self.count else None,
+                'max': self.max,
+                'p50': self.percentile(50),
+                'p99': self.percentile(99)}
+
+
+class EntityStats:
+    """
+    Statistics of a single entity.
+
+    `enqueued` is called from the emitters' threads while the rest of
+    the methods are called from the entity thread.
+
+    """
+    def __init__(self):
+        self.started = time.monotonic()
+        self.enqueued_count = defaultdict(int)
+        self.max_queue_depth = 0
+        self.processed_count = defaultdict(int)
+        self.dispatch_time = defaultdict(Histogram)
+        self.wait_time = Histogram()
+        self._lock = threading.Lock()
+
+    def enqueued(self, signal, queue_depth):
+        """A `signal` was enqueued, leaving `queue_depth` signals."""
+        with self._lock:
+            self.enqueued_count[signal.__class__.__name__] += 1
+            if queue_depth > self.max_queue_depth:
+                self.max_queue_depth = queue_depth
+
+    def waited(self, seconds):
+        """The entity waited `seconds` for the next signal."""
+        with self._lock:
+            self.wait_time.add(seconds)
+
+    def dispatched(self, signal, seconds):
+        """The handlers of `signal` took `seconds` to run."""
+        name = signal.__class__.__name__
+        with self._lock:
+            self.processed_count[name] += 1
+            self.dispatch_time[name].add(seconds)
+
+    def as_dict(self, queue_depth):
+        """
+        Return a snapshot of the statistics given the current
+        `queue_depth`.
+
+        """
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            processed = sum(self.processed_count.values())
+            return {
+                'elapsed': elapsed,
+                'queue_depth': queue_depth,
+                'max_queue_depth': self.max_queue_depth,
+                'enqueued': dict(self.enqueued_count),
+                'processed': dict(self.processed_count),
+                'processed_per_second': (processed / elapsed
+                                         if elapsed else None),
+                'wait_time': self.wait_time.as_dict(),
+                'dispatch_time': {name: histogram.as_dict()
+                                  for name, histogram
+                                  in self.dispatch_time.items()},
+            }
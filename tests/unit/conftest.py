@@ -1,7 +1,13 @@
 import os
+
 import pytest
 
 
 @pytest.fixture
 def data_path():
     return os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+
+
+@pytest.fixture
+def tmpdir_path(tmp_path):
+    return str(tmp_path)
@@ -0,0 +1,289 @@
+from unittest.mock import patch
+import io
+import os
+import shutil
+import sqlite3
+import tarfile
+import tempfile
+import threading
+
+import pytest
+
+from engorgio.decompressor import decompress
+from engorgio.entities.decompressor import Decompressor
+from engorgio.entities.scanner import classify_path
+from engorgio.signals import Decompressed
+from engorgio.signals import DecompressionDiscarded
+from engorgio.signals import DecompressionFailed
+from engorgio.signals import ExitRequested
+from engorgio.signals import FileFound
+from engorgio.signals import PathProcessingFinished
+
+
+def run_decompressor(config, *signals):
+    received = list()
+
+    def get_signals(sender, signal):
+        received.append(signal)
+
+    Decompressed.connect(get_signals)
+    DecompressionFailed.connect(get_signals)
+    PathProcessingFinished.connect(get_signals)
+
+    decompressor = Decompressor(config)
+    decompressor.prepare()
+    decompressor.start()
+    for signal in signals:
+        signal.emit()
+    ExitRequested().emit()
+    decompressor.join()
+
+    return received
+
+
+@pytest.mark.timeout(5)
+def test_emit_decompressed_and_pathprocessingfinished_on_filefound(data_path):
+    path = os.path.join(data_path, 'regularfile.zip')
+    with tempfile.TemporaryDirectory() as sandbox:
+        received = run_decompressor({'sandbox': sandbox}, FileFound(path=path))
+
+        decompressed, finished = received
+        assert isinstance(decompressed, Decompressed)
+        assert decompressed.source == path
+        assert os.path.dirname(decompressed.path) == sandbox
+        assert finished == PathProcessingFinished(path=path)
+
+
+def make_truncated_zip(data_path, directory):
+    path = os.path.join(directory, 'truncated.zip')
+    with open(os.path.join(data_path, 'regularfile.zip'), 'rb') as src, open(path, 'wb') as dst:
+        dst.write(src.read(100))
+    return path
+
+
+@pytest.mark.timeout(5)
+def test_emit_decompressionfailed_on_malformed_file(data_path):
+    with tempfile.TemporaryDirectory() as sandbox:
+        path = make_truncated_zip(data_path, sandbox)
+        received = run_decompressor({'sandbox': sandbox}, FileFound(path=path))
+
+        failed, finished = received
+        assert isinstance(failed, DecompressionFailed)
+        assert finished == PathProcessingFinished(path=path)
+
+
+@pytest.mark.timeout(5)
+def test_every_file_found_is_processed(data_path):
+    path = os.path.join(data_path, 'regularfile.zip')
+    with tempfile.TemporaryDirectory() as sandbox:
+        config = {'sandbox': sandbox, 'decompressor_workers': 4}
+        received = run_decompressor(config, *[FileFound(path=path)] * 50)
+
+        assert len([s for s in received if isinstance(s, Decompressed)]) == 50
+        assert len([s for s in received if isinstance(s, PathProcessingFinished)]) == 50
+
+
+def test_queue_is_bounded_by_max_pending():
+    decompressor = Decompressor({'decompressor_workers': 2, 'decompressor_max_pending': 3})
+
+    assert decompressor._queue.maxsize == 3
+
+
+@pytest.mark.timeout(5)
+def test_in_flight_extractions_are_capped(data_path):
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def slow_decompress(path, sandbox, nested, metadata):
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        threading.Event().wait(0.01)
+        with lock:
+            running -= 1
+        return Decompressed(source=path, path=path)
+
+    with patch('engorgio.entities.decompressor.decompress', slow_decompress):
+        config = {'decompressor_workers': 8, 'decompressor_max_pending': 2}
+        received = run_decompressor(config, *[FileFound(path=str(i)) for i in range(20)])
+
+    assert max_running <= 2
+    assert len([s for s in received if isinstance(s, PathProcessingFinished)]) == 20
+
+
+@pytest.mark.timeout(30)
+def test_process_backend_emits_the_same_signals(data_path):
+    with tempfile.TemporaryDirectory() as sandbox:
+        paths = [os.path.join(data_path, 'regularfile.zip'), make_truncated_zip(data_path, sandbox)]
+        config = {'sandbox': sandbox, 'decompressor_backend': 'process', 'decompressor_workers': 2}
+        received = run_decompressor(config, *[FileFound(path=p) for p in paths])
+
+        assert {type(s) for s in received} == {Decompressed, DecompressionFailed, PathProcessingFinished}
+        decompressed, = [s for s in received if isinstance(s, Decompressed)]
+        assert os.listdir(decompressed.path) == ['info.txt']
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        Decompressor({'decompressor_backend': 'foo'})
+
+
+@pytest.mark.timeout(5)
+def test_emit_decompressiondiscarded_on_non_archives(data_path):
+    path = os.path.join(data_path, 'info.txt')
+    received = list()
+
+    def get_discarded(sender, signal):
+        received.append(signal)
+
+    DecompressionDiscarded.connect(get_discarded)
+    with tempfile.TemporaryDirectory() as sandbox:
+        with patch('engorgio.entities.decompressor.decompress') as decompress:
+            run_decompressor({'sandbox': sandbox}, FileFound(path=path))
+
+        decompress.assert_not_called()
+        assert received == [DecompressionDiscarded(path=path, reason='not an archive')]
+        assert os.listdir(sandbox) == []
+
+
+@pytest.mark.timeout(5)
+def test_sniffing_can_be_disabled(data_path):
+    path = os.path.join(data_path, 'info.txt')
+    with tempfile.TemporaryDirectory() as sandbox:
+        received = run_decompressor({'sandbox': sandbox, 'decompressor_sniff': False}, FileFound(path=path))
+
+        assert isinstance(received[0], DecompressionFailed)
+
+
+@pytest.mark.timeout(5)
+def test_emit_decompressionfailed_on_unreadable_files():
+    with tempfile.TemporaryDirectory() as sandbox:
+        path = os.path.join(sandbox, 'missing')
+        failed, finished = run_decompressor({'sandbox': sandbox}, FileFound(path=path))
+
+        assert isinstance(failed, DecompressionFailed)
+        assert failed.path is None
+        assert finished == PathProcessingFinished(path=path)
+
+
+@pytest.mark.timeout(5)
+def test_emit_decompressionfailed_on_unexpected_errors(data_path):
+    path = os.path.join(data_path, 'regularfile.zip')
+    with patch('engorgio.entities.decompressor.decompress') as decompress:
+        decompress.side_effect = TypeError('boom')
+        failed, finished = run_decompressor({'sandbox': 'foo'}, FileFound(path=path))
+
+    assert failed == DecompressionFailed(source=path, path=None, partial=False, error='TypeError: boom')
+    assert finished == PathProcessingFinished(path=path)
+
+
+@pytest.mark.timeout(5)
+def test_nested_extraction_is_passed_to_decompress(data_path):
+    path = os.path.join(data_path, 'regularfile.zip')
+    with patch('engorgio.entities.decompressor.decompress') as decompress:
+        decompress.return_value = Decompressed(source=path, path=path)
+        run_decompressor({'sandbox': 'foo', 'decompressor_nested': True}, FileFound(path=path))
+
+    decompress.assert_called_once_with(path, 'foo', True, False)
+
+
+def test_metadata_is_collected_when_it_is_recorded(data_path):
+    path = os.path.join(data_path, 'regularfile.zip')
+    with patch('engorgio.entities.decompressor.decompress') as decompress:
+        decompress.return_value = Decompressed(source=path, path=path)
+        run_decompressor({'sandbox': 'foo', 'metadata_file': 'bar'}, FileFound(path=path))
+
+    decompress.assert_called_once_with(path, 'foo', False, True)
+
+
+@pytest.mark.timeout(5)
+def test_empty_files_are_discarded_without_opening_them():
+    received = list()
+
+    def get_discarded(sender, signal):
+        received.append(signal)
+
+    DecompressionDiscarded.connect(get_discarded)
+    with patch('engorgio.entities.decompressor.sniff') as sniff:
+        run_decompressor({}, FileFound(path='foo', size=0))
+
+    sniff.assert_not_called()
+    assert received == [DecompressionDiscarded(path='foo', reason='empty file')]
+
+
+@pytest.mark.timeout(5)
+def test_identical_archives_are_expanded_once(data_path):
+    with tempfile.TemporaryDirectory() as path, tempfile.TemporaryDirectory() as sandbox:
+        paths = [os.path.join(path, f'{i}.zip') for i in range(3)]
+        for copy in paths:
+            shutil.copy(os.path.join(data_path, 'regularfile.zip'), copy)
+
+        with patch('engorgio.entities.decompressor.decompress', wraps=decompress) as decompress_:
+            config = {'sandbox': sandbox, 'dedup': True, 'decompressor_workers': 1}
+            received = run_decompressor(config, *[FileFound(path=p, size=os.path.getsize(p)) for p in paths])
+
+        assert decompress_.call_count == 1
+        decompressed = [s for s in received if isinstance(s, Decompressed)]
+        assert [s.source for s in decompressed] == paths
+        assert len({s.path for s in decompressed}) == 3
+        for signal in decompressed:
+            assert os.listdir(signal.path) == ['info.txt']
+
+
+@pytest.mark.timeout(5)
+def test_files_unchanged_since_a_previous_run_are_discarded(data_path):
+    with tempfile.TemporaryDirectory() as path, tempfile.TemporaryDirectory() as sandbox:
+        archive = shutil.copy(os.path.join(data_path, 'regularfile.zip'), path)
+        document = shutil.copy(os.path.join(data_path, 'info.txt'), path)
+        config = {'sandbox': sandbox, 'run_index': os.path.join(path, 'index.sqlite')}
+
+        discarded = list()
+
+        def get_discarded(sender, signal):
+            discarded.append(signal)
+
+        first = run_decompressor(config, classify_path(archive), classify_path(document))
+        DecompressionDiscarded.connect(get_discarded)
+        with patch('engorgio.entities.decompressor.sniff') as sniff:
+            run_decompressor(config, classify_path(archive), classify_path(document))
+
+        sniff.assert_not_called()
+        assert isinstance(first[0], Decompressed)
+        assert set(discarded) == {
+            DecompressionDiscarded(path=archive, reason='unchanged'),
+            DecompressionDiscarded(path=document, reason='unchanged')}
+
+
+@pytest.mark.timeout(5)
+def test_run_index_errors_do_not_prevent_emitting_the_result(data_path):
+    path = os.path.join(data_path, 'regularfile.zip')
+    with tempfile.TemporaryDirectory() as sandbox:
+        config = {'sandbox': sandbox, 'run_index': os.path.join(sandbox, 'index.sqlite')}
+        with patch('engorgio.runindex.RunIndex.record', side_effect=sqlite3.OperationalError('database is locked')):
+            decompressed, finished = run_decompressor(config, classify_path(path))
+
+        assert isinstance(decompressed, Decompressed)
+        assert finished == PathProcessingFinished(path=path)
+
+
+@pytest.mark.timeout(5)
+def test_failed_expansions_are_not_left_next_to_the_archives_when_replacing():
+    with tempfile.TemporaryDirectory() as path:
+        archive = os.path.join(path, 'truncated.tar')
+        with tarfile.open(archive, 'w') as tar:
+            for name in ('x.txt', 'y.txt', 'z.txt'):
+                info = tarfile.TarInfo(name)
+                info.size = 10000
+                tar.addfile(info, io.BytesIO(b'x' * info.size))
+        with open(archive, 'r+b') as f:
+            f.truncate(25000)
+
+        received = run_decompressor({'replace': True}, classify_path(archive))
+
+        failed, finished = received
+        assert isinstance(failed, DecompressionFailed)
+        assert failed.partial
+        assert failed.path is None
+        assert os.listdir(path) == ['truncated.tar']
@@ -0,0 +1,155 @@
+import io
+import os
+import tempfile
+import threading
+
+import pytest
+
+from engorgio.entities.feedbacker import Feedbacker, format_duration, format_size
+from engorgio.entities.stopper import Stopper
+from engorgio.runtime import AsyncRuntime
+from engorgio.signals import Decompressed
+from engorgio.signals import DecompressionFailed
+from engorgio.signals import DirFound
+from engorgio.signals import EntriesFound
+from engorgio.signals import ExitRequested
+from engorgio.signals import FileFound
+from engorgio.signals import PathProcessingFinished
+
+
+class TTY(io.StringIO):
+    def isatty(self):
+        return True
+
+
+def test_format_size():
+    assert format_size(0) == '0 B'
+    assert format_size(1023) == '1023 B'
+    assert format_size(1536) == '1.5 KiB'
+    assert format_size(3 * 2 ** 30) == '3.0 GiB'
+    assert format_size(2 ** 60) == '1048576.0 TiB'
+
+
+def test_format_duration():
+    assert format_duration(None) == '?'
+    assert format_duration(0.2) == '0:00:01'
+    assert format_duration(3725) == '1:02:05'
+
+
+def test_signals_are_counted_inline():
+    feedbacker = Feedbacker(None)
+    feedbacker.prepare()
+    try:
+        DirFound(path='/a').emit()
+        EntriesFound(signals=(FileFound(path='/a/b.zip'), FileFound(path='/a/c.zip'))).emit()
+        Decompressed(source='/a/b.zip', path='/s/b', size=15).emit()
+        Decompressed(source='/a/c.zip', path='/s/c').emit()
+        DecompressionFailed(source='/a/d.zip', path=None, partial=False, error='ArchiveError: bad').emit()
+        PathProcessingFinished(path='/a').emit()
+
+        snapshot = feedbacker.snapshot()
+    finally:
+        feedbacker._disconnect()
+
+    assert snapshot == {'files': 2, 'expanded': 2, 'bytes': 15, 'failed': 1,
+                        'found': 3, 'finished': 1, 'pending': 2, 'queues': {}, 'eta': None}
+
+
+def test_eta_follows_the_average_rate():
+    feedbacker = Feedbacker(None)
+    feedbacker._stream = io.StringIO()
+    shard = feedbacker._counters.shard()
+    shard[0] = 100
+
+    feedbacker.tick(now=0.0)
+    assert feedbacker.snapshot()['eta'] is None
+
+    shard[1] = 10
+    feedbacker.tick(now=1.0)
+    assert feedbacker.rate == 10
+    assert feedbacker.snapshot()['eta'] == 9
+
+    shard[1] = 10
+    feedbacker.tick(now=6.0)
+    assert 0 < feedbacker.rate < 10
+
+    shard[1] = 100
+    assert feedbacker.snapshot()['eta'] == 0
+
+
+def test_lines_are_redrawn_in_place_on_a_terminal():
+    feedbacker = Feedbacker(None)
+    feedbacker._stream = TTY()
+    feedbacker._tty = True
+    shard = feedbacker._counters.shard()
+
+    shard[2] = 1000
+    feedbacker.tick(now=0.0)
+    shard[2] = 1
+    feedbacker.tick(now=1.0)
+
+    first, second = feedbacker._stream.getvalue().split('\r')[1:]
+    assert first.startswith('1000 files | 0 expanded (0 B) | 0 failed | 0 pending')
+    assert second == '1 files | 0 expanded (0 B) | 0 failed | 0 pending | ETA 0:00:00   '
+
+
+def test_unchanged_lines_are_not_repeated_elsewhere():
+    feedbacker = Feedbacker(None)
+    feedbacker._stream = io.StringIO()
+
+    for now in range(5):
+        feedbacker.tick(now=now)
+
+    assert feedbacker._stream.getvalue().count('\n') == 1
+
+
+@pytest.mark.timeout(5)
+def test_feedback_is_refreshed_periodically_until_exit():
+    with tempfile.TemporaryDirectory() as path:
+        config = {'feedbacker_interval': 0.01, 'feedbacker_file': os.path.join(path, 'feedback')}
+        feedbacker = Feedbacker(config)
+        stopper = Stopper(config)
+        feedbacker.watch(stopper)
+        feedbacker.prepare()
+        stopper.prepare()
+        feedbacker.start()
+        stopper.start()
+
+        for i in range(1000):
+            FileFound(path=f'/{i}').emit()
+        while feedbacker._last_line == '':
+            feedbacker._stop.wait(0.01)
+        for i in range(1000):
+            PathProcessingFinished(path=f'/{i}').emit()
+        stopper.join()
+        feedbacker.join()
+
+        with open(config['feedbacker_file']) as f:
+            lines = f.read().splitlines()
+
+    assert lines[0].startswith('1000 files | 0 expanded (0 B) | 0 failed | 1000 pending | queues Stopper ')
+    assert lines[-1] == '1000 files | 0 expanded (0 B) | 0 failed | 0 pending | queues Stopper 0 | ETA 0:00:00'
+    assert not feedbacker._ticker.is_alive()
+
+
+@pytest.mark.timeout(5)
+def test_feedback_is_finished_outside_the_event_loop():
+    closed_in = []
+
+    class Stream(io.StringIO):
+        def close(self):
+            closed_in.append(threading.current_thread())
+            super().close()
+
+    with tempfile.TemporaryDirectory() as path:
+        feedbacker = Feedbacker({'feedbacker_file': os.path.join(path, 'feedback')})
+        feedbacker.prepare()
+        feedbacker._stream.close()
+        feedbacker._stream = Stream()
+        with AsyncRuntime(1) as runtime:
+            feedbacker.start(runtime)
+            ExitRequested().emit()
+            feedbacker.join()
+
+    assert len(closed_in) == 1
+    assert closed_in[0] is not runtime._thread
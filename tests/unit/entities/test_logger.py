@@ -0,0 +1,105 @@
+import os
+import tempfile
+
+import pytest
+
+from engorgio.entities.logger import Logger, RateLimiter
+from engorgio.signals import ContentAdded
+from engorgio.signals import DecompressionDiscarded
+from engorgio.signals import DecompressionFailed
+from engorgio.signals import ExitRequested
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_rate_limiter_allows_bursts_and_then_the_rate():
+    clock = Clock()
+    limiter = RateLimiter(rate=2, burst=3, sample=0, clock=clock)
+
+    assert [limiter.allow('a')[0] for _ in range(5)] == [True, True, True, False, False]
+    assert limiter.allow('b') == (True, 0)
+
+    clock.now = 1.0
+    assert limiter.allow('a') == (True, 2)
+    assert limiter.allow('a') == (True, 0)
+    assert limiter.allow('a') == (False, 0)
+    assert limiter.suppressed() == {'a': 1}
+
+
+def test_rate_limiter_samples_suppressed_events():
+    limiter = RateLimiter(rate=0, burst=1, sample=10, clock=Clock())
+
+    allowed = [limiter.allow('a') for _ in range(36)]
+
+    assert [i for i, (passed, _) in enumerate(allowed) if passed] == [0, 10, 20, 30]
+    assert allowed[10] == (True, 9)
+    assert limiter.suppressed() == {'a': 5}
+
+
+def run_logger(config, *signals):
+    with tempfile.TemporaryDirectory() as path:
+        config = dict(config, logger_file=os.path.join(path, 'log'))
+        logger = Logger(config)
+        logger.prepare()
+        logger.start()
+        for signal in signals:
+            signal.emit()
+        ExitRequested().emit()
+        logger.join()
+
+        with open(config['logger_file']) as f:
+            return f.read().splitlines()
+
+
+@pytest.mark.timeout(5)
+def test_logger_writes_a_record_for_every_result():
+    lines = run_logger({'logger_level': 'debug'},
+                       DecompressionFailed(source='/a.zip', path=None, partial=False, error='ArchiveError: bad'),
+                       DecompressionFailed(source='/b.zip', path='/b', partial=True, error='OSError: full'),
+                       DecompressionDiscarded(path='/c.txt', reason='not an archive'),
+                       ContentAdded(source='/d.zip', path='/d.zip'))
+
+    assert [line.split(' ', 2)[2] for line in lines] == [
+        'WARNING Cannot decompress /a.zip: ArchiveError: bad',
+        'WARNING Partially decompressed /b.zip into /b: OSError: full',
+        'DEBUG Discarded /c.txt: not an archive',
+        'INFO Expanded /d.zip into /d.zip',
+    ]
+
+
+@pytest.mark.timeout(5)
+def test_logger_does_not_receive_signals_below_its_level():
+    logger = Logger({'logger_level': 'WARNING'})
+    logger.prepare()
+
+    assert set(logger._attached) >= {DecompressionFailed}
+    assert not set(logger._attached) & {DecompressionDiscarded, ContentAdded}
+
+    logger.start()
+    ExitRequested().emit()
+    logger.join()
+
+
+@pytest.mark.timeout(10)
+def test_logger_contains_floods_of_the_same_kind():
+    failures = [DecompressionFailed(source=f'/{i}.zip', path=None, partial=False, error='ArchiveError: bad')
+                for i in range(10000)]
+    others = [DecompressionFailed(source='/x.zip', path=None, partial=False, error='OSError: denied')]
+
+    lines = run_logger({'logger_rate': 0, 'logger_burst': 5, 'logger_sample': 100}, *failures, *others)
+
+    assert len(lines) == 5 + 99 + 1 + 1
+    assert lines[5].endswith('Cannot decompress /104.zip: ArchiveError: bad (99 similar records suppressed)')
+    assert any(line.endswith('Cannot decompress /x.zip: OSError: denied') for line in lines)
+    assert lines[-1].endswith('95 more DecompressionFailed records suppressed (ArchiveError)')
+
+
+def test_unknown_level_is_rejected():
+    with pytest.raises(ValueError):
+        Logger({'logger_level': 'LOUD'})
@@ -0,0 +1,46 @@
+import json
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from engorgio.entities.decompressor import Decompressor
+from engorgio.entities.metadater import Metadater
+from engorgio.entities.replacer import Replacer
+from engorgio.entities.scanner import Scanner
+from engorgio.entities.stopper import Stopper
+from engorgio.entity import join_all, prepare_all, start_all
+from engorgio.signals import UserScanRequested
+
+
+def test_metadata_file_is_required():
+    with pytest.raises(ValueError):
+        Metadater({})
+
+
+@pytest.mark.timeout(10)
+@pytest.mark.parametrize('replace', [False, True])
+@pytest.mark.parametrize('dedup', [False, True])
+def test_pipeline_records_the_metadata_of_every_archive(data_path, replace, dedup):
+    with tempfile.TemporaryDirectory() as path, tempfile.TemporaryDirectory() as workdir:
+        for name in ('a.zip', 'b.zip'):
+            shutil.copy(os.path.join(data_path, 'regularfile.zip'), os.path.join(path, name))
+        metadata_file = os.path.join(workdir, 'metadata.jsonl')
+
+        config = {'metadata_file': metadata_file, 'replace': replace, 'sandbox': None if replace else workdir,
+                  'dedup': dedup, 'decompressor_workers': 1}
+        entities = (Scanner(config), Decompressor(config), Stopper(config), Metadater(config))
+        if replace:
+            entities += (Replacer(config),)
+        prepare_all(*entities)
+        start_all(*entities)
+        UserScanRequested(path=path).emit()
+        join_all(*entities)
+
+        with open(metadata_file) as f:
+            records = sorted((json.loads(line) for line in f), key=lambda r: r['archive'])
+
+    assert records == [{'archive': os.path.join(path, name), 'entry': 'info.txt', 'mode': 0o100644,
+                        'mtime': 1577880598}
+                       for name in ('a.zip', 'b.zip')]
@@ -0,0 +1,212 @@
+from unittest.mock import patch
+import errno
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from engorgio.decompressor import decompress
+from engorgio.entities.decompressor import Decompressor
+from engorgio.entities.replacer import Replacer
+from engorgio.entities.scanner import Scanner
+from engorgio.entities.stopper import Stopper
+from engorgio.entity import join_all, prepare_all, start_all
+from engorgio.replacer import SANDBOX_PREFIX
+from engorgio.signals import ContentAdded
+from engorgio.signals import Decompressed
+from engorgio.signals import DecompressionFailed
+from engorgio.signals import ExitRequested
+from engorgio.signals import PathProcessingFinished
+from engorgio.signals import UserScanRequested
+
+from helpers import make_archive
+
+
+def run_replacer(config, *signals):
+    received = list()
+
+    def get_signals(sender, signal):
+        received.append(signal)
+
+    ContentAdded.connect(get_signals)
+    DecompressionFailed.connect(get_signals)
+    PathProcessingFinished.connect(get_signals)
+
+    replacer = Replacer(config)
+    replacer.prepare()
+    replacer.start()
+    for signal in signals:
+        signal.emit()
+    ExitRequested().emit()
+    replacer.join()
+
+    return received
+
+
+def make_expanded(directory):
+    archive = os.path.join(directory, 'archive.zip')
+    with open(archive, 'wb') as f:
+        f.write(b'not really an archive')
+    expanded = tempfile.mkdtemp(dir=directory)
+    with open(os.path.join(expanded, 'info.txt'), 'w') as f:
+        f.write('foo')
+    return archive, expanded
+
+
+@pytest.mark.timeout(5)
+def test_archive_is_replaced_by_its_content():
+    with tempfile.TemporaryDirectory() as path:
+        archive, expanded = make_expanded(path)
+
+        received = run_replacer(None, Decompressed(source=archive, path=expanded))
+
+        assert received == [ContentAdded(source=archive, path=archive),
+                            PathProcessingFinished(path=expanded)]
+        assert received[0].entries is None
+        assert os.listdir(archive) == ['info.txt']
+        assert os.listdir(path) == ['archive.zip']
+
+
+@pytest.mark.timeout(5)
+def test_archive_is_kept_with_a_suffix():
+    with tempfile.TemporaryDirectory() as path:
+        archive, expanded = make_expanded(path)
+
+        received = run_replacer({'replacer_suffix': '.d'}, Decompressed(source=archive, path=expanded))
+
+        assert received[0] == ContentAdded(source=archive, path=archive + '.d')
+        assert os.path.isfile(archive)
+        assert os.listdir(archive + '.d') == ['info.txt']
+
+
+@pytest.mark.timeout(5)
+def test_content_is_copied_across_filesystems():
+    with tempfile.TemporaryDirectory() as path:
+        archive, expanded = make_expanded(path)
+        rename = os.rename
+
+        def rename_across_devices(source, destination):
+            if source == expanded:
+                raise OSError(errno.EXDEV, 'Invalid cross-device link')
+            rename(source, destination)
+
+        with patch('engorgio.replacer.os.rename', rename_across_devices):
+            received = run_replacer(None, Decompressed(source=archive, path=expanded))
+
+        assert received[0] == ContentAdded(source=archive, path=archive)
+        assert os.listdir(archive) == ['info.txt']
+        assert not os.path.exists(expanded)
+
+
+@pytest.mark.timeout(5)
+def test_content_that_cannot_be_moved_is_not_left_hidden():
+    with tempfile.TemporaryDirectory() as path:
+        archive, expanded = make_expanded(path)
+        os.makedirs(os.path.join(archive + '.d', 'taken'))
+
+        received = run_replacer({'replacer_suffix': '.d'}, Decompressed(source=archive, path=expanded))
+
+        failed, finished = received
+        assert isinstance(failed, DecompressionFailed)
+        assert failed.source == archive
+        assert failed.path is None
+        assert finished == PathProcessingFinished(path=expanded)
+        assert sorted(os.listdir(path)) == ['archive.zip', 'archive.zip.d']
+
+
+@pytest.mark.timeout(5)
+def test_content_is_kept_where_it_was_when_it_cannot_be_moved():
+    with tempfile.TemporaryDirectory() as path:
+        archive, expanded = make_expanded(path)
+
+        with patch('engorgio.entities.replacer.move_tree', side_effect=OSError(errno.EACCES, 'Permission denied')):
+            failed, finished = run_replacer(None, Decompressed(source=archive, path=expanded))
+
+        assert failed.path == expanded
+        assert os.listdir(expanded) == ['info.txt']
+        assert os.path.isfile(archive)
+
+
+@pytest.mark.timeout(5)
+def test_archive_is_kept_when_its_content_cannot_be_renamed_into_place():
+    with tempfile.TemporaryDirectory() as path:
+        archive, expanded = make_expanded(path)
+        rename = os.rename
+
+        def rename_failing_into_place(source, destination):
+            if destination == archive and os.path.isdir(source):
+                raise OSError(errno.EACCES, 'Permission denied')
+            rename(source, destination)
+
+        with patch('engorgio.entities.replacer.os.rename', rename_failing_into_place):
+            received = run_replacer(None, Decompressed(source=archive, path=expanded))
+
+        failed, finished = received
+        assert isinstance(failed, DecompressionFailed)
+        assert failed.path is None
+        with open(archive, 'rb') as f:
+            assert f.read() == b'not really an archive'
+        assert os.listdir(path) == ['archive.zip']
+
+
+@pytest.mark.timeout(10)
+def test_pipeline_replaces_archives_in_place(data_path):
+    with tempfile.TemporaryDirectory() as path:
+        os.makedirs(os.path.join(path, 'a'))
+        shutil.copy(os.path.join(data_path, 'regularfile.zip'), os.path.join(path, 'a'))
+        shutil.copy(os.path.join(data_path, 'regularfile.zip'), path)
+
+        config = {'replace': True}
+        entities = (Scanner(config), Decompressor(config), Replacer(config), Stopper(config))
+        prepare_all(*entities)
+        start_all(*entities)
+        UserScanRequested(path=path).emit()
+        join_all(*entities)
+
+        assert os.listdir(os.path.join(path, 'regularfile.zip')) == ['info.txt']
+        assert os.listdir(os.path.join(path, 'a', 'regularfile.zip')) == ['info.txt']
+        for directory in (path, os.path.join(path, 'a')):
+            assert not [name for name in os.listdir(directory) if name.startswith(SANDBOX_PREFIX)]
+
+
+@pytest.mark.timeout(10)
+def test_pipeline_expands_identical_archives_once_when_replacing(data_path):
+    with tempfile.TemporaryDirectory() as path:
+        for i in range(3):
+            shutil.copy(os.path.join(data_path, 'regularfile.zip'), os.path.join(path, f'{i}.zip'))
+
+        config = {'replace': True, 'dedup': True, 'decompressor_workers': 1}
+        entities = (Scanner(config), Decompressor(config), Replacer(config), Stopper(config))
+        prepare_all(*entities)
+        start_all(*entities)
+        with patch('engorgio.entities.decompressor.decompress', wraps=decompress) as decompress_:
+            UserScanRequested(path=path).emit()
+            join_all(*entities)
+
+        assert decompress_.call_count == 1
+        for i in range(3):
+            assert os.listdir(os.path.join(path, f'{i}.zip')) == ['info.txt']
+
+
+@pytest.mark.timeout(10)
+@pytest.mark.parametrize('listed', [True, False])
+def test_pipeline_replaces_archives_inside_archives(listed):
+    with tempfile.TemporaryDirectory() as path:
+        leaf = make_archive(os.path.join(path, 'leaf.zip'), ('leaf.txt', b'leaf'))
+        inner = make_archive(os.path.join(path, 'inner.zip'), ('dir/leaf.zip', leaf))
+        os.unlink(os.path.join(path, 'leaf.zip'))
+        os.unlink(os.path.join(path, 'inner.zip'))
+        make_archive(os.path.join(path, 'outer.zip'), ('inner.zip', inner), ('top.txt', b'top'))
+
+        config = {'replace': True}
+        entities = (Scanner(config), Decompressor(config), Replacer(config), Stopper(config))
+        prepare_all(*entities)
+        start_all(*entities)
+        with patch('engorgio.decompressor.MAX_LISTED_ENTRIES', 1000 if listed else 0):
+            UserScanRequested(path=path).emit()
+            join_all(*entities)
+
+        files = sorted(os.path.relpath(os.path.join(dirpath, name), path)
+                       for dirpath, _, names in os.walk(path) for name in names)
+        assert files == ['outer.zip/inner.zip/dir/leaf.zip/leaf.txt', 'outer.zip/top.txt']
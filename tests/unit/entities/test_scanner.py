@@ -2,12 +2,18 @@ from unittest.mock import patch
 import inspect
 import os
 import tempfile
+import threading
+import time
 
+import pytest
 
-from engorgio.entities.scanner import classify_path, scandir, Scanner
+from engorgio.entities.scanner import classify_path, emit_batched, scandir, Scanner
+from engorgio.signals import ContentAdded
 from engorgio.signals import DirFound
+from engorgio.signals import EntriesFound
 from engorgio.signals import ExitRequested
 from engorgio.signals import FileFound
+from engorgio.signals import PathProcessingFinished
 from engorgio.signals import SpecialFileFound
 from engorgio.signals import SymlinkFound
 from engorgio.signals import UserScanRequested
@@ -152,3 +158,260 @@ def test_scanner_find_directory_contents_on_dirfound():
 
         assert found == set({FileFound(path=filename),
                              SymlinkFound(path=linkname)})
+
+
+def test_emit_batched_groups_signals_in_entriesfound():
+    found = list()
+
+    def get_found(sender, signal):
+        found.append(signal)
+
+    EntriesFound.connect(get_found)
+    FileFound.connect(get_found)
+
+    signals = [FileFound(path=str(i)) for i in range(5)]
+    emit_batched(signals, 2)
+
+    assert found == [EntriesFound(signals=tuple(signals[0:2])),
+                     EntriesFound(signals=tuple(signals[2:4])),
+                     signals[4]]
+
+
+def test_emit_batched_does_not_emit_empty_batches():
+    found = list()
+
+    def get_found(sender, signal):
+        found.append(signal)
+
+    EntriesFound.connect(get_found)
+
+    emit_batched([], 10)
+
+    assert found == []
+
+
+def test_scanner_batches_directory_contents_on_dirfound():
+    found = list()
+
+    def get_found(sender, signal):
+        found.append(signal)
+
+    EntriesFound.connect(get_found)
+
+    with tempfile.TemporaryDirectory() as path:
+        filenames = {os.path.join(path, f'{i}.txt') for i in range(10)}
+        for filename in filenames:
+            open(filename, 'w').close()  # Touch
+
+        scanner = Scanner({'scanner_batch_size': 4})
+        scanner.prepare()
+        scanner.start()
+        DirFound(path=path).emit()
+        ExitRequested().emit()
+        scanner.join()
+
+        assert [len(batch.signals) for batch in found] == [4, 4, 2]
+        assert {s for batch in found for s in batch.signals} == {FileFound(path=f) for f in filenames}
+
+
+@pytest.mark.parametrize('batch_size', [0, -1])
+def test_invalid_batch_size_is_rejected(batch_size):
+    with pytest.raises(ValueError):
+        Scanner({'scanner_batch_size': batch_size})
+
+
+@pytest.mark.timeout(5)
+def test_scanner_with_several_workers_finds_the_whole_tree():
+    found = set()
+    lock = threading.Lock()
+
+    def get_found_files(sender, signal):
+        with lock:
+            found.add(signal)
+
+    FileFound.connect(get_found_files)
+
+    with tempfile.TemporaryDirectory() as path:
+        expected = set()
+        for i in range(5):
+            for j in range(5):
+                dirname = os.path.join(path, str(i), str(j))
+                os.makedirs(dirname)
+                filename = os.path.join(dirname, 'foo.txt')
+                open(filename, 'w').close()  # Touch foo.txt
+                expected.add(FileFound(path=filename))
+
+        scanner = Scanner({'scanner_workers': 4})
+        scanner.prepare()
+        scanner.start()
+        DirFound(path=path).emit()
+        while len(found) < len(expected):
+            time.sleep(0.01)
+        ExitRequested().emit()
+        scanner.join()
+
+        assert found == expected
+
+
+@pytest.mark.timeout(5)
+def test_scanner_with_several_workers_scans_directories_at_the_same_time():
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def slow_scandir(path):
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return iter(())
+
+    with patch('engorgio.entities.scanner.scandir', slow_scandir):
+        scanner = Scanner({'scanner_workers': 4})
+        scanner.prepare()
+        scanner.start()
+        for i in range(8):
+            DirFound(path=str(i)).emit()
+        ExitRequested().emit()
+        scanner.join()
+
+    assert max_running > 1
+
+
+def test_classify_path_fills_metadata_of_regular_files():
+    with tempfile.NamedTemporaryFile() as file:
+        file.write(b'foo')
+        file.flush()
+        st = os.lstat(file.name)
+
+        signal = classify_path(file.name)
+
+        assert (signal.device, signal.inode, signal.size, signal.mtime) == \
+            (st.st_dev, st.st_ino, 3, st.st_mtime_ns)
+
+
+def test_classify_path_fills_metadata_of_directories():
+    with tempfile.TemporaryDirectory() as path:
+        assert classify_path(path).inode == os.lstat(path).st_ino
+
+
+def test_classify_path_does_a_single_lstat():
+    with tempfile.NamedTemporaryFile() as file:
+        with patch('os.lstat', wraps=os.lstat) as lstat, patch('os.stat', wraps=os.stat) as stat:
+            classify_path(file.name)
+
+        lstat.assert_called_once_with(file.name)
+        stat.assert_not_called()
+
+
+def test_classify_path_returns_a_specialfilefound_if_path_does_not_exist():
+    with tempfile.TemporaryDirectory() as path:
+        missing = os.path.join(path, 'missing')
+        assert classify_path(missing) == SpecialFileFound(path=missing)
+
+
+def test_scandir_fills_metadata_of_files_and_directories():
+    with tempfile.TemporaryDirectory() as path:
+        filepath = os.path.join(path, 'regular_file')
+        with open(filepath, 'wb') as f:
+            f.write(b'foo')
+        dirpath = os.path.join(path, 'dir')
+        os.mkdir(dirpath)
+
+        found = {s.path: s for s in scandir(path)}
+
+        assert found[filepath].size == 3
+        assert found[filepath].inode == os.lstat(filepath).st_ino
+        assert found[filepath].mtime == os.lstat(filepath).st_mtime_ns
+        assert found[dirpath].device == os.lstat(dirpath).st_dev
+
+
+def run_scanner(*signals):
+    received = list()
+
+    def get_signals(sender, signal):
+        received.append(signal)
+
+    FileFound.connect(get_signals)
+    PathProcessingFinished.connect(get_signals)
+
+    scanner = Scanner({})
+    scanner.prepare()
+    scanner.start()
+    for signal in signals:
+        signal.emit()
+    ExitRequested().emit()
+    scanner.join()
+
+    return received
+
+
+@pytest.mark.timeout(5)
+def test_scanner_finishes_directories_after_emitting_their_contents():
+    with tempfile.TemporaryDirectory() as path:
+        filename = os.path.join(path, 'foo.txt')
+        open(filename, 'w').close()  # Touch foo.txt
+
+        received = run_scanner(DirFound(path=path))
+
+        assert received == [FileFound(path=filename), PathProcessingFinished(path=path)]
+
+
+@pytest.mark.timeout(5)
+def test_scanner_finishes_unreadable_directories():
+    with tempfile.TemporaryDirectory() as path:
+        missing = os.path.join(path, 'missing')
+
+        assert run_scanner(DirFound(path=missing)) == [PathProcessingFinished(path=missing)]
+
+
+@pytest.mark.timeout(5)
+def test_scanner_finishes_user_scan_requests_after_classifying_them():
+    with tempfile.NamedTemporaryFile() as file:
+        received = run_scanner(UserScanRequested(path=file.name))
+
+        assert received == [FileFound(path=file.name), PathProcessingFinished(path=file.name)]
+
+
+@pytest.mark.timeout(5)
+def test_scanner_finishes_symlinks_and_special_files():
+    received = run_scanner(SymlinkFound(path='foo'), SpecialFileFound(path='bar'))
+
+    assert received == [PathProcessingFinished(path='foo'), PathProcessingFinished(path='bar')]
+
+
+@pytest.mark.timeout(5)
+def test_scanner_scans_only_the_added_content():
+    with tempfile.TemporaryDirectory() as path:
+        open(os.path.join(path, 'sibling.txt'), 'w').close()
+        added = os.path.join(path, 'archive.zip')
+        os.mkdir(added)
+        filename = os.path.join(added, 'foo.txt')
+        open(filename, 'w').close()
+
+        received = run_scanner(ContentAdded(source=added, path=added))
+
+        assert received == [FileFound(path=filename), PathProcessingFinished(path=added)]
+
+
+@pytest.mark.timeout(5)
+def test_scanner_emits_the_listed_entries_of_added_content_without_scanning():
+    received = list()
+
+    def get_signals(sender, signal):
+        received.append(signal)
+
+    SymlinkFound.connect(get_signals)
+
+    entries = (('a/foo.txt', 3), ('link', None))
+    with patch('engorgio.entities.scanner.os.scandir', side_effect=AssertionError('scandir called')):
+        received.extend(run_scanner(ContentAdded(source='/x.zip', path='/x.zip', entries=entries)))
+
+    assert sorted(received, key=repr) == sorted([FileFound(path='/x.zip/a/foo.txt'),
+                                                 SymlinkFound(path='/x.zip/link'),
+                                                 PathProcessingFinished(path='/x.zip')], key=repr)
+    size, = [s.size for s in received if isinstance(s, FileFound)]
+    assert size == 3
@@ -1,9 +1,18 @@
 from time import sleep
+import os
+import shutil
+import tempfile
+import threading
 
 import pytest
 
+from engorgio.entities.decompressor import Decompressor
+from engorgio.entities.scanner import Scanner
 from engorgio.entities.stopper import Stopper
+from engorgio.entity import join_all, prepare_all, start_all
+from engorgio.runtime import AsyncRuntime
 from engorgio.signals import DirFound
+from engorgio.signals import EntriesFound
 from engorgio.signals import ExitRequested
 from engorgio.signals import FileFound
 from engorgio.signals import PathProcessingFinished
@@ -75,3 +84,146 @@ def test_dont_emit_exitrequested_if_there_are_pending_processing():
 
     ExitRequested().emit()
     stopper.join()
+
+
+@pytest.mark.timeout(2)
+def test_count_signals_found_in_batches():
+    signals = set()
+
+    def get_exit_requested(sender, signal):
+        signals.add(signal)
+
+    ExitRequested.connect(get_exit_requested)
+
+    stopper = Stopper(None)
+    stopper.prepare()
+    stopper.start()
+
+    UserScanRequested(path=None).emit()
+    EntriesFound(signals=(DirFound(path=None), FileFound(path=None))).emit()
+
+    PathProcessingFinished(path=None).emit()
+    PathProcessingFinished(path=None).emit()
+    assert not signals
+    PathProcessingFinished(path=None).emit()
+
+    stopper.join()
+
+    assert signals == {ExitRequested()}
+
+
+@pytest.mark.timeout(10)
+@pytest.mark.parametrize('use_runtime', [False, True])
+def test_scanner_decompressor_and_stopper_pipeline_finishes(data_path, use_runtime):
+    with tempfile.TemporaryDirectory() as path, tempfile.TemporaryDirectory() as sandbox:
+        os.makedirs(os.path.join(path, 'a', 'b'))
+        shutil.copy(os.path.join(data_path, 'regularfile.zip'), os.path.join(path, 'a'))
+        shutil.copy(os.path.join(data_path, 'info.txt'), os.path.join(path, 'a', 'b'))
+        os.symlink('a', os.path.join(path, 'link'))
+
+        entities = (Scanner({'scanner_batch_size': 2}), Decompressor({'sandbox': sandbox}), Stopper(None))
+        runtime = AsyncRuntime() if use_runtime else None
+        prepare_all(*entities)
+        start_all(*entities, runtime=runtime)
+        UserScanRequested(path=path).emit()
+        join_all(*entities)
+        if runtime is not None:
+            runtime.close()
+
+        assert len(os.listdir(sandbox)) == 1
+
+
+@pytest.mark.timeout(10)
+def test_pipeline_with_a_bounded_consumer_finishes_on_a_single_thread_runtime():
+    with tempfile.TemporaryDirectory() as path, tempfile.TemporaryDirectory() as sandbox:
+        for i in range(200):
+            open(os.path.join(path, f'{i}.txt'), 'w').close()  # Touch
+
+        config = {'sandbox': sandbox, 'decompressor_workers': 1, 'decompressor_max_pending': 1,
+                  'decompressor_sniff': False}
+        entities = (Scanner(None), Decompressor(config), Stopper(None))
+        with AsyncRuntime(1) as runtime:
+            prepare_all(*entities)
+            start_all(*entities, runtime=runtime)
+            UserScanRequested(path=path).emit()
+            join_all(*entities)
+
+
+def test_signals_are_counted_without_queueing_them():
+    stopper = Stopper(None)
+    stopper.prepare()
+
+    UserScanRequested(path=None).emit()
+    for _ in range(1000):
+        FileFound(path=None).emit()
+        PathProcessingFinished(path=None).emit()
+
+    # Only a completion check is waiting
+    assert stopper._queue.qsize() == 1
+    assert stopper.progress() == (1001, 1000)
+
+    ExitRequested().emit()
+    stopper.start()
+    stopper.join()
+
+
+@pytest.mark.timeout(10)
+def test_signals_emitted_from_many_threads_are_counted_once_each():
+    signals = []
+
+    def get_exit_requested(sender, signal):
+        signals.append(signal)
+
+    ExitRequested.connect(get_exit_requested)
+
+    stopper = Stopper(None)
+    stopper.prepare()
+    stopper.start()
+
+    def work():
+        for _ in range(10000):
+            FileFound(path=None).emit()
+            PathProcessingFinished(path=None).emit()
+
+    UserScanRequested(path=None).emit()
+    workers = [threading.Thread(target=work) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert not signals
+
+    PathProcessingFinished(path=None).emit()
+    stopper.join()
+
+    assert signals == [ExitRequested()]
+    assert stopper.progress() == (40001, 40001)
+
+
+@pytest.mark.timeout(5)
+def test_discoveries_are_counted_before_anybody_processes_them():
+    signals = []
+
+    def get_exit_requested(sender, signal):
+        signals.append(signal)
+
+    def process_at_once(sender, signal):
+        PathProcessingFinished(path=signal.path).emit()
+
+    ExitRequested.connect(get_exit_requested)
+    FileFound.connect(process_at_once)
+    stopper = Stopper(None)
+    stopper.prepare()
+    stopper.start()
+    try:
+        UserScanRequested(path='foo').emit()
+        FileFound(path='foo/bar').emit()
+        sleep(0.1)
+        assert not signals
+
+        PathProcessingFinished(path='foo').emit()
+        stopper.join()
+    finally:
+        FileFound.disconnect(process_at_once)
+
+    assert signals == [ExitRequested()]
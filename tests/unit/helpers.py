@@ -0,0 +1,16 @@
+"""Functions shared by the tests."""
+import libarchive
+
+
+def write(path, data=b'foo'):
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def make_archive(path, *entries, format_name='zip'):
+    with libarchive.file_writer(path, format_name) as archive:
+        for name, data in entries:
+            archive.add_file_from_memory(name, len(data), data)
+    with open(path, 'rb') as f:
+        return f.read()
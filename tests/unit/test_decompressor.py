@@ -1,8 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+import io
 import os
+import pickle
+import tarfile
 import tempfile
 
-from engorgio.decompressor import decompress
-from engorgio.signals import Decompressed, DecompressionFailed
+import libarchive
+import pytest
+
+from engorgio.decompressor import UnsafeEntryError, decompress, safe_join
+from engorgio.signals import Decompressed, DecompressionDiscarded, DecompressionFailed
+
+from helpers import make_archive
 
 
 def test_returns_decompressed_on_success(data_path):
@@ -27,3 +37,329 @@ def test_returns_decompressedfailed_with_a_malformed_compressed_file(data_path):
     with tempfile.TemporaryDirectory() as sandbox:
         regular_file_path = os.path.join(data_path, 'malformed.zip')
         assert isinstance(decompress(regular_file_path, sandbox), DecompressionFailed)
+
+
+def test_decompressionfailed_can_be_pickled(data_path):
+    with tempfile.TemporaryDirectory() as sandbox:
+        failed = decompress(os.path.join(data_path, 'malformed.zip'), sandbox)
+
+        assert pickle.loads(pickle.dumps(failed)) == failed
+
+
+def test_decompress_does_not_change_the_working_directory(data_path):
+    with tempfile.TemporaryDirectory() as sandbox:
+        previous_workdir = os.getcwd()
+        decompress(os.path.join(data_path, 'regularfile.zip'), sandbox)
+        assert os.getcwd() == previous_workdir
+
+
+def test_decompress_can_run_in_parallel_threads(data_path):
+    regular_file_path = os.path.join(data_path, 'regularfile.zip')
+    with tempfile.TemporaryDirectory() as sandbox:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: decompress(regular_file_path, sandbox), range(32)))
+
+        assert len({r.path for r in results}) == 32
+        for result in results:
+            assert isinstance(result, Decompressed)
+            assert os.listdir(result.path) == ['info.txt']
+
+
+def test_decompress_extracts_nested_directories():
+    with tempfile.TemporaryDirectory() as sandbox:
+        archive_path = os.path.join(sandbox, 'nested.zip')
+        make_archive(archive_path, ('a/b/c.txt', b'c'), ('d.txt', b'd'))
+
+        result = decompress(archive_path, sandbox)
+
+        with open(os.path.join(result.path, 'a', 'b', 'c.txt'), 'rb') as f:
+            assert f.read() == b'c'
+        with open(os.path.join(result.path, 'd.txt'), 'rb') as f:
+            assert f.read() == b'd'
+
+
+@pytest.mark.parametrize('name', ['../evil.txt', 'a/../../evil.txt', '/tmp/evil.txt'])
+def test_decompress_refuses_entries_outside_destination(name):
+    with tempfile.TemporaryDirectory() as sandbox:
+        archive_path = os.path.join(sandbox, 'evil.tar')
+        make_archive(archive_path, ('good.txt', b'good'), (name, b'evil'), format_name='ustar')
+
+        result = decompress(archive_path, sandbox)
+
+        assert isinstance(result, DecompressionFailed)
+        assert result.error.startswith('UnsafeEntryError: ')
+        assert result.partial
+        assert not os.path.exists(os.path.join(sandbox, 'evil.txt'))
+
+
+def test_safe_join_refuses_to_follow_extracted_symlinks():
+    with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as outside:
+        os.symlink(outside, os.path.join(root, 'link'))
+
+        with pytest.raises(UnsafeEntryError):
+            safe_join(root, 'link/evil.txt')
+
+
+def test_decompress_refuses_to_write_through_extracted_symlinks():
+    with tempfile.TemporaryDirectory() as sandbox, tempfile.TemporaryDirectory() as outside:
+        victim = os.path.join(outside, 'victim')
+        with open(victim, 'w') as f:
+            f.write('orig')
+        archive_path = os.path.join(outside, 'evil.tar')
+        with tarfile.open(archive_path, 'w') as archive:
+            info = tarfile.TarInfo('x')
+            info.type = tarfile.SYMTYPE
+            info.linkname = victim
+            archive.addfile(info)
+            info = tarfile.TarInfo('x')
+            info.size = 5
+            archive.addfile(info, io.BytesIO(b'pwned'))
+
+        result = decompress(archive_path, sandbox)
+
+        assert isinstance(result, DecompressionFailed)
+        assert result.error.startswith('UnsafeEntryError: ')
+        with open(victim) as f:
+            assert f.read() == 'orig'
+
+
+def test_decompress_refuses_hard_links_to_extracted_symlinks():
+    with tempfile.TemporaryDirectory() as sandbox, tempfile.TemporaryDirectory() as outside:
+        victim = os.path.join(outside, 'victim')
+        with open(victim, 'w') as f:
+            f.write('orig')
+        archive_path = os.path.join(outside, 'evil.tar')
+        with tarfile.open(archive_path, 'w') as archive:
+            info = tarfile.TarInfo('x')
+            info.type = tarfile.SYMTYPE
+            info.linkname = victim
+            archive.addfile(info)
+            info = tarfile.TarInfo('y')
+            info.type = tarfile.LNKTYPE
+            info.linkname = 'x'
+            archive.addfile(info)
+
+        result = decompress(archive_path, sandbox)
+
+        assert isinstance(result, DecompressionFailed)
+        assert result.error.startswith('UnsafeEntryError: ')
+        assert os.stat(victim).st_nlink == 1
+
+
+def test_decompress_writes_the_last_copy_of_repeated_files():
+    with tempfile.TemporaryDirectory() as path, tempfile.TemporaryDirectory() as sandbox:
+        archive_path = os.path.join(path, 'appended.tar')
+        with tarfile.open(archive_path, 'w') as archive:
+            for data in (b'old', b'new!'):
+                info = tarfile.TarInfo('f.txt')
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+
+        result = decompress(archive_path, sandbox)
+
+        assert isinstance(result, Decompressed)
+        assert result.entries == (('f.txt', 4),)
+        with open(os.path.join(result.path, 'f.txt'), 'rb') as f:
+            assert f.read() == b'new!'
+
+
+def test_decompressionfailed_error_has_no_libarchive_details(data_path):
+    with tempfile.TemporaryDirectory() as sandbox:
+        failed = decompress(os.path.join(data_path, 'malformed.zip'), sandbox)
+
+        assert failed.error.startswith('ArchiveError: ')
+        assert 'errno=' not in failed.error
+
+
+def test_safe_join_joins_regular_names():
+    assert safe_join('/sandbox', './a/b.txt') == os.path.join('/sandbox', 'a', 'b.txt')
+
+
+def test_decompress_does_not_create_directories_for_non_archives(data_path):
+    with tempfile.TemporaryDirectory() as sandbox:
+        result = decompress(os.path.join(data_path, 'malformed.zip'), sandbox)
+
+        assert result.path is None
+        assert not result.partial
+        assert os.listdir(sandbox) == []
+
+
+def test_decompress_discards_empty_archives():
+    with tempfile.TemporaryDirectory() as path, tempfile.TemporaryDirectory() as sandbox:
+        archive_path = os.path.join(path, 'empty.zip')
+        make_archive(archive_path)
+
+        result = decompress(archive_path, sandbox)
+
+        assert result == DecompressionDiscarded(path=archive_path, reason='empty archive')
+        assert os.listdir(sandbox) == []
+
+
+def test_decompress_does_not_create_directories_if_first_entry_is_unsafe():
+    with tempfile.TemporaryDirectory() as path, tempfile.TemporaryDirectory() as sandbox:
+        archive_path = os.path.join(path, 'evil.tar')
+        make_archive(archive_path, ('../evil.txt', b'evil'), format_name='ustar')
+
+        result = decompress(archive_path, sandbox)
+
+        assert isinstance(result, DecompressionFailed)
+        assert not result.partial
+        assert os.listdir(sandbox) == []
+
+
+def make_nested_archive(path):
+    inner_tar = os.path.join(os.path.dirname(path), 'inner.tar.gz')
+    with libarchive.file_writer(inner_tar, 'ustar', 'gzip') as archive:
+        archive.add_file_from_memory('leaf.txt', 4, b'leaf')
+    with open(inner_tar, 'rb') as f:
+        inner_tar_data = f.read()
+
+    inner_zip = os.path.join(os.path.dirname(path), 'inner.zip')
+    make_archive(inner_zip, ('inner.tar.gz', inner_tar_data), ('other.txt', b'other'))
+    with open(inner_zip, 'rb') as f:
+        inner_zip_data = f.read()
+
+    make_archive(path, ('dir/inner.zip', inner_zip_data), ('top.txt', b'top'))
+
+
+def list_files(root):
+    return sorted(os.path.relpath(os.path.join(dirpath, name), root)
+                  for dirpath, _, names in os.walk(root) for name in names)
+
+
+def test_decompress_writes_nested_archives_as_files_by_default():
+    with tempfile.TemporaryDirectory() as path, tempfile.TemporaryDirectory() as sandbox:
+        archive_path = os.path.join(path, 'outer.zip')
+        make_nested_archive(archive_path)
+
+        result = decompress(archive_path, sandbox)
+
+        assert list_files(result.path) == ['dir/inner.zip', 'top.txt']
+
+
+def test_decompress_expands_nested_archives_from_memory():
+    with tempfile.TemporaryDirectory() as path, tempfile.TemporaryDirectory() as sandbox:
+        archive_path = os.path.join(path, 'outer.zip')
+        make_nested_archive(archive_path)
+
+        result = decompress(archive_path, sandbox, nested=True)
+
+        assert isinstance(result, Decompressed)
+        assert list_files(result.path) == ['dir/inner.zip/inner.tar.gz/leaf.txt',
+                                           'dir/inner.zip/other.txt',
+                                           'top.txt']
+        with open(os.path.join(result.path, 'dir/inner.zip/inner.tar.gz/leaf.txt'), 'rb') as f:
+            assert f.read() == b'leaf'
+
+
+def test_decompress_writes_malformed_nested_archives_as_files():
+    with tempfile.TemporaryDirectory() as path, tempfile.TemporaryDirectory() as sandbox:
+        archive_path = os.path.join(path, 'outer.zip')
+        make_archive(archive_path, ('fake.zip', b'PK\x03\x04 but not really a zip'))
+
+        result = decompress(archive_path, sandbox, nested=True)
+
+        assert isinstance(result, Decompressed)
+        assert list_files(result.path) == ['fake.zip']
+        with open(os.path.join(result.path, 'fake.zip'), 'rb') as f:
+            assert f.read() == b'PK\x03\x04 but not really a zip'
+
+
+def test_decompress_lists_the_files_written():
+    with tempfile.TemporaryDirectory() as path, tempfile.TemporaryDirectory() as sandbox:
+        archive_path = os.path.join(path, 'outer.zip')
+        make_nested_archive(archive_path)
+
+        result = decompress(archive_path, sandbox)
+
+        assert sorted(name for name, _ in result.entries) == list_files(result.path)
+        for name, size in result.entries:
+            assert size == os.path.getsize(os.path.join(result.path, name))
+
+
+def test_decompress_lists_the_leaf_files_of_nested_archives():
+    with tempfile.TemporaryDirectory() as path, tempfile.TemporaryDirectory() as sandbox:
+        archive_path = os.path.join(path, 'outer.zip')
+        make_nested_archive(archive_path)
+        fake = b'PK\x03\x04 but not really a zip'
+        make_archive(os.path.join(path, 'fake.zip'), ('fake.zip', fake))
+
+        result = decompress(archive_path, sandbox, nested=True)
+        malformed = decompress(os.path.join(path, 'fake.zip'), sandbox, nested=True)
+
+        assert sorted(name for name, _ in result.entries) == list_files(result.path)
+        assert result.size == sum(size for _, size in result.entries)
+        assert malformed.entries == (('fake.zip', len(fake)),)
+        assert malformed.size == len(fake)
+
+
+def test_decompress_lists_symlinks_without_size():
+    with tempfile.TemporaryDirectory() as sandbox:
+        archive_path = os.path.join(sandbox, 'links.tar')
+        with tarfile.open(archive_path, 'w') as archive:
+            info = tarfile.TarInfo('file.txt')
+            info.size = 3
+            archive.addfile(info, io.BytesIO(b'foo'))
+            info = tarfile.TarInfo('link')
+            info.type = tarfile.SYMTYPE
+            info.linkname = 'file.txt'
+            archive.addfile(info)
+
+        result = decompress(archive_path, sandbox)
+
+        assert dict(result.entries) == {'file.txt': 3, 'link': None}
+
+
+def test_decompress_writes_entries_with_undecodable_names():
+    with tempfile.TemporaryDirectory() as path, tempfile.TemporaryDirectory() as sandbox:
+        archive_path = os.path.join(path, 'latin.tar')
+        with tarfile.open(archive_path, 'w', format=tarfile.USTAR_FORMAT, encoding='latin-1') as archive:
+            info = tarfile.TarInfo('caf\xe9.txt')
+            info.size = 3
+            archive.addfile(info, io.BytesIO(b'foo'))
+
+        result = decompress(archive_path, sandbox)
+
+        assert isinstance(result, Decompressed)
+        assert os.listdir(os.fsencode(result.path)) == [b'caf\xe9.txt']
+        assert result.entries == ((os.fsdecode(b'caf\xe9.txt'), 3),)
+
+
+def test_decompress_does_not_list_too_many_files():
+    with tempfile.TemporaryDirectory() as sandbox:
+        archive_path = os.path.join(sandbox, 'many.zip')
+        make_archive(archive_path, ('a', b'a'), ('b', b'b'))
+
+        with patch('engorgio.decompressor.MAX_LISTED_ENTRIES', 1):
+            result = decompress(archive_path, sandbox)
+
+        assert isinstance(result, Decompressed)
+        assert result.entries is None
+        assert result.size == 2
+
+
+def test_decompress_nested_depth_is_limited():
+    with tempfile.TemporaryDirectory() as path, tempfile.TemporaryDirectory() as sandbox:
+        archive_path = os.path.join(path, 'outer.zip')
+        make_nested_archive(archive_path)
+
+        with patch('engorgio.decompressor.NESTED_MAX_DEPTH', 1):
+            result = decompress(archive_path, sandbox, nested=True)
+
+        assert list_files(result.path) == ['dir/inner.zip/inner.tar.gz', 'dir/inner.zip/other.txt', 'top.txt']
+
+
+def test_decompress_nested_buffered_bytes_are_limited():
+    with tempfile.TemporaryDirectory() as path, tempfile.TemporaryDirectory() as sandbox:
+        archive_path = os.path.join(path, 'outer.zip')
+        make_nested_archive(archive_path)
+        # Room for inner.zip, but not for inner.tar.gz while inner.zip is held
+        limit = sum(os.path.getsize(os.path.join(path, name)) for name in ('inner.zip', 'inner.tar.gz')) - 1
+
+        with patch('engorgio.decompressor.NESTED_MAX_BUFFERED', limit):
+            result = decompress(archive_path, sandbox, nested=True)
+
+        assert list_files(result.path) == ['dir/inner.zip/inner.tar.gz', 'dir/inner.zip/other.txt', 'top.txt']
+        with open(os.path.join(result.path, 'dir/inner.zip/inner.tar.gz'), 'rb') as f:
+            with open(os.path.join(path, 'inner.tar.gz'), 'rb') as inner:
+                assert f.read() == inner.read()
@@ -0,0 +1,118 @@
+from unittest.mock import patch
+import os
+import tempfile
+
+from engorgio.dedup import DedupCache, clone_tree, content_hash
+
+from helpers import write
+
+
+def test_content_hash_depends_only_on_content(tmpdir_path):
+    a = write(os.path.join(tmpdir_path, 'a'), b'foo')
+    b = write(os.path.join(tmpdir_path, 'b'), b'foo')
+    c = write(os.path.join(tmpdir_path, 'c'), b'bar')
+
+    assert content_hash(a) == content_hash(b)
+    assert content_hash(a) != content_hash(c)
+
+
+def test_key_does_not_hash_archives_with_unseen_size(tmpdir_path):
+    path = write(os.path.join(tmpdir_path, 'a'), b'foo')
+    cache = DedupCache()
+
+    with patch('engorgio.dedup.content_hash') as hash_:
+        assert cache.key(path, 3) == (3, None)
+
+    hash_.assert_not_called()
+
+
+def test_identical_archive_is_found(tmpdir_path):
+    first = write(os.path.join(tmpdir_path, 'a'), b'foo')
+    second = write(os.path.join(tmpdir_path, 'b'), b'foo')
+    expanded = tempfile.mkdtemp(dir=tmpdir_path)
+    cache = DedupCache()
+
+    cache.add(cache.key(first, 3), first, expanded)
+
+    assert cache.get(cache.key(second, 3)) == expanded
+
+
+def test_different_archive_with_same_size_is_not_found(tmpdir_path):
+    first = write(os.path.join(tmpdir_path, 'a'), b'foo')
+    second = write(os.path.join(tmpdir_path, 'b'), b'bar')
+    cache = DedupCache()
+
+    cache.add(cache.key(first, 3), first, tempfile.mkdtemp(dir=tmpdir_path))
+
+    assert cache.get(cache.key(second, 3)) is None
+
+
+def test_expansions_no_longer_there_are_not_returned(tmpdir_path):
+    first = write(os.path.join(tmpdir_path, 'a'), b'foo')
+    second = write(os.path.join(tmpdir_path, 'b'), b'foo')
+    expanded = tempfile.mkdtemp(dir=tmpdir_path)
+    cache = DedupCache()
+    cache.add(cache.key(first, 3), first, expanded)
+
+    os.rmdir(expanded)
+
+    assert cache.get(cache.key(second, 3)) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmpdir_path):
+    cache = DedupCache(capacity=2)
+    for name in 'abc':
+        cache.add((1, name), name, tmpdir_path)
+
+    assert cache.get((1, 'a')) is None
+    assert cache.get((1, 'b')) == tmpdir_path
+    assert cache.get((1, 'c')) == tmpdir_path
+
+
+def test_on_disk_index_survives_across_instances(tmpdir_path):
+    index_path = os.path.join(tmpdir_path, 'index.sqlite')
+    first = write(os.path.join(tmpdir_path, 'a'), b'foo')
+    second = write(os.path.join(tmpdir_path, 'b'), b'foo')
+    expanded = tempfile.mkdtemp(dir=tmpdir_path)
+
+    cache = DedupCache(index_path=index_path)
+    cache.add((3, content_hash(first)), first, expanded)
+    cache.close()
+
+    cache = DedupCache(index_path=index_path)
+    assert cache.get(cache.key(second, 3)) == expanded
+    cache.close()
+
+
+def test_clone_tree_hard_links_files(tmpdir_path):
+    source = os.path.join(tmpdir_path, 'source')
+    os.makedirs(os.path.join(source, 'dir'))
+    write(os.path.join(source, 'dir', 'file'), b'foo')
+    os.symlink('dir/file', os.path.join(source, 'link'))
+
+    clone = clone_tree(source, tmpdir_path)
+
+    assert os.path.samefile(os.path.join(source, 'dir', 'file'), os.path.join(clone, 'dir', 'file'))
+    assert os.readlink(os.path.join(clone, 'link')) == 'dir/file'
+
+
+def test_extra_values_are_returned_along_with_the_expansion(tmpdir_path):
+    first = write(os.path.join(tmpdir_path, 'a'), b'foo')
+    second = write(os.path.join(tmpdir_path, 'b'), b'foo')
+    expanded = tempfile.mkdtemp(dir=tmpdir_path)
+    cache = DedupCache()
+    cache.add(cache.key(first, 3), first, expanded, 'extra')
+
+    assert cache.lookup(cache.key(second, 3)) == (expanded, 'extra')
+
+
+def test_extra_values_are_not_kept_in_the_on_disk_index(tmpdir_path):
+    first = write(os.path.join(tmpdir_path, 'a'), b'foo')
+    expanded = tempfile.mkdtemp(dir=tmpdir_path)
+    index_path = os.path.join(tmpdir_path, 'index.sqlite')
+    cache = DedupCache(index_path=index_path)
+    cache.add((3, content_hash(first)), first, expanded, 'extra')
+    cache.close()
+
+    cache = DedupCache(index_path=index_path)
+    assert cache.lookup((3, content_hash(first))) == (expanded, None)
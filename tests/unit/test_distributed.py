@@ -0,0 +1,61 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from engorgio.distributed import connect_master, run_worker
+from engorgio.entities.scanner import Scanner
+from engorgio.entities.stopper import Stopper
+from engorgio.entity import join_all, prepare_all, start_all
+from engorgio.signals import Decompressed, FileFound, UserScanRequested
+from engorgio.signals.transport import Broker
+
+
+@pytest.mark.timeout(60)
+def test_decompression_is_sharded_among_worker_processes(data_path):
+    context = multiprocessing.get_context('spawn')
+    broker = Broker()
+    decompressed = []
+
+    def on_decompressed(sender, signal):
+        decompressed.append(signal)
+
+    Decompressed.connect(on_decompressed)
+    with tempfile.TemporaryDirectory() as path, tempfile.TemporaryDirectory() as sandboxes:
+        for i in range(6):
+            os.makedirs(os.path.join(path, str(i)))
+            shutil.copy(os.path.join(data_path, 'regularfile.zip'), os.path.join(path, str(i)))
+        workers = []
+        try:
+            for i in range(2):
+                sandbox = os.path.join(sandboxes, str(i))
+                os.mkdir(sandbox)
+                config = {'sandbox': sandbox, 'decompressor_workers': 1}
+                worker = context.Process(target=run_worker, args=(broker.address, config))
+                worker.start()
+                workers.append((worker, sandbox))
+            assert broker.wait_for_subscribers(FileFound, 2, shared=True, timeout=30)
+
+            entities = (Scanner(None), Stopper(None))
+            prepare_all(*entities)
+            transport = connect_master(broker.address)
+            start_all(*entities)
+            UserScanRequested(path=path).emit()
+            join_all(*entities)
+
+            for worker, _ in workers:
+                worker.join(timeout=30)
+                assert worker.exitcode == 0
+            transport.close()
+        finally:
+            for worker, _ in workers:
+                if worker.is_alive():
+                    worker.kill()
+            broker.close()
+            Decompressed.disconnect(on_decompressed)
+
+        assert len(decompressed) == 6
+        for _, sandbox in workers:
+            assert len(os.listdir(sandbox)) == 3
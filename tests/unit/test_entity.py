@@ -1,14 +1,18 @@
 from unittest.mock import MagicMock, patch
 import inspect
+import logging
 import threading
+import time
 
 import pytest
 
+from engorgio.entity import COALESCED, INLINE
 from engorgio.entity import Entity
 from engorgio.entity import join_all
 from engorgio.entity import prepare_all
 from engorgio.entity import start_all
-from engorgio.signals import _Signal, ExitRequested
+from engorgio.mailbox import DROP, QueueMailbox
+from engorgio.signals import _Signal, DirFound, EntriesFound, ExitRequested, FileFound
 
 
 def test_is_abstract():
@@ -34,7 +38,9 @@ def test_has_some_abstract_methods(name):
                                   '_attach',
                                   '_dispatch',
                                   '_dequeue',
-                                  '_enqueue'])
+                                  '_enqueue',
+                                  'enable_stats',
+                                  'stats'])
 def test_has_some_regular_methods(name):
     try:
         method = getattr(Entity, name)
@@ -274,6 +280,29 @@ def test_dispatch_signal_dont_call_twice():
     assert received == 1
 
 
+def test_dispatch_entriesfound_to_handlers_of_its_signals():
+    received = list()
+
+    class Dummy(Entity):
+        def _configure(self):
+            pass
+
+        def on_file_found(self, signal):
+            received.append(signal)
+
+        def _prepare(self):
+            self._attach(FileFound, self.on_file_found)
+
+    entity = Dummy(None)
+    entity.prepare()
+
+    entity._dispatch(EntriesFound(signals=(FileFound(path='foo'),
+                                           DirFound(path='bar'),
+                                           FileFound(path='baz'))))
+
+    assert received == [FileFound(path='foo'), FileFound(path='baz')]
+
+
 def test_signal_get_connected_to_queue_put():
     """
     Given that ExitRequested is connected during prepare this test also
@@ -357,6 +386,120 @@ def test_signals_get_dispatched_until_exitrequested():
     assert expected is test_signal
 
 
+def test_join_disconnects_from_signals():
+
+    class TestSignal(_Signal):
+        pass
+
+    class Dummy(Entity):
+        def _configure(self):
+            pass
+
+        def on_TestSignal(self, signal):
+            pass
+
+        def _prepare(self):
+            self._attach(TestSignal, self.on_TestSignal)
+
+    entity = Dummy(None)
+    entity.prepare()
+    entity.start()
+    ExitRequested().emit()
+    entity.join()
+
+    TestSignal().emit()
+    ExitRequested().emit()
+
+    assert entity._queue.empty()
+
+
+def test_stats_are_disabled_by_default():
+
+    class Dummy(Entity):
+        def _configure(self):
+            pass
+
+        def _prepare(self):
+            pass
+
+    assert Dummy(None).stats() is None
+
+
+def test_stats_count_signals_and_measure_handlers():
+
+    class TestSignal(_Signal):
+        pass
+
+    class Dummy(Entity):
+        def _configure(self):
+            pass
+
+        def on_TestSignal(self, signal):
+            time.sleep(0.01)
+
+        def _prepare(self):
+            self._attach(TestSignal, self.on_TestSignal)
+
+    entity = Dummy(None)
+    entity.enable_stats()
+    entity.prepare()
+    entity.start()
+    TestSignal().emit()
+    TestSignal().emit()
+    ExitRequested().emit()
+    entity.join()
+
+    stats = entity.stats()
+    assert stats['enqueued'] == {'TestSignal': 2, 'ExitRequested': 1}
+    assert stats['processed'] == {'TestSignal': 2, 'ExitRequested': 1}
+    assert stats['dispatch_time']['TestSignal']['total'] >= 0.02
+    # Signals are dequeued in batches, waiting once per batch
+    assert 1 <= stats['wait_time']['count'] <= 3
+    assert stats['queue_depth'] == 0
+
+
+def test_stats_are_logged_periodically(caplog):
+
+    class Dummy(Entity):
+        def _configure(self):
+            pass
+
+        def _prepare(self):
+            pass
+
+    entity = Dummy(None)
+    entity.enable_stats(interval=0.01)
+    entity.prepare()
+    with caplog.at_level(logging.INFO, logger='engorgio.entity'):
+        entity.start()
+        time.sleep(0.1)
+        ExitRequested().emit()
+        entity.join()
+
+    assert 'Dummy stats' in caplog.text
+
+
+def test_enable_stats_should_raise_after_start():
+
+    class Dummy(Entity):
+        def _configure(self):
+            pass
+
+        def _dequeue(self):
+            pass  # Avoid infinite loop
+
+        def _prepare(self):
+            pass
+
+    entity = Dummy(None)
+    entity.prepare()
+    entity.start()
+
+    with pytest.raises(RuntimeError):
+        entity.enable_stats()
+    entity.join()
+
+
 def test_prepare_all_call_prepare_on_all_entitities():
     e1 = MagicMock()
     e2 = MagicMock()
@@ -385,3 +528,151 @@ def test_join_all_call_join_on_all_entitities():
 
     e1.join.assert_called_once()
     e2.join.assert_called_once()
+
+
+def test_full_mailbox_drops_signals_with_drop_policy():
+
+    class TestSignal(_Signal):
+        pass
+
+    class Dummy(Entity):
+        def _configure(self):
+            self._queue_maxsize = 1
+            self._queue_policy = DROP
+
+        def on_TestSignal(self, signal):
+            pass
+
+        def _prepare(self):
+            self._attach(TestSignal, self.on_TestSignal)
+
+    entity = Dummy(None)
+    entity.prepare()
+    TestSignal().emit()
+    TestSignal().emit()
+
+    assert entity._queue.qsize() == 1
+    assert entity._queue.dropped == 1
+
+
+@pytest.mark.timeout(5)
+def test_exit_requested_is_not_blocked_by_a_full_mailbox():
+
+    class TestSignal(_Signal):
+        pass
+
+    class Dummy(Entity):
+        def _configure(self):
+            self._queue_maxsize = 1
+
+        def on_TestSignal(self, signal):
+            pass
+
+        def _prepare(self):
+            self._attach(TestSignal, self.on_TestSignal)
+
+    entity = Dummy(None)
+    entity.prepare()
+    TestSignal().emit()
+    ExitRequested().emit()
+    entity.start()
+    entity.join()
+
+    assert entity._queue.empty()
+
+
+def test_mailbox_implementation_can_be_plugged():
+
+    class Dummy(Entity):
+        _mailbox = QueueMailbox
+
+        def _configure(self):
+            pass
+
+        def _prepare(self):
+            pass
+
+    entity = Dummy(None)
+    entity.prepare()
+    entity.start()
+    ExitRequested().emit()
+    entity.join()
+
+    assert isinstance(entity._queue, QueueMailbox)
+
+
+def test_unknown_handler_mode_is_rejected():
+
+    class Dummy(Entity):
+        def _configure(self):
+            pass
+
+        def _prepare(self):
+            self._attach(FileFound, print, 'foo')
+
+    with pytest.raises(ValueError):
+        Dummy(None).prepare()
+
+
+def test_inline_handlers_run_in_the_emitter_thread():
+    received = []
+
+    class Dummy(Entity):
+        def _configure(self):
+            pass
+
+        def on_file_found(self, signal):
+            received.append((signal, threading.current_thread()))
+
+        def _prepare(self):
+            self._attach(FileFound, self.on_file_found, INLINE)
+
+    entity = Dummy(None)
+    entity.prepare()
+    FileFound(path='foo').emit()
+    EntriesFound(signals=(FileFound(path='bar'), DirFound(path='baz'))).emit()
+
+    assert received == [(FileFound(path='foo'), threading.current_thread()),
+                        (FileFound(path='bar'), threading.current_thread())]
+    assert entity._queue.empty()
+
+    entity.start()
+    ExitRequested().emit()
+    entity.join()
+    FileFound(path='foo').emit()
+    assert len(received) == 2
+
+
+def test_coalesced_handlers_receive_counts_in_attach_order():
+    received = []
+
+    class Dummy(Entity):
+        def _configure(self):
+            pass
+
+        def on_dir_found(self, count):
+            received.append(('dirs', count))
+
+        def on_file_found(self, count):
+            received.append(('files', count))
+
+        def _prepare(self):
+            self._attach(DirFound, self.on_dir_found, COALESCED)
+            self._attach(FileFound, self.on_file_found, COALESCED)
+
+    entity = Dummy(None)
+    entity.prepare()
+    for _ in range(1000):
+        FileFound(path='foo').emit()
+    EntriesFound(signals=(FileFound(path='bar'), DirFound(path='baz'))).emit()
+
+    # All of them are waiting behind a single marker
+    assert entity._queue.qsize() == 1
+
+    entity.start()
+    ExitRequested().emit()
+    entity.join()
+
+    assert received == [('dirs', 1), ('files', 1001)]
+    FileFound(path='foo').emit()
+    assert entity._queue.empty()
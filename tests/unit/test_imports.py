@@ -8,6 +8,7 @@ import pytest
     ('engorgio.signals', 'FileFound'),
     ('engorgio.signals', 'SymlinkFound'),
     ('engorgio.signals', 'SpecialFileFound'),
+    ('engorgio.signals', 'EntriesFound'),
     ('engorgio.signals', 'UserScanRequested'),
     ('engorgio.signals', 'Decompressed'),
     ('engorgio.signals', 'DecompressionDiscarded'),
@@ -15,6 +16,8 @@ import pytest
     ('engorgio.signals', 'ContentAdded'),
     ('engorgio.signals', 'ExitRequested'),
     ('engorgio.signals', 'PathProcessingFinished'),
+    ('engorgio.signals.transport', 'Broker'),
+    ('engorgio.signals.transport', 'Transport'),
 
     # Entity and entity helpers
     ('engorgio.entity', 'Entity'),
@@ -22,12 +25,26 @@ import pytest
     ('engorgio.entity', 'start_all'),
     ('engorgio.entity', 'join_all'),
 
+    # Instrumentation
+    ('engorgio.stats', 'EntityStats'),
+    ('engorgio.stats', 'Histogram'),
+
+    ('engorgio.mailbox', 'Mailbox'),
+    ('engorgio.mailbox', 'QueueMailbox'),
+    ('engorgio.runtime', 'AsyncRuntime'),
+    ('engorgio.distributed', 'run_worker'),
+
     # Parse
     ('engorgio.parser', 'make_parser'),
 
     # Entities
     ('engorgio.entities.scanner', 'Scanner'),
+    ('engorgio.entities.decompressor', 'Decompressor'),
     ('engorgio.entities.stopper', 'Stopper'),
+    ('engorgio.entities.replacer', 'Replacer'),
+    ('engorgio.entities.metadater', 'Metadater'),
+    ('engorgio.entities.logger', 'Logger'),
+    ('engorgio.entities.feedbacker', 'Feedbacker'),
 ])
 def test_objects_are_importable(module, name):
     try:
@@ -0,0 +1,127 @@
+import threading
+import time
+
+import pytest
+
+from engorgio.mailbox import BLOCK, DROP, Mailbox, QueueMailbox
+
+MAILBOXES = [Mailbox, QueueMailbox]
+
+
+class Urgent:
+    pass
+
+
+@pytest.mark.parametrize('mailbox_class', MAILBOXES)
+def test_items_are_got_in_order(mailbox_class):
+    mailbox = mailbox_class()
+    for i in range(5):
+        assert mailbox.put(i)
+
+    assert mailbox.qsize() == 5
+    assert mailbox.get() == 0
+    assert mailbox.get_many(2) == [1, 2]
+    assert mailbox.get_many() == [3, 4]
+    assert mailbox.empty()
+
+
+@pytest.mark.parametrize('mailbox_class', MAILBOXES)
+@pytest.mark.timeout(5)
+def test_get_waits_for_an_item(mailbox_class):
+    mailbox = mailbox_class()
+    got = []
+    consumer = threading.Thread(target=lambda: got.append(mailbox.get_many()))
+    consumer.start()
+    time.sleep(0.05)
+    assert not got
+
+    mailbox.put('foo')
+    consumer.join()
+
+    assert got == [['foo']]
+
+
+@pytest.mark.parametrize('mailbox_class', MAILBOXES)
+def test_unknown_policy_is_rejected(mailbox_class):
+    with pytest.raises(ValueError):
+        mailbox_class(maxsize=1, policy='foo')
+
+
+@pytest.mark.parametrize('mailbox_class', MAILBOXES)
+def test_drop_policy_drops_items_when_full(mailbox_class):
+    mailbox = mailbox_class(maxsize=2, policy=DROP)
+
+    assert [mailbox.put(i) for i in range(4)] == [True, True, False, False]
+    assert mailbox.dropped == 2
+    assert mailbox.get_many() == [0, 1]
+    assert mailbox.put(4)
+
+
+@pytest.mark.parametrize('mailbox_class', MAILBOXES)
+@pytest.mark.timeout(10)
+def test_items_dropped_by_many_producers_are_all_counted(mailbox_class):
+    mailbox = mailbox_class(maxsize=1, policy=DROP)
+    mailbox.put(0)
+
+    def produce():
+        for i in range(10000):
+            mailbox.put(i)
+
+    producers = [threading.Thread(target=produce) for _ in range(8)]
+    for producer in producers:
+        producer.start()
+    for producer in producers:
+        producer.join()
+
+    assert mailbox.dropped == 80000
+
+
+@pytest.mark.parametrize('mailbox_class', MAILBOXES)
+@pytest.mark.parametrize('policy', [BLOCK, ''.join(['bl', 'ock'])])
+@pytest.mark.timeout(5)
+def test_block_policy_blocks_producers_when_full(mailbox_class, policy):
+    mailbox = mailbox_class(maxsize=1, policy=policy)
+    mailbox.put(0)
+    producer = threading.Thread(target=mailbox.put, args=(1,))
+    producer.start()
+    time.sleep(0.05)
+    assert producer.is_alive()
+
+    assert mailbox.get() == 0
+    producer.join()
+
+    assert mailbox.get() == 1
+
+
+@pytest.mark.parametrize('mailbox_class', MAILBOXES)
+@pytest.mark.parametrize('policy', [BLOCK, DROP])
+def test_urgent_items_are_never_blocked_nor_dropped(mailbox_class, policy):
+    mailbox = mailbox_class(maxsize=1, policy=policy, urgent=(Urgent,))
+    mailbox.put(0)
+    urgent = Urgent()
+
+    assert mailbox.put(urgent)
+    assert mailbox.get_many() == [0, urgent]
+    # Urgent items don't take the room of regular ones
+    assert mailbox.put(1)
+    assert mailbox.dropped == 0
+
+
+@pytest.mark.parametrize('mailbox_class', MAILBOXES)
+@pytest.mark.timeout(10)
+def test_many_producers_lose_nothing(mailbox_class):
+    mailbox = mailbox_class(maxsize=16)
+    producers = [threading.Thread(target=lambda n=n: [mailbox.put((n, i)) for i in range(1000)])
+                 for n in range(4)]
+    for producer in producers:
+        producer.start()
+
+    got = []
+    while len(got) < 4000:
+        got.extend(mailbox.get_many())
+    for producer in producers:
+        producer.join()
+
+    assert sorted(got) == [(n, i) for n in range(4) for i in range(1000)]
+    for n in range(4):
+        assert [i for m, i in got if m == n] == list(range(1000))
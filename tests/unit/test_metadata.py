@@ -0,0 +1,101 @@
+from unittest.mock import patch
+import json
+import logging
+import os
+import tempfile
+import time
+import zipfile
+
+from engorgio.decompressor import decompress
+from engorgio.metadata import MetadataWriter, records, zip_comment
+
+
+def make_zip(path, comment=b'', *entries):
+    with zipfile.ZipFile(path, 'w') as archive:
+        for info, data in entries:
+            archive.writestr(info, data)
+        archive.comment = comment
+    return path
+
+
+def read_records(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_zip_comment_is_read_from_the_end_of_the_archive(tmpdir_path):
+    path = make_zip(os.path.join(tmpdir_path, 'a.zip'), 'ünïcode PK\x05\x06 comment'.encode(), ('a.txt', b'a'))
+
+    assert zip_comment(path) == 'ünïcode PK\x05\x06 comment'
+
+
+def test_zip_comment_is_none_without_comment_or_zip(tmpdir_path, data_path):
+    path = make_zip(os.path.join(tmpdir_path, 'a.zip'), b'', ('a.txt', b'a'))
+
+    assert zip_comment(path) is None
+    assert zip_comment(os.path.join(data_path, 'info.txt')) is None
+
+
+def test_records_are_json_lines():
+    lines = list(records('/a.zip', 'hello', [('dir/ä.txt', 0o100640, 1577880598), ('dir', 0o40755, 1.5)]))
+
+    assert [json.loads(line) for line in lines] == [
+        {'archive': '/a.zip', 'comment': 'hello'},
+        {'archive': '/a.zip', 'entry': 'dir/ä.txt', 'mode': 0o100640, 'mtime': 1577880598},
+        {'archive': '/a.zip', 'entry': 'dir', 'mode': 0o40755, 'mtime': 1.5},
+    ]
+    assert all(line.endswith('\n') and line.count('\n') == 1 for line in lines)
+
+
+def test_records_escape_undecodable_names():
+    line, = records('/a.zip', None, [('\udcff', 0o100644, 0)])
+
+    assert json.loads(line)['entry'] == '\udcff'
+
+
+def test_writer_appends_and_syncs_once(tmpdir_path):
+    path = os.path.join(tmpdir_path, 'metadata.jsonl')
+    with open(path, 'w') as f:
+        f.write('{"previous": "run"}\n')
+
+    with patch('engorgio.metadata.BATCH_LINES', 2), patch('engorgio.metadata.os.fsync') as fsync:
+        writer = MetadataWriter(path, buffer_size=16)
+        for i in range(10):
+            writer.add(f'/{i}.zip', None, [('a', 0o100644, i), ('b', 0o100644, i)])
+        writer.close()
+
+    assert fsync.call_count == 1
+    assert writer.written == 20
+    written = read_records(path)
+    assert written[0] == {'previous': 'run'}
+    assert [r['mtime'] for r in written[1:]] == [i for i in range(10) for _ in range(2)]
+
+
+def test_writer_logs_errors_and_keeps_accepting_metadata(tmpdir_path, caplog):
+    writer = MetadataWriter(os.path.join(tmpdir_path, 'metadata.jsonl'))
+
+    with caplog.at_level(logging.ERROR, logger='engorgio.metadata'), \
+            patch.object(writer._file, 'write', side_effect=OSError(28, 'No space left on device')):
+        for i in range(1000):
+            writer.add(f'/{i}.zip', None, [('a', 0o100644, i)])
+        writer.close()
+
+    assert writer.written == 0
+    assert len([r for r in caplog.records if 'Cannot write metadata' in r.message]) == 1
+
+
+def test_decompress_collects_the_metadata_of_the_entries(tmpdir_path):
+    info = zipfile.ZipInfo('dir/a.txt', date_time=(2020, 1, 2, 3, 4, 6))
+    info.external_attr = 0o100604 << 16
+    path = make_zip(os.path.join(tmpdir_path, 'a.zip'), b'the comment', (info, b'a'))
+
+    with tempfile.TemporaryDirectory() as sandbox:
+        result = decompress(path, sandbox, metadata=True)
+        plain = decompress(path, sandbox)
+
+    (name, mode, mtime), = [m for m in result.metadata if m[0] == os.path.join('dir', 'a.txt')]
+    assert mode == 0o100604
+    # Zip stores local times
+    assert mtime == time.mktime((2020, 1, 2, 3, 4, 6, 0, 0, -1))
+    assert result.comment == 'the comment'
+    assert plain.metadata is None and plain.comment is None
@@ -0,0 +1,144 @@
+from unittest.mock import patch
+import errno
+import os
+
+import pytest
+
+from engorgio import replacer
+from engorgio.replacer import SANDBOX_PREFIX, copy_file, copy_tree, move_tree, sandbox_for
+
+from helpers import write
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def make_tree(root):
+    os.makedirs(os.path.join(root, 'a', 'b'))
+    write(os.path.join(root, 'a', 'b', 'file'), b'foo' * 1000)
+    write(os.path.join(root, 'empty'), b'')
+    os.link(os.path.join(root, 'a', 'b', 'file'), os.path.join(root, 'link'))
+    os.symlink('a/b/file', os.path.join(root, 'symlink'))
+    os.symlink('a', os.path.join(root, 'dirsymlink'))
+    return root
+
+
+def assert_same_tree(source, copy):
+    assert read(os.path.join(copy, 'a', 'b', 'file')) == b'foo' * 1000
+    assert read(os.path.join(copy, 'empty')) == b''
+    assert os.path.samefile(os.path.join(copy, 'a', 'b', 'file'), os.path.join(copy, 'link'))
+    assert os.readlink(os.path.join(copy, 'symlink')) == 'a/b/file'
+    assert os.readlink(os.path.join(copy, 'dirsymlink')) == 'a'
+    assert os.stat(os.path.join(copy, 'a')).st_mtime == os.stat(os.path.join(source, 'a')).st_mtime
+
+
+def cross_device_rename(source, destination):
+    raise OSError(errno.EXDEV, 'Invalid cross-device link')
+
+
+def unsupported(*args):
+    raise OSError(errno.EOPNOTSUPP, 'Operation not supported')
+
+
+def test_sandbox_is_created_next_to_the_path(tmpdir_path):
+    sandbox = sandbox_for(os.path.join(tmpdir_path, 'archive.zip'))
+
+    assert os.path.dirname(sandbox) == tmpdir_path
+    assert os.path.basename(sandbox).startswith(SANDBOX_PREFIX)
+    assert os.stat(sandbox).st_dev == os.stat(tmpdir_path).st_dev
+
+
+def test_move_tree_renames_in_the_same_filesystem(tmpdir_path):
+    source = make_tree(os.path.join(tmpdir_path, 'source'))
+    inode = os.stat(os.path.join(source, 'a', 'b', 'file')).st_ino
+    destination = os.path.join(tmpdir_path, 'destination')
+
+    with patch('engorgio.replacer.copy_tree') as copy_tree_:
+        move_tree(source, destination)
+
+    copy_tree_.assert_not_called()
+    assert not os.path.exists(source)
+    assert os.stat(os.path.join(destination, 'a', 'b', 'file')).st_ino == inode
+
+
+def test_move_tree_copies_across_filesystems(tmpdir_path):
+    source = make_tree(os.path.join(tmpdir_path, 'source'))
+    reference = make_tree(os.path.join(tmpdir_path, 'reference'))
+    os.utime(os.path.join(source, 'a'), (0, 0))
+    os.utime(os.path.join(reference, 'a'), (0, 0))
+    destination = os.path.join(tmpdir_path, 'destination')
+
+    with patch('engorgio.replacer.os.rename', cross_device_rename):
+        move_tree(source, destination)
+
+    assert not os.path.exists(source)
+    assert_same_tree(reference, destination)
+
+
+def test_move_tree_keeps_the_source_on_error(tmpdir_path):
+    source = make_tree(os.path.join(tmpdir_path, 'source'))
+    destination = os.path.join(tmpdir_path, 'destination')
+
+    with patch('engorgio.replacer.os.rename', cross_device_rename), \
+            patch('engorgio.replacer.copy_file', side_effect=OSError(errno.ENOSPC, 'No space left')):
+        with pytest.raises(OSError):
+            move_tree(source, destination)
+
+    assert read(os.path.join(source, 'a', 'b', 'file')) == b'foo' * 1000
+
+
+def test_copy_tree_into_an_existing_directory(tmpdir_path):
+    source = make_tree(os.path.join(tmpdir_path, 'source'))
+    destination = os.path.join(tmpdir_path, 'destination')
+    os.mkdir(destination)
+
+    copy_tree(source, destination)
+
+    assert_same_tree(source, destination)
+
+
+@pytest.mark.parametrize('unsupported_methods,used', [
+    ((), '_reflink'),
+    (('_reflink',), '_copy_file_range'),
+    (('_reflink', '_copy_file_range'), '_sendfile'),
+    (('_reflink', '_copy_file_range', '_sendfile'), 'copyfileobj'),
+])
+def test_copy_file_falls_back_to_the_next_method(tmpdir_path, unsupported_methods, used):
+    source = write(os.path.join(tmpdir_path, 'source'), os.urandom(3 * 1024 * 1024 + 1))
+    os.chmod(source, 0o640)
+    destination = os.path.join(tmpdir_path, 'destination')
+    calls = []
+
+    def spy(name, function):
+        def wrapper(*args):
+            calls.append(name)
+            if name in unsupported_methods:
+                return unsupported(*args)
+            return function(*args)
+        return wrapper
+
+    with patch.object(replacer, '_copy_file_range', spy('_copy_file_range', replacer._copy_file_range)), \
+            patch.object(replacer, '_sendfile', spy('_sendfile', replacer._sendfile)), \
+            patch('engorgio.replacer.shutil.copyfileobj', spy('copyfileobj', replacer.shutil.copyfileobj)):
+        if used == '_reflink':
+            with patch('engorgio.replacer.fcntl.ioctl', spy('_reflink', lambda *args: 0)):
+                with patch('engorgio.replacer._kernel_copy', return_value=False) as kernel_copy:
+                    copy_file(source, destination)
+            kernel_copy.assert_not_called()
+        else:
+            with patch('engorgio.replacer.fcntl.ioctl', spy('_reflink', unsupported)):
+                copy_file(source, destination)
+            assert read(destination) == read(source)
+
+    assert calls[-1] == used
+    assert os.stat(destination).st_mode & 0o777 == 0o640
+
+
+def test_copy_file_fails_on_other_errors(tmpdir_path):
+    source = write(os.path.join(tmpdir_path, 'source'), b'foo')
+
+    with patch('engorgio.replacer.fcntl.ioctl', side_effect=OSError(errno.EIO, 'Input/output error')):
+        with pytest.raises(OSError):
+            copy_file(source, os.path.join(tmpdir_path, 'destination'))
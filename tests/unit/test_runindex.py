@@ -0,0 +1,59 @@
+import os
+import sqlite3
+
+from engorgio.entities.scanner import classify_path
+from engorgio.runindex import RunIndex
+from engorgio.signals import FileFound
+
+from helpers import write
+
+
+def test_unknown_files_are_not_unchanged(tmpdir_path):
+    path = write(os.path.join(tmpdir_path, 'foo'))
+    index = RunIndex(os.path.join(tmpdir_path, 'index.sqlite'))
+
+    assert not index.is_unchanged(classify_path(path))
+
+
+def test_recorded_files_are_unchanged_across_runs(tmpdir_path):
+    path = write(os.path.join(tmpdir_path, 'foo'))
+    index_path = os.path.join(tmpdir_path, 'index.sqlite')
+
+    index = RunIndex(index_path)
+    index.record(classify_path(path))
+    index.close()
+
+    index = RunIndex(index_path)
+    assert index.is_unchanged(classify_path(path))
+
+
+def test_modified_files_are_not_unchanged(tmpdir_path):
+    path = write(os.path.join(tmpdir_path, 'foo'))
+    index = RunIndex(os.path.join(tmpdir_path, 'index.sqlite'))
+    index.record(classify_path(path))
+
+    write(path, b'foobar')
+
+    assert not index.is_unchanged(classify_path(path))
+
+
+def test_missing_metadata_is_read_from_disk(tmpdir_path):
+    path = write(os.path.join(tmpdir_path, 'foo'))
+    index = RunIndex(os.path.join(tmpdir_path, 'index.sqlite'))
+    index.record(FileFound(path=path))
+
+    assert index.is_unchanged(classify_path(path))
+
+
+def test_indexes_of_previous_versions_can_be_reused(tmpdir_path):
+    path = write(os.path.join(tmpdir_path, 'foo'))
+    index_path = os.path.join(tmpdir_path, 'index.sqlite')
+    with sqlite3.connect(index_path) as db:
+        db.execute('CREATE TABLE files (path TEXT PRIMARY KEY, device INTEGER NOT NULL, inode INTEGER NOT NULL,'
+                   ' size INTEGER NOT NULL, mtime INTEGER NOT NULL, destination TEXT)')
+    db.close()
+
+    index = RunIndex(index_path)
+    index.record(classify_path(path))
+
+    assert index.is_unchanged(classify_path(path))
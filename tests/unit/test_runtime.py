@@ -0,0 +1,167 @@
+import asyncio
+import threading
+
+import pytest
+
+from engorgio.entity import COALESCED, Entity, join_all, prepare_all, start_all
+from engorgio.mailbox import Mailbox, QueueMailbox
+from engorgio.runtime import AsyncRuntime
+from engorgio.signals import _Signal, ExitRequested, FileFound
+
+
+@pytest.fixture
+def runtime():
+    with AsyncRuntime() as runtime:
+        yield runtime
+
+
+def make_entity(blocking_handlers=True):
+    received = []
+
+    class Dummy(Entity):
+        _blocking_handlers = blocking_handlers
+
+        def _configure(self):
+            pass
+
+        def on_file_found(self, signal):
+            received.append((signal, threading.current_thread()))
+
+        def on_files_found(self, count):
+            received.append((count, threading.current_thread()))
+
+        def _prepare(self):
+            self._attach(FileFound, self.on_file_found)
+            self._attach(FileFound, self.on_files_found, COALESCED)
+
+    return Dummy(None), received
+
+
+def test_submit_runs_coroutines_in_the_loop(runtime):
+
+    async def loop_thread():
+        return threading.current_thread()
+
+    assert runtime.submit(loop_thread()).result() is runtime._thread
+
+
+def test_run_blocking_runs_in_the_executor(runtime):
+
+    async def executor_thread():
+        return await runtime.run_blocking(threading.current_thread)
+
+    thread = runtime.submit(executor_thread()).result()
+    assert thread not in (runtime._thread, threading.current_thread())
+
+
+def test_close_is_idempotent():
+    runtime = AsyncRuntime()
+    runtime.close()
+    runtime.close()
+
+    assert runtime.loop.is_closed()
+
+
+@pytest.mark.timeout(5)
+@pytest.mark.parametrize('blocking_handlers', [True, False])
+def test_entities_run_on_the_runtime(runtime, blocking_handlers):
+    entity, received = make_entity(blocking_handlers)
+    entity.prepare()
+    FileFound(path='foo').emit()
+    entity.start(runtime)
+    FileFound(path='bar').emit()
+    ExitRequested().emit()
+    entity.join()
+
+    signals = [signal for signal, _ in received if not isinstance(signal, int)]
+    assert signals == [FileFound(path='foo'), FileFound(path='bar')]
+    assert sum(count for count, _ in received if isinstance(count, int)) == 2
+    threads = {thread for _, thread in received}
+    assert threading.current_thread() not in threads
+    assert (runtime._thread in threads) is not blocking_handlers
+    assert entity._thread is None
+
+
+@pytest.mark.timeout(5)
+def test_many_entities_share_the_runtime_threads(runtime):
+    entities = [make_entity()[0] for _ in range(50)]
+    threads = threading.active_count()
+    prepare_all(*entities)
+    start_all(*entities, runtime=runtime)
+
+    assert threading.active_count() == threads
+
+    ExitRequested().emit()
+    join_all(*entities)
+
+
+@pytest.mark.timeout(5)
+def test_stats_are_collected_on_the_runtime(runtime):
+    entity, _ = make_entity()
+    entity.enable_stats()
+    entity.prepare()
+    entity.start(runtime)
+    FileFound(path='foo').emit()
+    ExitRequested().emit()
+    entity.join()
+
+    stats = entity.stats()
+    assert stats['processed']['FileFound'] == 1
+    assert stats['wait_time']['count'] >= 1
+
+
+def test_mailboxes_without_async_support_are_rejected(runtime):
+
+    class Dummy(Entity):
+        _mailbox = QueueMailbox
+
+        def _configure(self):
+            pass
+
+        def _prepare(self):
+            pass
+
+    entity = Dummy(None)
+    entity.prepare()
+    with pytest.raises(TypeError):
+        entity.start(runtime)
+
+
+def test_handler_errors_are_raised_by_join(runtime):
+
+    class Boom(_Signal):
+        pass
+
+    class Dummy(Entity):
+        def _configure(self):
+            pass
+
+        def on_boom(self, signal):
+            raise ValueError('boom')
+
+        def _prepare(self):
+            self._attach(Boom, self.on_boom)
+
+    entity = Dummy(None)
+    entity.prepare()
+    entity.start(runtime)
+    Boom().emit()
+    with pytest.raises(ValueError):
+        entity.join()
+
+
+def test_mailbox_can_be_consumed_by_a_coroutine(runtime):
+    mailbox = Mailbox()
+
+    async def consume():
+        got = []
+        while len(got) < 3:
+            got.extend(await mailbox.get_many_async())
+        return got
+
+    future = runtime.submit(consume())
+    for i in range(3):
+        mailbox.put(i)
+
+    assert future.result(timeout=5) == [0, 1, 2]
+    assert asyncio.iscoroutinefunction(mailbox.get_many_async)
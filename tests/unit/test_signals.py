@@ -1,4 +1,6 @@
-from dataclasses import dataclass
+from dataclasses import FrozenInstanceError, dataclass, fields
+from unittest.mock import patch
+import pickle
 
 import blinker
 import pytest
@@ -96,3 +98,93 @@ def test_signal_emit_send_signal_to_connected_handler():
     obj.emit()
 
     assert sent is obj
+
+
+@pytest.mark.parametrize('obj',
+                         [signals.FileFound(path='foo'),
+                          signals.Decompressed(source='foo', path='bar'),
+                          signals.DecompressionDiscarded(path='foo', reason='bar'),
+                          signals.DecompressionFailed(source='foo', path='bar', partial=False, error='baz'),
+                          signals.ExitRequested()])
+def test_signals_can_be_pickled(obj):
+    assert pickle.loads(pickle.dumps(obj)) == obj
+
+
+def test_signal_emit_does_not_look_up_the_blinker_signal():
+    class Dummy(signals._Signal):
+        pass
+    obj = Dummy()
+
+    with patch('blinker.signal') as signal:
+        obj.emit()
+
+    signal.assert_not_called()
+
+
+@pytest.mark.parametrize('obj',
+                         [signals.FileFound(path='foo'),
+                          signals.EntriesFound(signals=()),
+                          signals.DecompressionFailed(source='foo', path='bar', partial=False, error='baz'),
+                          signals.ExitRequested()])
+def test_signals_have_no_instance_dict(obj):
+    assert not hasattr(obj, '__dict__')
+
+
+@pytest.mark.parametrize('name', ['path', 'foo'])
+def test_signals_are_immutable(name):
+    obj = signals.FileFound(path='foo')
+
+    with pytest.raises(FrozenInstanceError):
+        setattr(obj, name, 'bar')
+    with pytest.raises(FrozenInstanceError):
+        delattr(obj, name)
+
+
+def test_slotted_signals_keep_dataclass_behaviour():
+    obj = signals.DecompressionDiscarded(path='foo', reason='bar')
+
+    assert [f.name for f in fields(obj)] == ['path', 'reason']
+    assert obj == signals.DecompressionDiscarded(path='foo', reason='bar')
+    assert hash(obj) == hash(signals.DecompressionDiscarded(path='foo', reason='bar'))
+    assert repr(obj) == "DecompressionDiscarded(path='foo', reason='bar')"
+
+
+def test_decompressed_entries_are_optional_and_not_compared():
+    listed = signals.Decompressed(source='foo', path='bar', entries=(('baz', 3),))
+
+    assert signals.Decompressed(source='foo', path='bar').entries is None
+    assert listed == signals.Decompressed(source='foo', path='bar')
+    assert pickle.loads(pickle.dumps(listed)).entries == (('baz', 3),)
+
+
+def test_found_signals_metadata_is_not_compared():
+    assert signals.FileFound(path='foo', inode=1, size=2) == signals.FileFound(path='foo')
+    assert hash(signals.DirFound(path='foo', mtime=1)) == hash(signals.DirFound(path='foo'))
+
+
+def test_found_signals_metadata_survives_pickling():
+    obj = signals.FileFound(path='foo', device=1, inode=2, size=3, mtime=4)
+
+    assert pickle.loads(pickle.dumps(obj)).size == 3
+
+
+def test_inline_receivers_are_called_before_the_others():
+    called = []
+
+    def receiver(sender, signal):
+        called.append('receiver')
+
+    def inline_receiver(sender, signal):
+        called.append('inline')
+
+    signals.FileFound.connect(receiver)
+    signals.FileFound.connect_inline(inline_receiver)
+    signals.FileFound.connect_inline(inline_receiver)
+    try:
+        signals.FileFound(path='foo').emit()
+    finally:
+        signals.FileFound.disconnect(receiver)
+        signals.FileFound.disconnect_inline(inline_receiver)
+    signals.FileFound(path='foo').emit()
+
+    assert called == ['inline', 'receiver']
@@ -0,0 +1,68 @@
+import os
+import tempfile
+
+import libarchive
+import pytest
+
+from engorgio.sniffer import HEADER_SIZE, ISO9660_OFFSET, sniff, sniff_header
+
+
+@pytest.mark.parametrize('header,expected', [
+    (b'PK\x03\x04rest', 'zip'),
+    (b'PK\x05\x06rest', 'zip'),
+    (b'\x1f\x8b\x08rest', 'gzip'),
+    (b'BZh91AY&SY', 'bzip2'),
+    (b'\xfd7zXZ\x00rest', 'xz'),
+    (b'\x28\xb5\x2f\xfdrest', 'zstd'),
+    (b'7z\xbc\xaf\x27\x1crest', '7z'),
+    (b'Rar!\x1a\x07\x00rest', 'rar'),
+    (b'Rar!\x1a\x07\x01\x00rest', 'rar'),
+    (b'\x00' * 257 + b'ustar\x0000', 'tar'),
+    (b'070701rest', 'cpio'),
+    (b'070707rest', 'cpio'),
+    (b'\xc7\x71rest', 'cpio'),
+    (b'Words are, in my not-so-humble opinion', None),
+    (b'%PDF-1.4', None),
+    (b'', None),
+])
+def test_sniff_header(header, expected):
+    assert sniff_header(header) == expected
+
+
+def test_sniff_regular_zip(data_path):
+    assert sniff(os.path.join(data_path, 'regularfile.zip')) == 'zip'
+
+
+def test_sniff_plain_text(data_path):
+    assert sniff(os.path.join(data_path, 'info.txt')) is None
+
+
+@pytest.mark.parametrize('format_name,filter_name,expected', [
+    ('ustar', None, 'tar'),
+    ('ustar', 'gzip', 'gzip'),
+    ('ustar', 'bzip2', 'bzip2'),
+    ('ustar', 'xz', 'xz'),
+    ('7zip', None, '7z'),
+    ('cpio', None, 'cpio'),
+])
+def test_sniff_archives_written_by_libarchive(format_name, filter_name, expected):
+    with tempfile.TemporaryDirectory() as path:
+        archive_path = os.path.join(path, 'archive')
+        with libarchive.file_writer(archive_path, format_name, filter_name) as archive:
+            archive.add_file_from_memory('foo.txt', 3, b'foo')
+
+        assert sniff(archive_path) == expected
+
+
+def test_sniff_iso9660_signature():
+    with tempfile.NamedTemporaryFile() as file:
+        file.write(b'\x00' * ISO9660_OFFSET + b'CD001' + b'\x00' * HEADER_SIZE)
+        file.flush()
+
+        assert sniff(file.name) == 'iso'
+
+
+def test_sniff_raises_oserror_on_missing_file():
+    with tempfile.TemporaryDirectory() as path:
+        with pytest.raises(OSError):
+            sniff(os.path.join(path, 'missing'))
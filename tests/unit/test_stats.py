@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from engorgio.signals import ExitRequested, FileFound
+from engorgio.stats import HISTOGRAM_FIRST_BUCKET, EntityStats, Histogram, ShardedCounters
+
+
+def test_histogram_summary():
+    histogram = Histogram()
+    for seconds in (0.001, 0.002, 0.003, 0.004):
+        histogram.add(seconds)
+
+    summary = histogram.as_dict()
+
+    assert summary['count'] == 4
+    assert summary['total'] == pytest.approx(0.01)
+    assert summary['mean'] == pytest.approx(0.0025)
+    assert summary['max'] == 0.004
+
+
+def test_histogram_percentiles_are_bucket_upper_bounds():
+    histogram = Histogram()
+    for _ in range(99):
+        histogram.add(HISTOGRAM_FIRST_BUCKET / 2)
+    histogram.add(HISTOGRAM_FIRST_BUCKET * 3)
+
+    assert histogram.percentile(50) == HISTOGRAM_FIRST_BUCKET
+    assert histogram.percentile(100) == HISTOGRAM_FIRST_BUCKET * 4
+
+
+def test_histogram_huge_latencies_go_to_the_last_bucket():
+    histogram = Histogram()
+    histogram.add(1e9)
+
+    assert histogram.buckets[-1] == 1
+    assert histogram.percentile(99) == 1e9
+
+
+def test_empty_histogram():
+    assert Histogram().as_dict()['mean'] is None
+    assert Histogram().percentile(50) is None
+
+
+def test_entity_stats_counts_by_signal_type():
+    stats = EntityStats()
+    stats.enqueued(FileFound(path='foo'), 1)
+    stats.enqueued(FileFound(path='bar'), 2)
+    stats.enqueued(ExitRequested(), 3)
+    stats.waited(0.5)
+    stats.dispatched(FileFound(path='foo'), 0.25)
+
+    snapshot = stats.as_dict(queue_depth=2)
+
+    assert snapshot['queue_depth'] == 2
+    assert snapshot['max_queue_depth'] == 3
+    assert snapshot['enqueued'] == {'FileFound': 2, 'ExitRequested': 1}
+    assert snapshot['processed'] == {'FileFound': 1}
+    assert snapshot['wait_time']['total'] == 0.5
+    assert snapshot['dispatch_time']['FileFound']['total'] == 0.25
+
+
+def test_sharded_counters_add_up_every_thread():
+    counters = ShardedCounters(2)
+
+    def increment():
+        for _ in range(1000):
+            counters.shard()[1] += 1
+
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counters.shard()[0] += 1
+
+    assert counters.total(0) == 1
+    assert counters.total(1) == 4000
+    assert len(counters._shards) == 5
@@ -0,0 +1,223 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from engorgio.signals import DirFound, FileFound
+from engorgio.signals.transport import Broker, Transport, TransportError
+from engorgio.signals.transport import recv_frame, send_frame
+
+
+class Receiver:
+    def __init__(self, signal):
+        self.received = []
+        self.senders = []
+        self.event = threading.Event()
+        self.signal = signal
+        signal.connect(self)
+
+    def __call__(self, sender, signal):
+        self.received.append(signal)
+        self.senders.append(sender)
+        self.event.set()
+
+    def wait_for(self, count, timeout=5):
+        deadline = time.monotonic() + timeout
+        while len(self.received) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.received
+
+    def close(self):
+        self.signal.disconnect(self)
+
+
+@pytest.fixture
+def broker():
+    broker = Broker()
+    yield broker
+    broker.close()
+
+
+@pytest.fixture
+def transports(broker):
+    opened = []
+
+    def open_transport():
+        transport = Transport(broker.address)
+        opened.append(transport)
+        return transport
+
+    yield open_transport
+    for transport in opened:
+        transport.close()
+
+
+def test_frames_roundtrip():
+    left, right = socket.socketpair()
+    with left, right:
+        send_frame(left, ('publish', 'FileFound', b'x' * 100000))
+        send_frame(left, FileFound(path='foo'))
+
+        assert recv_frame(right) == ('publish', 'FileFound', b'x' * 100000)
+        assert recv_frame(right) == FileFound(path='foo')
+        left.close()
+        assert recv_frame(right) is None
+
+
+def test_connection_errors_are_reported():
+    with pytest.raises(TransportError):
+        Transport(('127.0.0.1', 1))
+
+
+@pytest.mark.timeout(10)
+def test_broadcast_signals_reach_every_subscriber_but_the_publisher(broker, transports):
+    publisher = transports()
+    publisher.forward(DirFound)
+    publisher.subscribe(DirFound)
+    transports().subscribe(DirFound)
+    transports().subscribe(DirFound)
+    assert broker.subscribers(DirFound) == 3
+
+    receiver = Receiver(DirFound)
+    try:
+        DirFound(path='foo').emit()
+        # The local emission plus one per remote subscriber
+        assert receiver.wait_for(3) == [DirFound(path='foo')] * 3
+        time.sleep(0.1)
+        assert len(receiver.received) == 3
+    finally:
+        receiver.close()
+
+
+@pytest.mark.timeout(10)
+def test_received_signals_are_not_forwarded_back(broker, transports):
+    first, second = transports(), transports()
+    for transport in (first, second):
+        transport.forward(DirFound)
+        transport.subscribe(DirFound)
+
+    receiver = Receiver(DirFound)
+    try:
+        DirFound(path='foo').emit()
+        receiver.wait_for(3)
+        time.sleep(0.1)
+        # Emitted once and received once by each transport
+        assert len(receiver.received) == 3
+        assert receiver.senders.count(None) == 1
+        assert set(receiver.senders) == {None, first, second}
+    finally:
+        receiver.close()
+
+
+@pytest.mark.timeout(10)
+def test_shared_signals_are_sharded_round_robin(broker, transports):
+    publisher = transports()
+    publisher.forward(FileFound)
+    workers = [transports(), transports()]
+    for worker in workers:
+        worker.subscribe(FileFound, shared=True)
+
+    receiver = Receiver(FileFound)
+    try:
+        for i in range(4):
+            FileFound(path=str(i)).emit()
+        receiver.wait_for(8)
+        time.sleep(0.1)
+        remote = [(signal, sender) for signal, sender in zip(receiver.received, receiver.senders)
+                  if sender is not None]
+    finally:
+        receiver.close()
+
+    assert sorted(signal.path for signal, _ in remote) == ['0', '1', '2', '3']
+    for worker in workers:
+        assert len([sender for _, sender in remote if sender is worker]) == 2
+
+
+@pytest.mark.timeout(10)
+def test_held_signals_wait_for_a_shared_subscriber(broker, transports):
+    publisher = transports()
+    publisher.forward(FileFound, hold=True)
+    publisher.forward(DirFound)
+    FileFound(path='foo').emit()
+    DirFound(path='bar').emit()
+
+    receiver = Receiver(FileFound)
+    try:
+        transports().subscribe(FileFound, shared=True)
+        assert receiver.wait_for(1) == [FileFound(path='foo')]
+    finally:
+        receiver.close()
+
+
+@pytest.mark.timeout(10)
+def test_closed_transports_stop_forwarding(broker, transports):
+    publisher = transports()
+    publisher.forward(DirFound)
+    transports().subscribe(DirFound)
+    publisher.close()
+
+    receiver = Receiver(DirFound)
+    try:
+        DirFound(path='foo').emit()
+        time.sleep(0.1)
+        assert receiver.received == [DirFound(path='foo')]
+    finally:
+        receiver.close()
+
+
+@pytest.mark.timeout(10)
+def test_wait_for_subscribers(broker, transports):
+    assert not broker.wait_for_subscribers(FileFound, 1, shared=True, timeout=0.01)
+
+    transports().subscribe(FileFound, shared=True)
+
+    assert broker.wait_for_subscribers(FileFound, 1, shared=True, timeout=1)
+
+
+@pytest.mark.timeout(10)
+def test_unacknowledged_shared_signals_are_given_to_another_subscriber(broker, transports):
+    publisher = transports()
+    publisher.forward(FileFound, hold=True)
+    worker = transports()
+    worker.subscribe(FileFound, shared=True, work=lambda signal: [signal.path])
+    worker.acknowledge_on(DirFound, lambda signal: signal.path)
+
+    receiver = Receiver(FileFound)
+    try:
+        FileFound(path='foo').emit()
+        FileFound(path='bar').emit()
+        assert len(receiver.wait_for(4)) == 4
+        DirFound(path='foo').emit()  # Done with foo, but not with bar
+        time.sleep(0.1)
+        worker.close()
+
+        receiver.received.clear()
+        transports().subscribe(FileFound, shared=True)
+        assert receiver.wait_for(1) == [FileFound(path='bar')]
+        time.sleep(0.1)
+        assert receiver.received == [FileFound(path='bar')]
+    finally:
+        receiver.close()
+
+
+@pytest.mark.timeout(10)
+def test_shared_signals_are_acknowledged_once_emitted(broker, transports):
+    publisher = transports()
+    publisher.forward(FileFound, hold=True)
+    worker = transports()
+    worker.subscribe(FileFound, shared=True)
+
+    receiver = Receiver(FileFound)
+    try:
+        FileFound(path='foo').emit()
+        assert len(receiver.wait_for(2)) == 2
+        time.sleep(0.1)
+        worker.close()
+
+        receiver.received.clear()
+        transports().subscribe(FileFound, shared=True)
+        time.sleep(0.1)
+        assert receiver.received == []
+    finally:
+        receiver.close()